@@ -21,29 +21,126 @@
 #     # Dummy check (replace with your real logic)
 #     if username == "test" and password == "test":
 #         return jsonify({"message": "Login successful!"})
-from flask import Flask, request, jsonify
+from flask import (Blueprint, Flask, Response, current_app, request, jsonify, g, has_request_context,
+                   stream_with_context)
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_sqlalchemy.session import Session as FlaskSession
 import jwt
 from functools import wraps
 from datetime import datetime, timedelta
 import os
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
 from flask import send_from_directory
 from datetime import timezone
+import base64
+import hashlib
+import json
+import logging
+import mimetypes
+import re
+import secrets
+import shutil
+import subprocess
+import tempfile
+import uuid
+import threading
+import time
+import unicodedata
+from collections import OrderedDict, defaultdict, namedtuple
+from itertools import islice
+import click
+from sqlalchemy import (Select, and_, case, column, create_engine, delete, func, insert, inspect, literal_column, or_,
+                        select, table, text, tuple_, union_all)
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, object_session, selectinload
+from cache import LRUCache, create_cache
+from config import CONFIGS
+from events import create_event_bus
+from hashing import HasherBusy, PasswordHasher
+from jobs import JobQueue, Worker
+from serialization import create_json_provider
+from writebuffer import WriteBuffer
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; image variants are skipped without it
+    Image = ImageOps = None
+
+log = logging.getLogger(__name__)
+
+# Routes, hooks and CLI commands live on this blueprint; create_app() builds
+# the app around it. ``app`` is the app it built, entered by background threads.
+bp = Blueprint('minifb', __name__, cli_group=None)
+app = None
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def _pool_options(config, url, pool_size, max_overflow):
+    return {'pool_size': pool_size, 'max_overflow': max_overflow,
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            # Server-side disconnects (failover, restarts) only happen off SQLite
+            'pool_pre_ping': url.get_backend_name() != 'sqlite'}
+
+def _sqlite_pragma_listener(pragmas):
+    def apply(dbapi_connection, connection_record):
+        for name, value in pragmas.items():
+            if value:
+                dbapi_connection.execute(f'PRAGMA {name}={value}')
+    return apply
+
+def replica_reads_allowed():
+    return has_request_context() and g.get('use_replica', False)
+
+class RoutingSession(FlaskSession):
+    """Session that sends SELECTs to the read engine inside @replica_reads endpoints.
+
+    Everything else goes to the primary. Once the session writes (a flush or
+    any non-SELECT statement) it stays on the primary until the transaction
+    ends, so it always reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and read_engine is not None:
+            if not isinstance(clause, Select):
+                self.info['wrote'] = True
+            elif not self._flushing and not self.info.get('wrote') and replica_reads_allowed():
+                return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+def _create_read_engine(config):
+    pool_size = config['DB_READ_POOL_SIZE'] or config['DB_POOL_SIZE']
+    read_pragmas = {k: v for k, v in config['SQLITE_PRAGMAS'].items() if k != 'journal_mode'}
+    if config['DATABASE_REPLICA_URL']:
+        url = make_url(config['DATABASE_REPLICA_URL'])
+    elif db.engine.dialect.name == 'sqlite' and config['DB_READ_POOL_SIZE'] > 0 \
+            and not _is_memory_sqlite(db.engine.url):
+        url = make_url(f'sqlite:///file:{db.engine.url.database}?mode=ro&uri=true')
+    else:
+        return None
+    engine = create_engine(url, **_pool_options(config, url, pool_size, config['DB_MAX_OVERFLOW']))
+    if engine.dialect.name == 'sqlite':
+        db.event.listen(engine, 'connect', _sqlite_pragma_listener(read_pragmas))
+    return engine
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+read_engine = None  # set by create_app() when a replica or read pool is configured
 
-app = Flask(__name__)
-CORS(app)
+@db.event.listens_for(Session, 'after_commit')
+def _note_committed_write(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        g.wrote_primary = True
 
-# Config
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DB_PATH = os.path.abspath(os.path.join(BASE_DIR, '..', 'database', 'mini_fb.db'))
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SECRET_KEY'] = os.environ.get('MINIFB_SECRET', 'dev-secret-change-me')
+@db.event.listens_for(Session, 'after_rollback')
+def _clear_write_flag(session):
+    session.info.pop('wrote', None)
 
-db = SQLAlchemy(app)
+event_bus = None  # created by create_app()
 
 # Models
 class User(db.Model):
@@ -64,6 +161,10 @@ class Share(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('uq_shares_post_id_user_id', 'post_id', 'user_id', unique=True),
+    )
+
 class Profile(db.Model):
     __tablename__ = 'profiles'
     id = db.Column(db.Integer, primary_key=True)
@@ -82,9 +183,19 @@ class Post(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Denormalized engagement counters, maintained by the write handlers
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comments_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    shares_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     media = db.relationship('PostMedia', backref='post', cascade='all, delete')
 
+    __table_args__ = (
+        # Seek indexes for keyset pagination of the global and per-user feeds
+        db.Index('ix_posts_created_at_id', 'created_at', 'id'),
+        db.Index('ix_posts_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+    )
+
 class PostMedia(db.Model):
     __tablename__ = 'post_media'
     id = db.Column(db.Integer, primary_key=True)
@@ -94,6 +205,37 @@ class PostMedia(db.Model):
     file_name = db.Column(db.String(255))
     file_size = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Copied from MediaBlob once processed so feed reads need no join
+    variants = db.Column(db.Text)  # JSON list of {url, width, height, format}
+    poster_url = db.Column(db.String(500))
+
+class MediaBlob(db.Model):
+    """A content-addressed upload, shared by every post/story that uses it."""
+    __tablename__ = 'media_blobs'
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, unique=True)
+    file_name = db.Column(db.String(255), nullable=False, unique=True)
+    media_type = db.Column(db.String(20), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    # Number of PostMedia/Story rows pointing at this blob
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Filled in by the process_media background job
+    variants = db.Column(db.Text)  # JSON list of {file, width, height, format}
+    poster_file = db.Column(db.String(255))
+    width = db.Column(db.Integer)  # of the original image, for its srcset entry
+    height = db.Column(db.Integer)
+    processed_at = db.Column(db.DateTime)
+
+class UploadSession(db.Model):
+    """An in-progress resumable chunked upload."""
+    __tablename__ = 'upload_sessions'
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    file_name = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    received = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Comment(db.Model):
     __tablename__ = 'comments'
@@ -103,6 +245,10 @@ class Comment(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_comments_post_id_created_at', 'post_id', 'created_at'),
+    )
+
 class Like(db.Model):
     __tablename__ = 'likes'
     id = db.Column(db.Integer, primary_key=True)
@@ -110,6 +256,10 @@ class Like(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('uq_likes_post_id_user_id', 'post_id', 'user_id', unique=True),
+    )
+
 class FriendRequest(db.Model):
     __tablename__ = 'friend_requests'
     id = db.Column(db.Integer, primary_key=True)
@@ -118,6 +268,21 @@ class FriendRequest(db.Model):
     status = db.Column(db.String(20), nullable=False, default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_friend_requests_to_user_id_status', 'to_user_id', 'status'),
+        db.Index('ix_friend_requests_from_user_id_to_user_id', 'from_user_id', 'to_user_id'),
+    )
+
+class NotificationCounter(db.Model):
+    """Per-user unread notification counts, maintained by the write handlers."""
+    __tablename__ = 'notification_counters'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    pending_friend_requests = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    new_likes = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    new_comments = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Likes/comments newer than this are unread; moved forward by "mark seen"
+    seen_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
 class Story(db.Model):
     __tablename__ = 'stories'
     id = db.Column(db.Integer, primary_key=True)
@@ -126,16 +291,751 @@ class Story(db.Model):
     media_type = db.Column(db.String(20))  # 'image' or 'video'
     media_url = db.Column(db.String(500))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    expires_at = db.Column(db.DateTime, default=lambda: datetime.utcnow() + timedelta(hours=24))
+    expires_at = db.Column(db.DateTime, default=lambda: datetime.utcnow() + timedelta(hours=24), index=True)
 
     user = db.relationship('User', backref='stories')
 
-# Initialize DB
-os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-with app.app_context():
+    __table_args__ = (
+        # Active stories of a set of authors (the per-viewer tray)
+        db.Index('ix_stories_user_id_expires_at', 'user_id', 'expires_at'),
+    )
+
+class StoryView(db.Model):
+    """A viewer has opened a story; drives unseen-first tray ordering."""
+    __tablename__ = 'story_views'
+    story_id = db.Column(db.Integer, db.ForeignKey('stories.id'), primary_key=True)
+    viewer_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    viewed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Friendship(db.Model):
+    """An accepted friendship, stored once per pair as ``(low_id, high_id)``."""
+    __tablename__ = 'friendships'
+    low_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    high_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set once this edge's mutual-friend counts are in friend_suggestions
+    scored_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_friendships_high_id_low_id', 'high_id', 'low_id'),
+    )
+
+class FriendSuggestion(db.Model):
+    """A "people you may know" candidate: a non-friend sharing ``mutual_count`` friends."""
+    __tablename__ = 'friend_suggestions'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    candidate_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    mutual_count = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_friend_suggestions_user_id_mutual_count', 'user_id', 'mutual_count', 'candidate_id'),
+    )
+
+class TimelineEntry(db.Model):
+    """A post in a user's home timeline, written when the post is created."""
+    __tablename__ = 'timeline_entries'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id'), primary_key=True)
+    # Copy of posts.created_at so a timeline page is one index range read
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_timeline_entries_user_id_created_at_post_id', 'user_id', 'created_at', 'post_id'),
+        db.Index('ix_timeline_entries_post_id', 'post_id'),
+    )
+
+class StreamTicket(db.Model):
+    """A single-use, short-lived credential for opening the notification stream."""
+    __tablename__ = 'stream_tickets'
+    ticket_hash = db.Column(db.String(64), primary_key=True)  # SHA-256 of the ticket
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class TimelineCelebrity(db.Model):
+    """An author with too many friends to fan out to; merged in at read time."""
+    __tablename__ = 'timeline_celebrities'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+############################
+# Background Jobs
+############################
+JOB_HANDLERS = {}
+job_queue = job_worker = None  # created by create_app()
+
+def job_handler(kind):
+    """Register ``f(payload)`` as the handler for ``kind``; it runs in an app context."""
+    def decorator(f):
+        @wraps(f)
+        def run(payload):
+            with app.app_context():
+                return f(payload)
+        JOB_HANDLERS[kind] = run
+        return f
+    return decorator
+
+def enqueue_job(kind, payload, delay=0, unique=False):
+    job_queue.enqueue(kind, payload, delay=delay, unique=unique)
+    if current_app.config['JOB_WORKER'] == 'thread':
+        job_worker.start_background()
+
+def start_job_worker():
+    """Start this process's job thread if JOB_WORKER is 'thread', so jobs left
+    queued by an earlier process run without waiting for a new one."""
+    if app.config['JOB_WORKER'] == 'thread':
+        ensure_story_reaper()
+        job_worker.start_background()
+
+@bp.cli.command('run-worker')
+@click.option('--once', is_flag=True, help='Drain the queue and exit instead of polling forever.')
+def run_worker_command(once):
+    """Run queued background jobs in this process."""
+    ensure_story_reaper()
+    if once:
+        ran = 0
+        while job_worker.run_once():
+            ran += 1
+        click.echo(f'{ran} job(s) run; queue: {job_queue.counts()}')
+    else:
+        job_worker.run_forever()
+
+############################
+# Engagement Counters
+############################
+COUNTER_SOURCES = (
+    ('likes_count', Like),
+    ('comments_count', Comment),
+    ('shares_count', Share),
+)
+
+def bump_counter(post_id, column, delta):
+    """Adjust a Post counter in the current transaction.
+
+    Uses ``col = col + delta`` in SQL so concurrent writers never lose updates.
+    """
+    Post.query.filter_by(id=post_id).update(
+        {column: column + delta}, synchronize_session=False)
+
+def reconcile_counters(fix=True):
+    """Compare Post counters with the source tables; return the drifted rows.
+
+    Each entry is ``(post_id, column, stored, actual)``. With ``fix`` the stored
+    values are overwritten and committed.
+    """
+    drift = []
+    for column, model in COUNTER_SOURCES:
+        actual = dict(db.session.query(model.post_id, func.count(model.id)).group_by(model.post_id).all())
+        for post_id, stored in db.session.query(Post.id, getattr(Post, column)).all():
+            expected = actual.get(post_id, 0)
+            if stored != expected:
+                drift.append((post_id, column, stored, expected))
+    if fix and drift:
+        for post_id, column, _, expected in drift:
+            Post.query.filter_by(id=post_id).update({column: expected}, synchronize_session=False)
+        db.session.commit()
+    return drift
+
+@bp.cli.command('reconcile-counters')
+@click.option('--check', is_flag=True, help='Only report drift; exit 1 if any is found.')
+def reconcile_counters_command(check):
+    """Backfill/verify Post engagement counters against likes, comments and shares."""
+    drift = reconcile_counters(fix=not check)
+    for post_id, column, stored, expected in drift:
+        click.echo(f'post {post_id}: {column} stored={stored} actual={expected}')
+    verb = 'found' if check else 'fixed'
+    click.echo(f'{len(drift)} counter(s) {verb}')
+    if check and drift:
+        raise SystemExit(1)
+
+############################
+# Notification Counters
+############################
+def bump_notification_counter(user_id, column, delta=1, created_at=None):
+    """Adjust one of ``user_id``'s unread counters in the current transaction.
+
+    Counters never go below zero. With ``created_at`` (used when an unread
+    item is removed) the row is only touched if that item is still unread.
+    """
+    q = NotificationCounter.query.filter_by(user_id=user_id)
+    if created_at is not None:
+        q = q.filter(NotificationCounter.seen_at < created_at)
+    q.update({column: case((column + delta > 0, column + delta), else_=0)},
+             synchronize_session=False)
+
+def release_unread_engagement(post):
+    """Take ``post``'s still-unread likes and comments off its owner's counters.
+
+    Call before the post's likes and comments are deleted.
+    """
+    counter = db.session.get(NotificationCounter, post.user_id)
+    if counter is None:
+        return
+    for column, model in ((NotificationCounter.new_likes, Like), (NotificationCounter.new_comments, Comment)):
+        unread = model.query.filter(model.post_id == post.id, model.user_id != post.user_id,
+                                    model.created_at > counter.seen_at).count()
+        if unread:
+            bump_notification_counter(post.user_id, column, -unread)
+
+def _expected_notification_counts():
+    pending = dict(db.session.query(FriendRequest.to_user_id, func.count(FriendRequest.id))
+                   .filter(FriendRequest.status == 'pending')
+                   .group_by(FriendRequest.to_user_id).all())
+    unread = {}
+    for column, model in (('new_likes', Like), ('new_comments', Comment)):
+        unread[column] = dict(
+            db.session.query(Post.user_id, func.count(model.id))
+            .join(Post, Post.id == model.post_id)
+            .join(NotificationCounter, NotificationCounter.user_id == Post.user_id)
+            .filter(model.created_at > NotificationCounter.seen_at, model.user_id != Post.user_id)
+            .group_by(Post.user_id).all())
+    return {'pending_friend_requests': pending, **unread}
+
+def rebuild_notification_counters(fix=True):
+    """Recompute unread counters from the source tables; return the drift.
+
+    Each entry is ``(user_id, column, stored, actual)``; users without a
+    counter row are reported as ``(user_id, 'row', None, None)``. With ``fix``
+    missing rows are created (everything before now counts as seen) and the
+    counters overwritten.
+    """
+    tracked = db.session.query(NotificationCounter.user_id)
+    missing = [row[0] for row in db.session.query(User.id).filter(~User.id.in_(tracked))]
+    drift = [(user_id, 'row', None, None) for user_id in missing]
+    if fix:
+        db.session.add_all(NotificationCounter(user_id=user_id) for user_id in missing)
+        db.session.flush()
+    expected = _expected_notification_counts()
+    for counter in NotificationCounter.query.all():
+        for column, actual in expected.items():
+            stored = getattr(counter, column)
+            if stored != actual.get(counter.user_id, 0):
+                drift.append((counter.user_id, column, stored, actual.get(counter.user_id, 0)))
+                if fix:
+                    setattr(counter, column, actual.get(counter.user_id, 0))
+    if fix:
+        db.session.commit()
+    return drift
+
+@bp.cli.command('rebuild-notification-counters')
+@click.option('--check', is_flag=True, help='Only report drift; exit 1 if any is found.')
+def rebuild_notification_counters_command(check):
+    """Rebuild/verify per-user unread notification counters."""
+    drift = rebuild_notification_counters(fix=not check)
+    for user_id, column, stored, actual in drift:
+        click.echo(f'user {user_id}: {column} stored={stored} actual={actual}')
+    verb = 'found' if check else 'fixed'
+    click.echo(f'{len(drift)} counter(s) {verb}')
+    if check and drift:
+        raise SystemExit(1)
+
+############################
+# Friendship Graph
+############################
+# friend_requests keeps the request history (pending, accepted, repeats);
+# each accepted pair is mirrored once into friendships, which every
+# relationship check, friend count and friend list reads.
+FRIEND_CACHE_TTL = 60
+_friend_cache = None  # created by create_app()
+
+def friend_ids(user_id):
+    """``user_id``'s friends as a frozenset, cached per process."""
+    friends = _friend_cache.get(user_id)
+    if friends is None:
+        rows = db.session.query(Friendship.high_id).filter(Friendship.low_id == user_id).union_all(
+            db.session.query(Friendship.low_id).filter(Friendship.high_id == user_id))
+        friends = frozenset(row[0] for row in rows)
+        _friend_cache.set(user_id, friends)
+    return friends
+
+def are_friends(a, b):
+    return b in friend_ids(a)
+
+def mutual_friend_count(a, b):
+    return len(friend_ids(a) & friend_ids(b))
+
+def add_friendship(a, b):
+    """Record ``a`` and ``b`` as friends (idempotent); the caller commits."""
+    low, high = min(a, b), max(a, b)
+    if db.session.get(Friendship, (low, high)) is None:
+        db.session.add(Friendship(low_id=low, high_id=high))
+
+# Cached friend sets are evicted once the change commits: evicted at flush, a
+# concurrent request could cache the old committed set again before the commit
+@db.event.listens_for(Friendship, 'after_insert')
+@db.event.listens_for(Friendship, 'after_delete')
+def _invalidate_cached_friends(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('friends_changed', set()).update((target.low_id, target.high_id))
+
+@db.event.listens_for(Session, 'after_commit')
+def _evict_friends_after_commit(session):
+    for user_id in session.info.pop('friends_changed', ()):
+        _friend_cache.pop(user_id)
+
+@db.event.listens_for(Session, 'after_rollback')
+def _forget_friends_changed(session):
+    session.info.pop('friends_changed', None)
+
+def backfill_friendships():
+    """Mirror accepted friend requests into friendships; return the pairs added."""
+    existing = set(db.session.query(Friendship.low_id, Friendship.high_id))
+    pairs = {(min(a, b), max(a, b)) for a, b in db.session.query(
+        FriendRequest.from_user_id, FriendRequest.to_user_id).filter_by(status='accepted') if a != b}
+    missing = pairs - existing
+    if missing:
+        db.session.execute(insert(Friendship), [{'low_id': low, 'high_id': high} for low, high in missing])
+    db.session.commit()
+    _friend_cache.clear()
+    return len(missing)
+
+############################
+# Friend Suggestions
+############################
+# friend_suggestions is maintained incrementally: scoring a new edge (a, b)
+# adds b as a mutual friend between a and each of b's already-scored friends,
+# and vice versa. Edges are scored one at a time inside the write
+# transaction that claims them, so each path u - w - v is counted once.
+# rebuild_suggestions() recomputes the table from scratch.
+
+def upsert(model):
+    """An INSERT for ``model`` that supports ``on_conflict_do_update``."""
+    if db.engine.dialect.name == 'postgresql':
+        # Imported here: loading the PostgreSQL dialect adds ~25ms to every SQLite worker's startup
+        from sqlalchemy.dialects import postgresql as dialect
+    else:
+        dialect = sqlite
+    return dialect.insert(model)
+
+def _neighbours(user_id):
+    """``{friend_id: edge_is_scored}`` for ``user_id``, read from the database."""
+    rows = db.session.query(Friendship.high_id, Friendship.scored_at).filter(Friendship.low_id == user_id).union_all(
+        db.session.query(Friendship.low_id, Friendship.scored_at).filter(Friendship.high_id == user_id))
+    return {friend_id: scored_at is not None for friend_id, scored_at in rows}
+
+def score_friendship(low_id, high_id):
+    """Apply a new friendship to friend_suggestions; return False if already applied."""
+    claimed = Friendship.query.filter_by(low_id=low_id, high_id=high_id, scored_at=None).update(
+        {'scored_at': datetime.utcnow()}, synchronize_session=False)
+    if not claimed:
+        return False
+    neighbours = {low_id: _neighbours(low_id), high_id: _neighbours(high_id)}
+    rows = []
+    for a, b in ((low_id, high_id), (high_id, low_id)):
+        for x, scored in neighbours[a].items():
+            if scored and x != b and x not in neighbours[b]:
+                rows += [{'user_id': b, 'candidate_id': x, 'mutual_count': 1},
+                         {'user_id': x, 'candidate_id': b, 'mutual_count': 1}]
+    if rows:
+        stmt = upsert(FriendSuggestion)
+        stmt = stmt.on_conflict_do_update(index_elements=['user_id', 'candidate_id'],
+                                          set_={'mutual_count': FriendSuggestion.mutual_count + 1})
+        db.session.execute(stmt, rows)
+    FriendSuggestion.query.filter(or_(
+        and_(FriendSuggestion.user_id == low_id, FriendSuggestion.candidate_id == high_id),
+        and_(FriendSuggestion.user_id == high_id, FriendSuggestion.candidate_id == low_id),
+    )).delete(synchronize_session=False)
+    return True
+
+@job_handler('score_friendship')
+def score_friendship_job(payload):
+    score_friendship(payload['low_id'], payload['high_id'])
+    db.session.commit()
+
+def rebuild_suggestions():
+    """Recompute friend_suggestions from friendships; return the row count."""
+    FriendSuggestion.query.delete()
+    Friendship.query.update({'scored_at': datetime.utcnow()}, synchronize_session=False)
+    adjacency = union_all(
+        select(Friendship.low_id.label('user_id'), Friendship.high_id.label('friend_id')),
+        select(Friendship.high_id, Friendship.low_id)).subquery()
+    mine, theirs = adjacency.alias('mine'), adjacency.alias('theirs')
+    already_friends = select(Friendship.low_id).where(or_(
+        and_(Friendship.low_id == mine.c.user_id, Friendship.high_id == theirs.c.user_id),
+        and_(Friendship.low_id == theirs.c.user_id, Friendship.high_id == mine.c.user_id))).exists()
+    scores = select(mine.c.user_id, theirs.c.user_id, func.count()).join_from(
+        mine, theirs, and_(mine.c.friend_id == theirs.c.friend_id, mine.c.user_id != theirs.c.user_id)
+    ).where(~already_friends).group_by(mine.c.user_id, theirs.c.user_id)
+    db.session.execute(insert(FriendSuggestion).from_select(['user_id', 'candidate_id', 'mutual_count'], scores))
+    db.session.commit()
+    return db.session.query(func.count()).select_from(FriendSuggestion).scalar()
+
+@bp.cli.command('rebuild-suggestions')
+def rebuild_suggestions_command():
+    """Recompute all friend suggestions from the friendship graph."""
+    click.echo(f'{rebuild_suggestions()} suggestion rows written')
+
+def _add_friend_suggestions():
+    _add_columns(Friendship, 'scored_at')
+    rebuild_suggestions()
+
+############################
+# Home Timeline
+############################
+# Fan-out on write: a new post is pushed into the timeline of its author and
+# of each friend, so a home feed page is one range read of timeline_entries
+# plus a batched hydrate. Authors with more than the TIMELINE_FANOUT_LIMIT
+# setting's friends are recorded in timeline_celebrities instead and their posts are merged in
+# at read time from the posts (user_id, created_at, id) index.
+# A timeline is trimmed back to TIMELINE_MAX_ENTRIES whenever an add takes it over
+# Recent posts copied each way when two users become friends
+TIMELINE_BACKFILL_POSTS = 50
+
+def celebrity_friend_ids(user_id):
+    """IDs of ``user_id``'s friends whose posts are fanned out on read."""
+    rows = db.session.query(TimelineCelebrity.user_id).join(Friendship, or_(
+        and_(Friendship.low_id == TimelineCelebrity.user_id, Friendship.high_id == user_id),
+        and_(Friendship.high_id == TimelineCelebrity.user_id, Friendship.low_id == user_id)))
+    return {row[0] for row in rows}
+
+def add_timeline_entries(user_ids, posts):
+    """Add each of ``posts`` (anything with ``id``/``created_at``) to each user's timeline."""
+    user_ids, posts = list(user_ids), list(posts)
+    if not user_ids or not posts:
+        return 0
+    existing = set(db.session.query(TimelineEntry.user_id, TimelineEntry.post_id).filter(
+        TimelineEntry.post_id.in_([p.id for p in posts]), TimelineEntry.user_id.in_(user_ids)))
+    rows = [{'user_id': uid, 'post_id': p.id, 'created_at': p.created_at}
+            for uid in user_ids for p in posts if (uid, p.id) not in existing]
+    if rows:
+        db.session.execute(insert(TimelineEntry), rows)
+    return len(rows)
+
+def overfull_timelines(user_ids):
+    """Those of ``user_ids`` whose timelines hold more than TIMELINE_MAX_ENTRIES entries."""
+    rows = db.session.query(TimelineEntry.user_id).filter(
+        TimelineEntry.user_id.in_(list(user_ids))).group_by(TimelineEntry.user_id).having(
+        func.count() > current_app.config['TIMELINE_MAX_ENTRIES'])
+    return [row[0] for row in rows]
+
+def trim_timelines(user_ids=None):
+    """Drop entries beyond TIMELINE_MAX_ENTRIES from the given (default: all) timelines."""
+    rank = func.row_number().over(partition_by=TimelineEntry.user_id,
+                                  order_by=(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()))
+    ranked = db.session.query(TimelineEntry.user_id, TimelineEntry.post_id, rank.label('rank'))
+    if user_ids is not None:
+        ranked = ranked.filter(TimelineEntry.user_id.in_(list(user_ids)))
+    ranked = ranked.subquery()
+    stale = select(ranked.c.user_id, ranked.c.post_id).where(
+        ranked.c.rank > current_app.config['TIMELINE_MAX_ENTRIES'])
+    return TimelineEntry.query.filter(
+        tuple_(TimelineEntry.user_id, TimelineEntry.post_id).in_(stale)).delete(synchronize_session=False)
+
+def fan_out_post(post):
+    """Push ``post`` into its author's friends' timelines; return the entries added."""
+    followers = friend_ids(post.user_id)
+    if len(followers) > current_app.config['TIMELINE_FANOUT_LIMIT']:
+        if db.session.get(TimelineCelebrity, post.user_id) is None:
+            db.session.add(TimelineCelebrity(user_id=post.user_id))
+        return 0
+    added = add_timeline_entries(followers, [post])
+    # The author's own entry was added when the post was created
+    overfull = overfull_timelines([post.user_id, *followers])
+    if overfull:
+        trim_timelines(overfull)
+    return added
+
+@job_handler('fan_out_post')
+def fan_out_post_job(payload):
+    post = db.session.get(Post, payload['post_id'])
+    if post is None:  # deleted before the job ran
+        return
+    fan_out_post(post)
+    db.session.commit()
+
+@job_handler('backfill_timelines')
+def backfill_timelines_job(payload):
+    """Copy two new friends' recent posts into each other's timelines."""
+    a, b = payload['user_ids']
+    for reader, author in ((a, b), (b, a)):
+        if db.session.get(TimelineCelebrity, author) is not None:
+            continue
+        recent = db.session.query(Post.id, Post.created_at).filter_by(user_id=author).order_by(
+            Post.created_at.desc(), Post.id.desc()).limit(TIMELINE_BACKFILL_POSTS).all()
+        if add_timeline_entries([reader], recent) and overfull_timelines([reader]):
+            trim_timelines([reader])
+    db.session.commit()
+
+def rebuild_timelines():
+    """Rebuild every home timeline from posts and friendships; return the entry count."""
+    TimelineEntry.query.delete()
+    TimelineCelebrity.query.delete()
+    friends = defaultdict(set)
+    for a, b in db.session.query(Friendship.low_id, Friendship.high_id):
+        friends[a].add(b)
+        friends[b].add(a)
+    fanout_limit = current_app.config['TIMELINE_FANOUT_LIMIT']
+    celebrities = {uid for uid, ids in friends.items() if len(ids) > fanout_limit}
+    db.session.add_all(TimelineCelebrity(user_id=uid) for uid in celebrities)
+    total = 0
+    for (user_id,) in db.session.query(User.id):
+        authors = {user_id} | (friends[user_id] - celebrities)
+        recent = db.session.query(Post.id, Post.created_at).filter(Post.user_id.in_(authors)).order_by(
+            Post.created_at.desc(), Post.id.desc()).limit(current_app.config['TIMELINE_MAX_ENTRIES']).all()
+        total += add_timeline_entries([user_id], recent)
+    db.session.commit()
+    return total
+
+@bp.cli.command('rebuild-timelines')
+def rebuild_timelines_command():
+    """Recompute all home timelines (after bulk imports or a fan-out limit change)."""
+    click.echo(f'{rebuild_timelines()} timeline entries written')
+
+############################
+# Search Index
+############################
+# SQLite FTS5 tables mirror the searchable text; rowid is users.id / posts.id.
+# Triggers keep them current on every write path, including bulk SQL.
+# Other databases fall back to prefix LIKE matching.
+SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "username, first_name, surname, tokenize='unicode61', prefix='2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(content, tokenize='unicode61', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts (rowid, username, first_name, surname) VALUES (new.id, new.username, '', ''); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF username ON users BEGIN "
+    "UPDATE users_fts SET username = new.username WHERE rowid = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+    "DELETE FROM users_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS profiles_fts_ai AFTER INSERT ON profiles BEGIN "
+    "UPDATE users_fts SET first_name = coalesce(new.first_name, ''), surname = coalesce(new.surname, '') "
+    "WHERE rowid = new.user_id; END",
+    "CREATE TRIGGER IF NOT EXISTS profiles_fts_au AFTER UPDATE OF first_name, surname ON profiles BEGIN "
+    "UPDATE users_fts SET first_name = coalesce(new.first_name, ''), surname = coalesce(new.surname, '') "
+    "WHERE rowid = new.user_id; END",
+    "CREATE TRIGGER IF NOT EXISTS profiles_fts_ad AFTER DELETE ON profiles BEGIN "
+    "UPDATE users_fts SET first_name = '', surname = '' WHERE rowid = old.user_id; END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ai AFTER INSERT ON posts BEGIN "
+    "INSERT INTO posts_fts (rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_au AFTER UPDATE OF content ON posts BEGIN "
+    "UPDATE posts_fts SET content = new.content WHERE rowid = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS posts_fts_ad AFTER DELETE ON posts BEGIN "
+    "DELETE FROM posts_fts WHERE rowid = old.id; END",
+)
+users_fts = table('users_fts', column('rowid'))
+posts_fts = table('posts_fts', column('rowid'), column('rank'))
+# bm25 column weights: a username hit outranks a first name or surname hit
+USER_SEARCH_RANK = func.bm25(literal_column('users_fts'), 10.0, 5.0, 5.0)
+SEARCH_TERM = re.compile(r'\w+', re.UNICODE)
+
+def full_text_search_enabled():
+    return db.engine.dialect.name == 'sqlite'
+
+def search_terms(*texts):
+    """Lower-cased, accent-folded words, split the way the FTS tokenizer splits them."""
+    folded = unicodedata.normalize('NFKD', ' '.join(t or '' for t in texts).lower())
+    return SEARCH_TERM.findall(''.join(ch for ch in folded if not unicodedata.combining(ch)))
+
+def fts_query(q):
+    """Turn free text into an FTS5 query: every word, each as a prefix."""
+    return ' '.join(f'"{term}"*' for term in search_terms(q))
+
+def like_escape(q):
+    """Escape LIKE wildcards in ``q``, for a pattern used with ``escape='\\'``."""
+    return q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def rebuild_search_index():
+    """Create the FTS tables/triggers if needed and refill them; return ``(users, posts)``."""
+    if not full_text_search_enabled():
+        return 0, 0
+    for statement in SEARCH_DDL:
+        db.session.execute(text(statement))
+    db.session.execute(text('DELETE FROM users_fts'))
+    db.session.execute(text('DELETE FROM posts_fts'))
+    users = db.session.execute(text(
+        "INSERT INTO users_fts (rowid, username, first_name, surname) "
+        "SELECT users.id, users.username, coalesce(profiles.first_name, ''), coalesce(profiles.surname, '') "
+        "FROM users LEFT JOIN profiles ON profiles.user_id = users.id")).rowcount
+    posts = db.session.execute(text(
+        'INSERT INTO posts_fts (rowid, content) SELECT id, content FROM posts')).rowcount
+    db.session.execute(text("INSERT INTO users_fts (users_fts) VALUES ('optimize')"))
+    db.session.execute(text("INSERT INTO posts_fts (posts_fts) VALUES ('optimize')"))
+    db.session.commit()
+    return users, posts
+
+# Type-ahead: each keystroke refines the previous query ("ann" -> "anna"), so
+# a query is answered from the cached candidates of its longest cached prefix
+# when that list was complete; only a miss runs the FTS query.
+TYPEAHEAD_CANDIDATES = 100  # ranked matches kept per cached query
+TYPEAHEAD_RESULTS = 10
+
+Candidate = namedtuple('Candidate', 'id username email name words')
+
+class TypeaheadCache:
+    """Bounded, TTL-evicting map of search key -> ranked candidates, with prefix reuse."""
+
+    def __init__(self, maxsize, ttl):
+        self._entries = LRUCache(maxsize, ttl=ttl)  # key -> (candidates, complete)
+        self._lock = threading.Lock()
+        self.hits = self.prefix_hits = self.misses = 0
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def lookup(self, key):
+        """Return the ranked candidates for ``key``, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._count('hits')
+            return entry[0]
+        terms = key.split(' ')
+        for end in range(len(key) - 1, 0, -1):
+            entry = self._entries.get(key[:end].rstrip())
+            # A truncated list may lack matches for the longer query
+            if entry is None or not entry[1]:
+                continue
+            candidates = [c for c in entry[0]
+                          if all(any(w.startswith(t) for w in c.words) for t in terms)]
+            self._entries.set(key, (candidates, True))
+            self._count('prefix_hits')
+            return candidates
+        self._count('misses')
+        return None
+
+    def store(self, key, candidates, complete):
+        self._entries.set(key, (candidates, complete))
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.prefix_hits + self.misses
+        return {
+            'hits': self.hits,
+            'prefixHits': self.prefix_hits,
+            'misses': self.misses,
+            'hitRate': round((self.hits + self.prefix_hits) / lookups, 4) if lookups else None,
+            'size': len(self._entries),
+            'maxsize': self._entries.maxsize,
+            'ttl': self._entries.ttl,
+        }
+
+_typeahead_cache = None  # created by create_app()
+
+def _typeahead_changed(target):
+    # Cleared at flush and again at commit, so a search that ran in between
+    # cannot keep pre-commit results cached
+    _typeahead_cache.clear()
+    session = object_session(target)
+    if session is not None:
+        session.info['typeahead_changed'] = True
+
+@db.event.listens_for(Session, 'after_commit')
+def _clear_typeahead_after_commit(session):
+    if session.info.pop('typeahead_changed', False):
+        _typeahead_cache.clear()
+
+@db.event.listens_for(User, 'after_insert')
+@db.event.listens_for(User, 'after_delete')
+@db.event.listens_for(Profile, 'after_insert')
+def _invalidate_typeahead(mapper, connection, target):
+    _typeahead_changed(target)
+
+@db.event.listens_for(User, 'after_update')
+def _invalidate_typeahead_on_rename(mapper, connection, target):
+    if inspect(target).attrs.username.history.has_changes():
+        _typeahead_changed(target)
+
+@db.event.listens_for(Profile, 'after_update')
+def _invalidate_typeahead_on_name_change(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if attrs.first_name.history.has_changes() or attrs.surname.history.has_changes():
+        _typeahead_changed(target)
+
+@bp.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Recreate the full-text search index from users, profiles and posts."""
+    users, posts = rebuild_search_index()
+    _typeahead_cache.clear()
+    click.echo(f'indexed {users} user(s) and {posts} post(s)')
+
+############################
+# Schema Migrations
+############################
+# db.create_all() only creates missing tables. Changes to existing tables are
+# ordered, idempotent steps; applied IDs are recorded in schema_migrations so
+# each step runs once per database.
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    id = db.Column(db.String(100), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def _add_post_counter_columns():
+    existing = {c['name'] for c in inspect(db.engine).get_columns('posts')}
+    for column, _ in COUNTER_SOURCES:
+        if column not in existing:
+            db.session.execute(text(f'ALTER TABLE posts ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0'))
+    db.session.commit()
+
+def _add_columns(model, *names):
+    existing = {c['name'] for c in inspect(db.engine).get_columns(model.__tablename__)}
+    for name in names:
+        if name not in existing:
+            column = model.__table__.c[name]
+            ddl_type = column.type.compile(db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {model.__tablename__} ADD COLUMN {name} {ddl_type}'))
+    db.session.commit()
+
+def _add_media_variant_columns():
+    _add_columns(PostMedia, 'variants', 'poster_url')
+    _add_columns(MediaBlob, 'variants', 'poster_file', 'width', 'height', 'processed_at')
+
+def _dedupe_likes_and_shares():
+    # Required before the (post_id, user_id) unique indexes can be built
+    for model in (Like, Share):
+        keep = db.session.query(func.min(model.id)).group_by(model.post_id, model.user_id)
+        model.query.filter(~model.id.in_(keep)).delete(synchronize_session=False)
+    db.session.commit()
+
+def _create_missing_indexes():
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+MIGRATIONS = (
+    ('0001_post_counter_columns', _add_post_counter_columns),
+    ('0002_dedupe_likes_shares', _dedupe_likes_and_shares),
+    ('0003_lookup_indexes', _create_missing_indexes),
+    ('0004_backfill_post_counters', reconcile_counters),
+    ('0005_notification_counters', rebuild_notification_counters),
+    ('0006_media_variant_columns', _add_media_variant_columns),
+    ('0007_friendships', backfill_friendships),
+    ('0008_home_timelines', rebuild_timelines),
+    ('0009_friend_suggestions', _add_friend_suggestions),
+    ('0010_search_index', rebuild_search_index),
+    ('0011_story_tray_index', _create_missing_indexes),
+)
+
+def migrate():
+    """Create missing tables and apply pending migrations; return their IDs."""
+    url = db.engine.url
+    if url.get_backend_name() == 'sqlite' and not _is_memory_sqlite(url):
+        os.makedirs(os.path.dirname(os.path.abspath(url.database)), exist_ok=True)
     db.create_all()
+    applied = {row.id for row in SchemaMigration.query.all()}
+    ran = []
+    for migration_id, step in MIGRATIONS:
+        if migration_id in applied:
+            continue
+        step()
+        db.session.add(SchemaMigration(id=migration_id))
+        db.session.commit()
+        ran.append(migration_id)
+    return ran
+
+@bp.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Create missing tables and apply pending schema migrations.
 
-@app.route("/")
+    The app does not do this on startup; run it once per deploy, before the workers start.
+    """
+    ran = migrate()
+    for migration_id in ran:
+        click.echo(f'applied {migration_id}')
+    click.echo(f'{len(ran)} migration(s) applied')
+
+@bp.route("/")
 def home():
     return "Flask server is running!"
 
@@ -149,7 +1049,26 @@ def create_token(user_id, email, username):
         'username': username,
         'exp': datetime.utcnow() + timedelta(days=7)
     }
-    return jwt.encode(payload, app.config['SECRET_KEY'], algorithm='HS256')
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
+
+password_hasher = None  # created by create_app()
+
+# Both release the request's pooled connection first: a request waiting for
+# the hasher must not keep a connection that feed reads could be using.
+def hash_password(password):
+    db.session.close()
+    return password_hasher.hash(password)
+
+def verify_password(pwhash, password):
+    """Return ``(ok, new_hash)``; ``new_hash`` is set if ``pwhash`` needs upgrading."""
+    db.session.close()
+    return password_hasher.verify(pwhash, password)
+
+@bp.app_errorhandler(HasherBusy)
+def hasher_busy(e):
+    resp = jsonify({'message': 'Too many sign-ins right now, please retry shortly'})
+    resp.headers['Retry-After'] = '1'
+    return resp, 503
 
 def auth_required(f):
     @wraps(f)
@@ -159,7 +1078,7 @@ def auth_required(f):
             return jsonify({'message': 'Missing or invalid token', 'detail': 'Authorization header must be: Bearer <token>'}), 401
         token = auth_header.split(' ', 1)[1]
         try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+            payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
         except Exception as e:
             # Provide error detail to help client debug quickly
             return jsonify({'message': 'Invalid or expired token', 'detail': str(e)}), 401
@@ -167,11 +1086,242 @@ def auth_required(f):
         return f(*args, **kwargs)
     return wrapper
 
+def user_id_from_token(token):
+    """Return the user ID carried by a JWT, or None if it is invalid."""
+    try:
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+        # sub stored as string
+        return int(payload.get('sub'))
+    except Exception:
+        return None
+
+def optional_user_id():
+    """Return the user ID from an optional Bearer token, or None."""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header.startswith('Bearer '):
+        return None
+    return user_id_from_token(auth_header.split(' ', 1)[1])
+
+# The JWT carries the user ID; username/email come from this cache so
+# authenticated handlers don't re-read the users row on every request.
+AuthUser = namedtuple('AuthUser', 'id username email')
+_user_cache = None  # created by create_app()
+
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    _user_cache.pop(target.id)
+
+def load_auth_user(user_id):
+    cached = _user_cache.get(user_id)
+    if cached is None:
+        row = db.session.query(User.username, User.email).filter_by(id=user_id).first()
+        if row is None:
+            return None
+        cached = (row.username, row.email)
+        _user_cache.set(user_id, cached)
+    return AuthUser(user_id, *cached)
+
+def current_user():
+    """Resolve the authenticated user for this request as an ``AuthUser``.
+
+    Requires ``auth_required``. Returns None if the account no longer exists.
+    """
+    if 'current_user' not in g:
+        try:
+            user_id = int(request.user.get('sub'))
+        except (TypeError, ValueError):
+            user_id = None
+        g.current_user = load_auth_user(user_id) if user_id is not None else None
+    return g.current_user
+
+############################
+# Read Replica Routing
+############################
+# Endpoints decorated with @replica_reads query the read engine (a replica,
+# or the SQLite read pool); all others use the primary. Replicas lag, so a
+# user who just wrote keeps reading from the primary for a short window:
+# remembered per user in this process, and by a cookie for other processes.
+PRIMARY_COOKIE = 'minifb_primary'
+_recent_writers = None  # user ID -> True for REPLICA_STICKY_SECONDS, created by create_app()
+
+def wrote_recently():
+    if request.cookies.get(PRIMARY_COOKIE):
+        return True
+    user_id = optional_user_id()
+    return user_id is not None and _recent_writers.get(user_id, False)
+
+def replica_reads(f):
+    """Serve this read-only endpoint from the read engine when it is safe to."""
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        g.use_replica = read_engine is not None and not wrote_recently()
+        return f(*args, **kwargs)
+    return wrapper
+
+@bp.after_app_request
+def _stick_recent_writer_to_primary(response):
+    if read_engine is None:  # every read already goes to the primary
+        return response
+    sticky_seconds = current_app.config['REPLICA_STICKY_SECONDS']
+    if g.pop('wrote_primary', False) and sticky_seconds > 0:
+        user_id = optional_user_id()
+        if user_id is not None:
+            _recent_writers.set(user_id, True)
+        response.set_cookie(PRIMARY_COOKIE, '1', max_age=sticky_seconds,
+                            httponly=True, samesite='Lax')
+    return response
+
+############################
+# HTTP Response Cache
+############################
+# Public read endpoints are cached by version. Each user, post and story tray
+# has a version in the cache store (a nanosecond timestamp); write handlers
+# touch() the versions they change and the bump lands when the session
+# commits. A response's weak ETag hashes its URL with the versions it depends
+# on, so If-None-Match is answered with 304 without touching the database, and
+# a body cached under an ETag can never go stale. A version missing from the
+# store (evicted, expired, or never written) simply starts afresh.
+# These are created by create_app(). Per-process versions expire after
+# HTTP_CACHE_TTL so another worker's bumps are picked up in bounded time;
+# shared versions only need to outlive the bodies cached under them.
+_http_store = None
+_http_store_shared = False
+HTTP_VERSION_TTL = None
+_response_bodies = None  # ETag -> body, in front of the store
+_username_ids = None  # usernames never change
+
+def user_key(user_id):
+    return f'user:{user_id}'
+
+def post_key(post_id):
+    return f'post:{post_id}'
+
+def stories_key(viewer_id):
+    return f'stories:{viewer_id}'
+
+def touch(*keys):
+    """Mark the versions ``keys`` changed; bumped when this session next commits."""
+    db.session.info.setdefault('http_touched', set()).update(keys)
+
+def touch_post(post):
+    """Invalidate ``post`` (its thread) and its author's profile and post list."""
+    touch(post_key(post.id), user_key(post.user_id))
+
+def bump_versions(keys):
+    now = time.time_ns()
+    _http_store.set_many({key: now for key in keys}, ttl=HTTP_VERSION_TTL)
+
+@db.event.listens_for(Session, 'after_commit')
+def _bump_touched_versions(session):
+    keys = session.info.pop('http_touched', None)
+    if keys:
+        bump_versions(keys)
+
+def _bump_leftover_versions(exc):
+    # Touches made after the last commit (or in a request that failed) are
+    # bumped anyway: an extra bump only costs a cache miss, a lost one serves stale data
+    keys = db.session.info.pop('http_touched', None)
+    if keys:
+        bump_versions(keys)
+
+def content_versions(keys):
+    """Current versions for ``keys``, starting any missing ones at now."""
+    versions = _http_store.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        _http_store.set_many(missing, ttl=HTTP_VERSION_TTL)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+def cached_body(etag):
+    body = _response_bodies.get(etag)
+    if body is None and _http_store_shared:
+        body = _http_store.get(f'body:{etag}')
+        if body is not None:
+            _response_bodies.set(etag, body)
+    return body
+
+def store_body(etag, body):
+    _response_bodies.set(etag, body)
+    if _http_store_shared:
+        _http_store.set(f'body:{etag}', body, ttl=current_app.config['HTTP_CACHE_TTL'])
+
+def clear_http_cache():
+    """Forget every cached version and body (after bulk imports or schema changes)."""
+    _http_store.clear()
+    _response_bodies.clear()
+    _username_ids.clear()
+
+def user_id_for_username(username):
+    user_id = _username_ids.get(username)
+    if user_id is None:
+        user_id = db.session.query(User.id).filter_by(username=username).scalar()
+        if user_id is not None:
+            _username_ids.set(username, user_id)
+    return user_id
+
+def http_cached(version_keys, private=False, refresh_every=None):
+    """Serve a GET endpoint through the version-keyed response cache.
+
+    ``version_keys(**view_args)`` returns the version keys the response
+    depends on, or None to bypass the cache for this request. Private
+    responses are per viewer; ``refresh_every`` (the config key of a number of
+    seconds) also rolls the ETag
+    for content that changes with time alone, like expiring stories.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            keys = version_keys(**kwargs)
+            if keys is None:
+                return f(*args, **kwargs)
+            versions = content_versions(keys)
+            if current_app.config['DATABASE_REPLICA_URL'] and g.get('use_replica') and \
+                    time.time_ns() - max(versions) < current_app.config['REPLICA_STICKY_SECONDS'] * 10**9:
+                # The replica may not have replayed this change yet; don't pin its answer to the new version
+                return f(*args, **kwargs)
+            epoch = int(time.time() // current_app.config[refresh_every]) if refresh_every else 0
+            etag = hashlib.sha256(repr((request.full_path, keys, versions, epoch)).encode()).hexdigest()[:32]
+            if request.if_none_match.contains_weak(etag):
+                resp = current_app.response_class(status=304)
+            else:
+                body = cached_body(etag)
+                if body is not None:
+                    resp = current_app.response_class(body, mimetype='application/json')
+                else:
+                    resp = current_app.make_response(f(*args, **kwargs))
+                    if resp.status_code != 200:
+                        return resp
+                    if not resp.is_streamed:  # streamed bodies aren't held; revalidation still works
+                        store_body(etag, resp.get_data())
+            resp.set_etag(etag, weak=True)
+            resp.headers['Cache-Control'] = 'private, no-cache' if private else 'public, no-cache'
+            resp.vary.add('Authorization')
+            return resp
+        return wrapper
+    return decorator
+
+def _profile_versions(username):
+    user_id = user_id_for_username(username)
+    return None if user_id is None else [user_key(user_id)]
+
+def _user_posts_versions(username):
+    if request.headers.get('Authorization'):
+        return None  # likedByMe differs per viewer
+    return _profile_versions(username)
+
+def _comments_versions(post_id):
+    return [post_key(post_id)]
+
+def _stories_versions():
+    return [stories_key(optional_user_id() or 0)]
+
 ############################
 # Auth Routes
 ############################
-@app.route('/api/auth/signup', methods=['POST'])
-@app.route('/api/signup', methods=['POST'])  # alias for current frontend
+@bp.route('/api/auth/signup', methods=['POST'])
+@bp.route('/api/signup', methods=['POST'])  # alias for current frontend
 def api_signup():
     data = request.get_json() or {}
     first = data.get('firstName')
@@ -193,7 +1343,7 @@ def api_signup():
     user = User(
         email=email,
         username=username,
-        password_hash=generate_password_hash(password)
+        password_hash=hash_password(password)
     )
     db.session.add(user)
     db.session.flush()
@@ -206,13 +1356,14 @@ def api_signup():
         dob=dob
     )
     db.session.add(prof)
+    db.session.add(NotificationCounter(user_id=user.id))
     db.session.commit()
 
     token = create_token(user.id, email, username)
     return jsonify({'message': 'Signup successful', 'token': token, 'username': username})
 
-@app.route('/api/auth/login', methods=['POST'])
-@app.route('/api/login', methods=['POST'])  # alias for current frontend
+@bp.route('/api/auth/login', methods=['POST'])
+@bp.route('/api/login', methods=['POST'])  # alias for current frontend
 def api_login():
     data = request.get_json() or {}
     email = data.get('email') or data.get('username')  # support either field
@@ -221,13 +1372,21 @@ def api_login():
         return jsonify({'message': 'Email/Username and password required'}), 400
 
     user = User.query.filter((User.email == email) | (User.username == email)).first()
-    if not user or not check_password_hash(user.password_hash, password):
+    if not user:
+        return jsonify({'message': 'Invalid credentials'}), 401
+    user_id, user_email, username = user.id, user.email, user.username
+    ok, new_hash = verify_password(user.password_hash, password)
+    if not ok:
         return jsonify({'message': 'Invalid credentials'}), 401
+    if new_hash:
+        # Stored with older hash parameters; re-hashed while we had the password
+        User.query.filter_by(id=user_id).update({'password_hash': new_hash}, synchronize_session=False)
+        db.session.commit()
 
-    token = create_token(user.id, user.email, user.username)
-    return jsonify({'message': 'Login successful', 'token': token, 'username': user.username})
+    token = create_token(user_id, user_email, username)
+    return jsonify({'message': 'Login successful', 'token': token, 'username': username})
 
-@app.route('/api/signup', methods=['POST'])
+@bp.route('/api/signup', methods=['POST'])
 def signup():
     data = request.get_json() or {}
     email = data.get('email') or data.get('username')  # support either field
@@ -249,7 +1408,7 @@ def signup():
     username = email if '@' not in email else email.split('@')[0]
 
     # Hash password
-    password_hash = generate_password_hash(password)
+    password_hash = hash_password(password)
 
     # Create user
     user = User(
@@ -271,6 +1430,7 @@ def signup():
         )
         db.session.add(profile)
 
+    db.session.add(NotificationCounter(user_id=user.id))
     db.session.commit()
 
     # Return success response
@@ -281,14 +1441,14 @@ def signup():
     })
 
 # Debug endpoint to inspect token issues
-@app.route('/api/auth/debug', methods=['GET'])
+@bp.route('/api/auth/debug', methods=['GET'])
 def auth_debug():
     auth_header = request.headers.get('Authorization', '')
     if not auth_header.startswith('Bearer '):
         return jsonify({'message': 'No Bearer token provided'}), 400
     token = auth_header.split(' ', 1)[1]
     try:
-        payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
         return jsonify({'ok': True, 'payload': payload})
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 401
@@ -296,7 +1456,9 @@ def auth_debug():
 ############################
 # Profile Routes
 ############################
-@app.route('/api/profile/<username>', methods=['GET'])
+@bp.route('/api/profile/<username>', methods=['GET'])
+@replica_reads
+@http_cached(_profile_versions)
 def get_profile(username):
     user = User.query.filter_by(username=username).first()
     if not user:
@@ -310,102 +1472,515 @@ def get_profile(username):
         'bio': prof.bio if prof else None,
         'gender': prof.gender if prof else None,
         'dob': prof.dob if prof else None,
-        'friendsCount': 0,
+        'friendsCount': len(friend_ids(user.id)),
         'profilePicUrl': prof.profile_pic_url if prof else None,
         'coverPicUrl': prof.cover_pic_url if prof else None,
         'postsCount': posts_count
     })
 
-@app.route('/api/users/search', methods=['GET'])
+def _search_user_candidates(q, key):
+    """Run the ranked user search for a type-ahead cache miss; return ``(candidates, complete)``."""
+    query = db.session.query(User.id, User.username, User.email, Profile.first_name, Profile.surname).outerjoin(
+        Profile, Profile.user_id == User.id)
+    if full_text_search_enabled():
+        query = query.join(users_fts, users_fts.c.rowid == User.id).filter(
+            literal_column('users_fts').op('MATCH')(fts_query(key))).order_by(USER_SEARCH_RANK)
+    else:
+        query = query.filter(User.username.ilike(f'{like_escape(q)}%', escape='\\')).order_by(User.username)
+    rows = query.limit(TYPEAHEAD_CANDIDATES + 1).all()
+    candidates = []
+    for user_id, username, email, first_name, surname in rows[:TYPEAHEAD_CANDIDATES]:
+        name = f"{(first_name or '').strip()} {(surname or '').strip()}".strip()
+        candidates.append(Candidate(user_id, username, email, name or username,
+                                    search_terms(username, first_name, surname)))
+    return candidates, len(rows) <= TYPEAHEAD_CANDIDATES
+
+@bp.route('/api/users/search', methods=['GET'])
+@replica_reads
 def search_users():
+    """Type-ahead user search: each word prefix-matches username, first name or surname."""
     q = (request.args.get('q') or '').strip()
-    if not q:
+    key = ' '.join(search_terms(q))
+    if not key:
         return jsonify({'users': []})
-    # Simple LIKE search; for sqlite use case-insensitive LIKE
-    pattern = f"%{q}%"
-    users = User.query.filter((User.username.ilike(pattern)) | (User.email.ilike(pattern))).limit(10).all()
-    results = []
-    for u in users:
-        results.append({
-            'username': u.username,
-            'email': u.email
-        })
-    return jsonify({'users': results})
+    candidates = _typeahead_cache.lookup(key)
+    if candidates is None:
+        candidates, complete = _search_user_candidates(q, key)
+        _typeahead_cache.store(key, candidates, complete)
+    return jsonify({'users': [
+        {'username': c.username, 'email': c.email, 'name': c.name} for c in candidates[:TYPEAHEAD_RESULTS]
+    ]})
+
+@bp.route('/api/users/search/stats', methods=['GET'])
+@auth_required
+def search_cache_stats():
+    """Type-ahead cache counters for this worker process, for sizing the cache."""
+    return jsonify(_typeahead_cache.stats())
 
 ############################
-# Posts Routes
+# Feed Assembly
 ############################
-@app.route('/api/posts', methods=['GET'])
-def list_posts():
-    # Try to detect current user (optional)
-    current_user_id = None
-    auth_header = request.headers.get('Authorization', '')
-    if auth_header.startswith('Bearer '):
-        token = auth_header.split(' ', 1)[1]
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            # sub stored as string
-            current_user_id = int(payload.get('sub'))
-        except Exception:
-            current_user_id = None
-    # Pagination params
+def media_json(m):
+    item = {'type': m.media_type, 'url': m.media_url}
+    if m.variants:
+        variants = json.loads(m.variants)
+        item['srcset'] = ', '.join(f"{v['url']} {v['width']}w" for v in variants)
+    if m.poster_url:
+        item['poster'] = m.poster_url
+    return item
+
+def encode_cursor(row):
+    """Opaque keyset cursor for a post or comment: its ``(created_at, id)``."""
+    raw = f'{row.created_at.isoformat()}|{row.id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` from a cursor; raise ValueError if malformed."""
     try:
-        page = int(request.args.get('page', 1))
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, post_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(post_id)
     except Exception:
-        page = 1
+        raise ValueError('Invalid cursor')
+
+def page_limit(default=10, maximum=50, name='limit'):
+    """Read a positive count query argument, falling back to ``default`` if invalid."""
     try:
-        limit = int(request.args.get('limit', 10))
+        limit = int(request.args.get(name, default))
     except Exception:
-        limit = 10
+        limit = default
+    if limit < 1 or limit > maximum:
+        limit = default
+    return limit
+
+def paginate_posts(query, *options):
+    """Apply the request's pagination to a Post query; return ``(posts, meta)``.
+
+    Page mode (``?page=N``) keeps OFFSET for the current frontend. Cursor
+    mode (``?cursor=`` for the first page, then ``nextCursor``) seeks on
+    ``(created_at, id)``. ``posts`` is a fetch_rows() iterator, which fills in
+    ``meta`` once it is exhausted. Raises ValueError for a malformed cursor.
+    """
+    try:
+        page = int(request.args.get('page', 1))
+    except Exception:
+        page = 1
     if page < 1:
         page = 1
-    if limit < 1 or limit > 50:
-        limit = 10
-
-    base_q = Post.query.order_by(Post.created_at.desc())
-    total = base_q.count()
-    offset = (page - 1) * limit
-    posts = base_q.offset(offset).limit(limit).all()
+    limit = list_limit()
+
+    query = query.order_by(Post.created_at.desc(), Post.id.desc())
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        if cursor:
+            created_at, post_id = decode_cursor(cursor)
+            query = query.filter(tuple_(Post.created_at, Post.id) < (created_at, post_id))
+        meta = {'limit': limit}
+        return fetch_rows(query.options(*options), limit, meta, cursor=True), meta
+
+    meta = {'page': page, 'limit': limit}
+    return fetch_rows(query.options(*options).offset((page - 1) * limit), limit, meta), meta
+
+def fetch_rows(query, limit, meta, cursor=False):
+    """Yield the first ``limit`` rows of ``query``, fetched about STREAM_CHUNK at a time.
+
+    Once exhausted, sets ``meta['hasMore']`` (from one extra row) and, with
+    ``cursor``, ``meta['nextCursor']`` for the last row yielded.
+    """
+    # One more than a chunk, so an ordinary page and its look-ahead row load
+    # (with their eager loads) as one batch
+    result = db.session.execute(query.limit(limit + 1).statement,
+                                execution_options={'yield_per': STREAM_CHUNK + 1}).scalars()
+    has_more, last = False, None
+    try:
+        for n, row in enumerate(result):
+            if n == limit:
+                has_more = True
+                break
+            last = row
+            yield row
+    finally:
+        result.close()
+    meta['hasMore'] = has_more
+    if cursor:
+        meta['nextCursor'] = encode_cursor(last) if has_more else None
+
+# Comment threads page forward, oldest first, by a (created_at, id) cursor.
+# Feeds can inline each post's newest comments with ?comments=N.
+COMMENT_PAGE_MAX = 100
+COMMENT_PREVIEW_MAX = 10
+
+def comment_authors(user_ids):
+    """Map user ID -> ``(username, profile pic URL)`` for a batch of authors, in one query."""
+    rows = db.session.query(User.id, User.username, Profile.profile_pic_url).outerjoin(
+        Profile, Profile.user_id == User.id).filter(User.id.in_(set(user_ids)))
+    return {user_id: (username, pic) for user_id, username, pic in rows}
+
+def serialize_comments(comments):
+    authors = comment_authors(c.user_id for c in comments) if comments else {}
+    resp = []
+    for c in comments:
+        username, pic = authors.get(c.user_id, (None, None))
+        resp.append({
+            'id': c.id,
+            'content': c.content,
+            'created_at': c.created_at,
+            'username': username,
+            'profilePicUrl': pic,
+        })
+    return resp
+
+def latest_comments(posts, n):
+    """Return ``{post_id: comment JSON}`` with the newest ``n`` comments of each post, oldest first.
+
+    One index seek per post (a UNION ALL of per-post LIMIT queries) rather
+    than ranking every comment of a busy thread; posts whose counter says
+    they have no comments are skipped.
+    """
+    post_ids = [p.id for p in posts if p.comments_count]
+    if not post_ids or n < 1:
+        return {}
+    newest = union_all(*[
+        select(Comment.id).where(Comment.post_id == post_id)
+        .order_by(Comment.created_at.desc(), Comment.id.desc()).limit(n).subquery().select()
+        for post_id in post_ids])
+    comments = Comment.query.filter(Comment.id.in_(newest)).order_by(
+        Comment.created_at, Comment.id).all()
+    by_post = defaultdict(list)
+    for c, item in zip(comments, serialize_comments(comments)):
+        by_post[c.post_id].append(item)
+    return by_post
+
+def serialize_posts(posts, current_user_id=None, author=None, comments=0):
+    """Build feed JSON for a page of posts.
+
+    Engagement counts come from the denormalized Post counters and likedByMe
+    from one IN query, so the query count does not depend on the page size.
+    With ``comments``, each post also carries its newest comments (two more
+    queries). Callers should eager-load ``Post.author`` (unless passing
+    ``author``) and ``Post.media``.
+    """
+    if not posts:
+        return []
+    post_ids = [p.id for p in posts]
+    liked = set()
+    if current_user_id is not None:
+        liked = {row[0] for row in db.session.query(Like.post_id).filter(
+            Like.post_id.in_(post_ids), Like.user_id == current_user_id)}
+    previews = latest_comments(posts, comments) if comments else None
     resp = []
     for p in posts:
-        likes_count = Like.query.filter_by(post_id=p.id).count()
-        comments_count = Comment.query.filter_by(post_id=p.id).count()
-        shares_count = Share.query.filter_by(post_id=p.id).count()
-        liked_by_me = False
-        if current_user_id is not None:
-            liked_by_me = Like.query.filter_by(post_id=p.id, user_id=current_user_id).first() is not None
+        u = author or p.author
         resp.append({
             'id': p.id,
             'content': p.content,
-            'created_at': p.created_at.isoformat(),
-            'username': p.author.username,
-            'email': p.author.email,
-            'likes': likes_count,
-            'comments': comments_count,
-            'shares': shares_count,
-            'likedByMe': liked_by_me,
-            'media': [{'type': m.media_type, 'url': m.media_url} for m in p.media]
+            'created_at': p.created_at,
+            'username': u.username,
+            'email': u.email,
+            'likes': p.likes_count,
+            'comments': p.comments_count,
+            'shares': p.shares_count,
+            'likedByMe': p.id in liked,
+            'media': [media_json(m) for m in p.media]
         })
-    has_more = (offset + len(resp)) < total
-    return jsonify({'posts': resp, 'page': page, 'limit': limit, 'hasMore': has_more})
+        if previews is not None:
+            resp[-1]['latestComments'] = previews.get(p.id, [])
+    return resp
+
+def comment_preview_count():
+    """How many newest comments to inline per post (``?comments=N``), 0 by default."""
+    return page_limit(0, COMMENT_PREVIEW_MAX, 'comments')
+
+# List endpoints can stream with ?stream=json (the usual JSON object, written
+# out as it is built) or ?stream=ndjson (one item per line, then a last line of
+# {"meta": {...}}). Rows are fetched (fetch_rows()), serialized and encoded
+# STREAM_CHUNK at a time, so a streamed page may be larger (up to
+# STREAM_LIMIT_MAX) while only one chunk of its rows and JSON is held at once.
+STREAM_FORMATS = {'json': 'application/json', 'ndjson': 'application/x-ndjson'}
+STREAM_CHUNK = 50
+
+def stream_format():
+    """The streaming format the request asked for, or None."""
+    fmt = request.args.get('stream')
+    return fmt if fmt in STREAM_FORMATS else None
+
+def list_limit(default=10, maximum=50):
+    """page_limit(), allowing up to STREAM_LIMIT_MAX items when streaming."""
+    return page_limit(default, current_app.config['STREAM_LIMIT_MAX'] if stream_format() else maximum)
+
+def chunked(rows, serialize):
+    """Yield ``serialize(batch)`` for consecutive STREAM_CHUNK-row batches of the iterable ``rows``."""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, STREAM_CHUNK))
+        if not batch:
+            return
+        yield serialize(batch)
+
+def list_response(key, chunks, meta):
+    """Respond with ``{key: [items...], **meta}``, streamed if the request asked.
+
+    ``chunks`` yields lists of items (see chunked()). ``meta`` is a dict,
+    written after the items, so a fetch_rows() source may fill it in.
+    """
+    fmt = stream_format()
+    if fmt is None:
+        return jsonify({key: [item for chunk in chunks for item in chunk], **meta})
+    dumpb = current_app.json.dumpb
+
+    def ndjson():
+        for chunk in chunks:
+            yield b''.join(dumpb(item) + b'\n' for item in chunk)
+        yield dumpb({'meta': meta}) + b'\n'
+
+    def json_array():
+        yield b'{' + dumpb(key) + b':['
+        sep = b''
+        for chunk in chunks:
+            if chunk:
+                yield sep + b','.join(dumpb(item) for item in chunk)
+                sep = b','
+        tail = dumpb(meta)
+        yield b']' + (b',' + tail[1:] if tail != b'{}' else b'}')
+
+    body = ndjson() if fmt == 'ndjson' else json_array()
+    return current_app.response_class(stream_with_context(body), mimetype=STREAM_FORMATS[fmt])
 
 ############################
-# Friends & Notifications
+# Engagement Writes
 ############################
+# Likes and shares are written with upserts against the (post_id, user_id)
+# unique indexes, so racing requests can neither double-insert nor fail.
+# A batch of operations is netted out per (kind, post, user) first: with the
+# write-behind buffer on, a hot post's toggles from every request thread cost
+# one INSERT, one DELETE and one counter UPDATE per interval.
+EngagementOp = namedtuple('EngagementOp', 'kind post_id user_id username want')
+ENGAGEMENT_KINDS = {
+    'like': (Like, Post.likes_count),
+    'share': (Share, Post.shares_count),
+}
+
+def apply_engagement(ops):
+    """Apply like/share operations in one transaction; return a result per op.
+
+    ``want`` is the state to set (True/False) or None to toggle. Each result
+    is ``(state, count)``: the user's state right after their operation and
+    the post's count as committed, or None if the post does not exist.
+    """
+    owners = dict(db.session.query(Post.id, Post.user_id).filter(Post.id.in_({op.post_id for op in ops})))
+    user_ids = {op.user_id for op in ops}
+    existing = {}  # (kind, post_id, user_id) -> (row id, created_at)
+    for kind in {op.kind for op in ops}:
+        model = ENGAGEMENT_KINDS[kind][0]
+        rows = db.session.query(model.id, model.post_id, model.user_id, model.created_at).filter(
+            model.post_id.in_(owners), model.user_id.in_(user_ids))
+        existing.update({(kind, post_id, user_id): (row_id, created_at)
+                         for row_id, post_id, user_id, created_at in rows})
+
+    final, states = {}, []
+    for op in ops:
+        if op.post_id not in owners:
+            states.append(None)
+            continue
+        key = (op.kind, op.post_id, op.user_id)
+        current = final.get(key, key in existing)
+        final[key] = not current if op.want is None else op.want
+        states.append(final[key])
 
-def _get_current_user():
-    username = request.user.get('username')
-    user = User.query.filter_by(username=username).first()
-    return user
+    now = datetime.utcnow()
+    deltas = defaultdict(int)  # (kind, post_id) -> change in count
+    new_likes = []
+    for kind, (model, _) in ENGAGEMENT_KINDS.items():
+        add = [{'post_id': p, 'user_id': u, 'created_at': now}
+               for (k, p, u), state in final.items() if k == kind and state and (k, p, u) not in existing]
+        remove = [existing[key][0] for key, state in final.items()
+                  if key[0] == kind and not state and key in existing]
+        if add:
+            # Rows another process inserted since the read above are skipped
+            stmt = upsert(model).values(add).on_conflict_do_nothing(index_elements=['post_id', 'user_id'])
+            for post_id, user_id in db.session.execute(stmt.returning(model.post_id, model.user_id)):
+                deltas[kind, post_id] += 1
+                if kind == 'like' and owners[post_id] != user_id:
+                    new_likes.append((post_id, user_id))
+        if remove:
+            stmt = delete(model).where(model.id.in_(remove))
+            for post_id, user_id, created_at in db.session.execute(
+                    stmt.returning(model.post_id, model.user_id, model.created_at)):
+                deltas[kind, post_id] -= 1
+                if kind == 'like' and owners[post_id] != user_id:
+                    bump_notification_counter(owners[post_id], NotificationCounter.new_likes, -1,
+                                              created_at=created_at)
+
+    for (kind, post_id), delta in deltas.items():
+        if delta:
+            bump_counter(post_id, ENGAGEMENT_KINDS[kind][1], delta)
+            touch(post_key(post_id), user_key(owners[post_id]))
+    liked_owners = defaultdict(int)
+    for post_id, _ in new_likes:
+        liked_owners[owners[post_id]] += 1
+    for owner_id, n in liked_owners.items():
+        bump_notification_counter(owner_id, NotificationCounter.new_likes, n)
+    counts = {row.id: {'like': row.likes_count, 'share': row.shares_count} for row in
+              db.session.query(Post.id, Post.likes_count, Post.shares_count).filter(Post.id.in_(owners))}
+    db.session.commit()
+
+    usernames = {op.user_id: op.username for op in ops}
+    for post_id, user_id in new_likes:
+        notify_user(owners[post_id], 'like', postId=post_id, username=usernames[user_id])
+    return [None if state is None else (state, counts[op.post_id][op.kind])
+            for op, state in zip(ops, states)]
+
+def _apply_engagement_batch(ops):
+    with app.app_context():
+        return apply_engagement(ops)
+
+engagement_buffer = None  # a WriteBuffer when ENGAGEMENT_WRITE_BEHIND_MS > 0, set by create_app()
+
+def write_engagement(op):
+    """Apply one like/share operation, through the write-behind buffer if enabled."""
+    if engagement_buffer is None:
+        return apply_engagement([op])[0]
+    # Give back this request's pooled connection while it waits, or enough
+    # waiting requests would leave the buffer thread no connection to write with
+    db.session.close()
+    result = engagement_buffer.submit(op)
+    g.wrote_primary = True  # committed by the buffer thread, outside this request's session
+    return result
+
+############################
+# Posts Routes
+############################
+@bp.route('/api/posts', methods=['GET'])
+@replica_reads
+def list_posts():
+    current_user_id = optional_user_id()
+    try:
+        posts, meta = paginate_posts(Post.query, joinedload(Post.author), selectinload(Post.media))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    comments = comment_preview_count()
+    return list_response('posts', chunked(posts, lambda batch: serialize_posts(
+        batch, current_user_id, comments=comments)), meta)
+
+@bp.route('/api/posts/search', methods=['GET'])
+def search_posts():
+    """Posts whose content matches every word of ``q`` (prefix match), best first."""
+    current_user_id = optional_user_id()
+    q = (request.args.get('q') or '').strip()
+    match = fts_query(q)
+    if not match:
+        return jsonify({'posts': [], 'hasMore': False})
+    limit = page_limit()
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+    except Exception:
+        page = 1
+    query = Post.query.options(joinedload(Post.author), selectinload(Post.media))
+    if full_text_search_enabled():
+        query = query.join(posts_fts, posts_fts.c.rowid == Post.id).filter(
+            literal_column('posts_fts').op('MATCH')(match)).order_by(posts_fts.c.rank)
+    else:
+        query = query.filter(Post.content.ilike(f'%{like_escape(q)}%', escape='\\')).order_by(
+            Post.created_at.desc(), Post.id.desc())
+    rows = query.offset((page - 1) * limit).limit(limit + 1).all()
+    posts = rows[:limit]
+    return jsonify({
+        'posts': serialize_posts(posts, current_user_id, comments=comment_preview_count()),
+        'page': page,
+        'limit': limit,
+        'hasMore': len(rows) > limit,
+    })
+
+@bp.route('/api/feed', methods=['GET'])
+@auth_required
+def home_feed():
+    """The caller's home timeline: their own and their friends' posts, newest first.
+
+    Cursor-paginated like ``/api/posts?cursor=``. Pages come from the
+    fanned-out timeline, merged with recent posts of celebrity friends.
+    """
+    me = current_user()
+    if not me:
+        return jsonify({'message': 'User not found'}), 404
+    limit = list_limit()
+    try:
+        after = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    entries = db.session.query(TimelineEntry.post_id.label('id'), TimelineEntry.created_at).filter(
+        TimelineEntry.user_id == me.id)
+    if after:
+        entries = entries.filter(tuple_(TimelineEntry.created_at, TimelineEntry.post_id) < after)
+    refs = entries.order_by(TimelineEntry.created_at.desc(), TimelineEntry.post_id.desc()).limit(limit + 1).all()
+    celebrities = celebrity_friend_ids(me.id)
+    if celebrities:
+        pulled = db.session.query(Post.id, Post.created_at).filter(Post.user_id.in_(celebrities))
+        if after:
+            pulled = pulled.filter(tuple_(Post.created_at, Post.id) < after)
+        refs += pulled.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1).all()
+        refs = sorted({r.id: r for r in refs}.values(), key=lambda r: (r.created_at, r.id), reverse=True)
+
+    page = refs[:limit]
+    has_more = len(refs) > limit
+    comments = comment_preview_count()
+
+    def hydrate(refs):
+        # Posts are loaded a chunk at a time; the page itself is only (id, created_at) pairs
+        by_id = {p.id: p for p in Post.query.options(joinedload(Post.author), selectinload(Post.media)).filter(
+            Post.id.in_([r.id for r in refs]))}
+        return serialize_posts([by_id[r.id] for r in refs if r.id in by_id], me.id, comments=comments)
+
+    return list_response('posts', chunked(page, hydrate), {
+        'limit': limit,
+        'hasMore': has_more,
+        'nextCursor': encode_cursor(page[-1]) if has_more else None,
+    })
 
-@app.route('/api/friends/request', methods=['POST'])
+############################
+# Friends & Notifications
+############################
+NOTIFY_KEEPALIVE_SECONDS = 15
+# EventSource cannot send an Authorization header, and a token in the URL
+# would end up in access logs; streams are opened with a ticket instead
+STREAM_TICKET_SECONDS = 30
+# Sent with 503 when NOTIFY_STREAMS_MAX streams are already open in this process
+NOTIFY_STREAM_RETRY_MS = 60000
+_stream_slots = None  # a BoundedSemaphore of NOTIFY_STREAMS_MAX, created by create_app()
+
+def notify_user(user_id, event_type, **data):
+    """Push a real-time notification to ``user_id``'s open streams."""
+    event_bus.publish(user_id, {'type': event_type, 'at': datetime.utcnow().isoformat(), **data})
+
+def pending_request_between(a, b):
+    """The pending request between two users in either direction, if any."""
+    return FriendRequest.query.filter(FriendRequest.status == 'pending', or_(
+        and_(FriendRequest.from_user_id == a, FriendRequest.to_user_id == b),
+        and_(FriendRequest.from_user_id == b, FriendRequest.to_user_id == a))).first()
+
+def accept_request(fr, me):
+    """Accept ``fr`` (addressed to ``me``), commit, and notify the requester."""
+    fr.status = 'accepted'
+    add_friendship(fr.from_user_id, fr.to_user_id)
+    bump_notification_counter(me.id, NotificationCounter.pending_friend_requests, -1)
+    for user_id in (fr.from_user_id, fr.to_user_id):
+        touch(user_key(user_id), stories_key(user_id))  # friend count; each now sees the other's stories
+    db.session.commit()
+    notify_user(fr.from_user_id, 'friend_accepted', username=me.username)
+    for user_id in (fr.from_user_id, fr.to_user_id):
+        _story_tray_cache.pop(user_id)
+    enqueue_job('backfill_timelines', {'user_ids': [fr.to_user_id, fr.from_user_id]})
+    low, high = sorted((fr.from_user_id, fr.to_user_id))
+    enqueue_job('score_friendship', {'low_id': low, 'high_id': high})
+
+@bp.route('/api/friends/request', methods=['POST'])
 @auth_required
 def send_friend_request():
     data = request.get_json() or {}
     to_username = (data.get('to') or '').strip().lower()
     if not to_username:
         return jsonify({'message': 'Missing target user'}), 400
-    me = _get_current_user()
+    me = current_user()
     if not me:
         return jsonify({'message': 'User not found'}), 404
     if me.username == to_username:
@@ -413,36 +1988,31 @@ def send_friend_request():
     other = User.query.filter_by(username=to_username).first()
     if not other:
         return jsonify({'message': 'Target not found'}), 404
+    if are_friends(me.id, other.id):
+        return jsonify({'message': 'Already friends', 'status': 'friends'})
+    pending = pending_request_between(me.id, other.id)
     # If they already sent me a request pending, accept it
-    incoming = FriendRequest.query.filter_by(from_user_id=other.id, to_user_id=me.id, status='pending').first()
-    if incoming:
-        incoming.status = 'accepted'
-        db.session.commit()
+    if pending is not None and pending.from_user_id == other.id:
+        accept_request(pending, me)
         return jsonify({'message': 'Friend request accepted', 'status': 'friends'})
     # If I already sent one and it's pending, just return
-    existing = FriendRequest.query.filter_by(from_user_id=me.id, to_user_id=other.id).first()
-    if existing:
-        return jsonify({'message': 'Request already sent', 'status': existing.status})
-    # If we are already friends (any accepted request either direction)
-    accepted = FriendRequest.query.filter(
-        ((FriendRequest.from_user_id == me.id) & (FriendRequest.to_user_id == other.id) & (FriendRequest.status == 'accepted')) |
-        ((FriendRequest.from_user_id == other.id) & (FriendRequest.to_user_id == me.id) & (FriendRequest.status == 'accepted'))
-    ).first()
-    if accepted:
-        return jsonify({'message': 'Already friends', 'status': 'friends'})
+    if pending is not None:
+        return jsonify({'message': 'Request already sent', 'status': pending.status})
     fr = FriendRequest(from_user_id=me.id, to_user_id=other.id, status='pending')
     db.session.add(fr)
+    bump_notification_counter(other.id, NotificationCounter.pending_friend_requests, 1)
     db.session.commit()
+    notify_user(other.id, 'friend_request', username=me.username)
     return jsonify({'message': 'Friend request sent', 'status': 'pending'})
 
-@app.route('/api/friends/accept', methods=['POST'])
+@bp.route('/api/friends/accept', methods=['POST'])
 @auth_required
 def accept_friend_request():
     data = request.get_json() or {}
     from_username = (data.get('from') or '').strip().lower()
     if not from_username:
         return jsonify({'message': 'Missing from user'}), 400
-    me = _get_current_user()
+    me = current_user()
     if not me:
         return jsonify({'message': 'User not found'}), 404
     other = User.query.filter_by(username=from_username).first()
@@ -451,14 +2021,13 @@ def accept_friend_request():
     fr = FriendRequest.query.filter_by(from_user_id=other.id, to_user_id=me.id, status='pending').first()
     if not fr:
         return jsonify({'message': 'No pending request'}), 404
-    fr.status = 'accepted'
-    db.session.commit()
+    accept_request(fr, me)
     return jsonify({'message': 'Friend request accepted', 'status': 'friends'})
 
-@app.route('/api/friends/pending', methods=['GET'])
+@bp.route('/api/friends/pending', methods=['GET'])
 @auth_required
 def list_pending_requests():
-    me = _get_current_user()
+    me = current_user()
     if not me:
         return jsonify({'message': 'User not found'}), 404
     reqs = FriendRequest.query.filter_by(to_user_id=me.id, status='pending').order_by(FriendRequest.created_at.desc()).all()
@@ -469,11 +2038,32 @@ def list_pending_requests():
             users.append({'username': u.username, 'email': u.email})
     return jsonify({'pending': users})
 
-@app.route('/api/friends/status', methods=['GET'])
+@bp.route('/api/friends/suggestions', methods=['GET'])
+@auth_required
+def friend_suggestions():
+    """People you may know: non-friends ranked by mutual friends."""
+    me = current_user()
+    if not me:
+        return jsonify({'message': 'User not found'}), 404
+    # Users with a request pending either way already show up elsewhere
+    pending = db.session.query(FriendRequest.from_user_id, FriendRequest.to_user_id).filter(
+        FriendRequest.status == 'pending',
+        or_(FriendRequest.from_user_id == me.id, FriendRequest.to_user_id == me.id))
+    exclude = {b if a == me.id else a for a, b in pending}
+    rows = db.session.query(User.username, User.email, FriendSuggestion.mutual_count).join(
+        User, User.id == FriendSuggestion.candidate_id).filter(FriendSuggestion.user_id == me.id)
+    if exclude:
+        rows = rows.filter(FriendSuggestion.candidate_id.notin_(exclude))
+    rows = rows.order_by(FriendSuggestion.mutual_count.desc(), FriendSuggestion.candidate_id.desc()).limit(page_limit())
+    return jsonify({'suggestions': [
+        {'username': username, 'email': email, 'mutualFriends': mutual} for username, email, mutual in rows
+    ]})
+
+@bp.route('/api/friends/status', methods=['GET'])
 @auth_required
 def friend_status():
     target = (request.args.get('user') or '').strip().lower()
-    me = _get_current_user()
+    me = current_user()
     if not me:
         return jsonify({'status': 'none'})
     if not target or target == me.username:
@@ -481,100 +2071,136 @@ def friend_status():
     other = User.query.filter_by(username=target).first()
     if not other:
         return jsonify({'status': 'none'})
-    # accepted either direction
-    accepted = FriendRequest.query.filter(
-        ((FriendRequest.from_user_id == me.id) & (FriendRequest.to_user_id == other.id) & (FriendRequest.status == 'accepted')) |
-        ((FriendRequest.from_user_id == other.id) & (FriendRequest.to_user_id == me.id) & (FriendRequest.status == 'accepted'))
-    ).first()
-    if accepted:
-        return jsonify({'status': 'friends'})
-    outgoing = FriendRequest.query.filter_by(from_user_id=me.id, to_user_id=other.id, status='pending').first()
-    if outgoing:
-        return jsonify({'status': 'pending_outgoing'})
-    incoming = FriendRequest.query.filter_by(from_user_id=other.id, to_user_id=me.id, status='pending').first()
-    if incoming:
-        return jsonify({'status': 'pending_incoming'})
-    return jsonify({'status': 'none'})
-
-@app.route('/api/notifications/summary', methods=['GET'])
+    mutual = mutual_friend_count(me.id, other.id)
+    if are_friends(me.id, other.id):
+        return jsonify({'status': 'friends', 'mutualFriends': mutual})
+    pending = pending_request_between(me.id, other.id)
+    if pending is None:
+        status = 'none'
+    elif pending.from_user_id == me.id:
+        status = 'pending_outgoing'
+    else:
+        status = 'pending_incoming'
+    return jsonify({'status': status, 'mutualFriends': mutual})
+
+def _notification_summary(counter):
+    if counter is None:
+        return {'pendingFriendRequests': 0, 'newLikes': 0, 'newComments': 0}
+    return {
+        'pendingFriendRequests': counter.pending_friend_requests,
+        'newLikes': counter.new_likes,
+        'newComments': counter.new_comments,
+    }
+
+@bp.route('/api/notifications/summary', methods=['GET'])
 @auth_required
 def notifications_summary():
-    me = _get_current_user()
+    # Unread likes/comments since the last POST /api/notifications/seen; the
+    # legacy ?since= parameter is accepted and ignored.
+    me = current_user()
     if not me:
-        return jsonify({'pendingFriendRequests': 0, 'newLikes': 0, 'newComments': 0})
-    since_raw = request.args.get('since')
-    try:
-        since = datetime.fromisoformat(since_raw.replace('Z', '+00:00')) if since_raw else None
-    except Exception:
-        since = None
-    # pending friend requests to me
-    pending_count = FriendRequest.query.filter_by(to_user_id=me.id, status='pending').count()
-    # likes/comments on my posts since time
-    new_likes = 0
-    new_comments = 0
-    if since is not None:
-        my_posts = Post.query.with_entities(Post.id).filter_by(user_id=me.id).subquery()
-        new_likes = Like.query.filter(Like.post_id.in_(my_posts), Like.created_at > since).count()
-        new_comments = Comment.query.filter(Comment.post_id.in_(my_posts), Comment.created_at > since).count()
-    return jsonify({'pendingFriendRequests': pending_count, 'newLikes': new_likes, 'newComments': new_comments})
-
-@app.route('/api/users/<username>/posts', methods=['GET'])
+        return jsonify(_notification_summary(None))
+    return jsonify(_notification_summary(db.session.get(NotificationCounter, me.id)))
+
+@bp.route('/api/notifications/seen', methods=['POST'])
+@auth_required
+def mark_notifications_seen():
+    me = current_user()
+    if not me:
+        return jsonify({'message': 'User not found'}), 404
+    counter = db.session.get(NotificationCounter, me.id)
+    if counter is None:
+        counter = NotificationCounter(user_id=me.id)
+        db.session.add(counter)
+    counter.new_likes = 0
+    counter.new_comments = 0
+    counter.seen_at = datetime.utcnow()
+    db.session.commit()
+    return jsonify(_notification_summary(counter))
+
+def _ticket_hash(ticket):
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+@bp.route('/api/notifications/stream-ticket', methods=['POST'])
+@auth_required
+def notifications_stream_ticket():
+    """A ticket for ``/api/notifications/stream?ticket=``, valid once within STREAM_TICKET_SECONDS."""
+    me = current_user()
+    if not me:
+        return jsonify({'message': 'User not found'}), 404
+    now = datetime.utcnow()
+    ticket = secrets.token_urlsafe(32)
+    StreamTicket.query.filter(StreamTicket.expires_at <= now).delete(synchronize_session=False)
+    db.session.add(StreamTicket(ticket_hash=_ticket_hash(ticket), user_id=me.id,
+                                expires_at=now + timedelta(seconds=STREAM_TICKET_SECONDS)))
+    db.session.commit()
+    return jsonify({'ticket': ticket, 'expiresIn': STREAM_TICKET_SECONDS})
+
+def redeem_stream_ticket(ticket):
+    """Consume ``ticket``; return its user ID, or None if unknown, used or expired."""
+    user_id = db.session.execute(delete(StreamTicket).where(
+        StreamTicket.ticket_hash == _ticket_hash(ticket), StreamTicket.expires_at > datetime.utcnow(),
+    ).returning(StreamTicket.user_id)).scalar()
+    db.session.commit()
+    return user_id
+
+@bp.route('/api/notifications/stream', methods=['GET'])
+def notifications_stream():
+    """Server-Sent Events stream of friend-request, like and comment events.
+
+    Browsers authenticate with ``?ticket=`` from /api/notifications/stream-ticket;
+    other clients may send the Authorization header. Clients load
+    /api/notifications/summary once and then apply these events.
+    """
+    user_id = optional_user_id()
+    if user_id is None and request.args.get('ticket'):
+        user_id = redeem_stream_ticket(request.args['ticket'])
+    if user_id is None:
+        return jsonify({'message': 'Missing or invalid token'}), 401
+    # Each open stream holds a request thread until the client goes away, so
+    # cap them to leave threads for the API; turned-away clients poll instead
+    if not _stream_slots.acquire(blocking=False):
+        return Response(f'retry: {NOTIFY_STREAM_RETRY_MS}\n\n', status=503, mimetype='text/event-stream',
+                        headers={'Retry-After': str(NOTIFY_STREAM_RETRY_MS // 1000)})
+    sub = event_bus.subscribe(user_id)
+
+    def stream():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                event = sub.get(timeout=NOTIFY_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            event_bus.unsubscribe(sub)
+
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    # Runs even if the client leaves before the stream starts
+    response.call_on_close(_stream_slots.release)
+    return response
+
+@bp.route('/api/users/<username>/posts', methods=['GET'])
+@http_cached(_user_posts_versions)
 def list_user_posts(username):
     user = User.query.filter_by(username=username).first()
     if not user:
         return jsonify({'message': 'User not found'}), 404
     # Optional current user detection for likedByMe
-    current_user_id = None
-    auth_header = request.headers.get('Authorization', '')
-    if auth_header.startswith('Bearer '):
-        token = auth_header.split(' ', 1)[1]
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user_id = int(payload.get('sub'))
-        except Exception:
-            current_user_id = None
-    # Pagination params
-    try:
-        page = int(request.args.get('page', 1))
-    except Exception:
-        page = 1
+    current_user_id = optional_user_id()
     try:
-        limit = int(request.args.get('limit', 10))
-    except Exception:
-        limit = 10
-    if page < 1:
-        page = 1
-    if limit < 1 or limit > 50:
-        limit = 10
-
-    base_q = Post.query.filter_by(user_id=user.id).order_by(Post.created_at.desc())
-    total = base_q.count()
-    offset = (page - 1) * limit
-    posts = base_q.offset(offset).limit(limit).all()
-    resp = []
-    for p in posts:
-        likes_count = Like.query.filter_by(post_id=p.id).count()
-        comments_count = Comment.query.filter_by(post_id=p.id).count()
-        shares_count = Share.query.filter_by(post_id=p.id).count()
-        liked_by_me = False
-        if current_user_id is not None:
-            liked_by_me = Like.query.filter_by(post_id=p.id, user_id=current_user_id).first() is not None
-        resp.append({
-            'id': p.id,
-            'content': p.content,
-            'created_at': p.created_at.isoformat(),
-            'username': user.username,
-            'email': user.email,
-            'likes': likes_count,
-            'comments': comments_count,
-            'shares': shares_count,
-            'likedByMe': liked_by_me,
-            'media': [{'type': m.media_type, 'url': m.media_url} for m in p.media]
-        })
-    has_more = (offset + len(resp)) < total
-    return jsonify({'posts': resp, 'page': page, 'limit': limit, 'hasMore': has_more})
-
-@app.route('/api/posts', methods=['POST'])
+        posts, meta = paginate_posts(Post.query.filter_by(user_id=user.id), selectinload(Post.media))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    comments = comment_preview_count()
+    return list_response('posts', chunked(posts, lambda batch: serialize_posts(
+        batch, current_user_id, author=user, comments=comments)), meta)
+
+@bp.route('/api/posts', methods=['POST'])
 @auth_required
 def create_post():
     data = request.get_json() or {}
@@ -584,9 +2210,7 @@ def create_post():
     if not content and not media_urls:
         return jsonify({'message': 'Content or media is required'}), 400
 
-    # request.user['username'] is available; find user
-    username = request.user.get('username')
-    user = User.query.filter_by(username=username).first()
+    user = current_user()
     if not user:
         return jsonify({'message': 'User not found'}), 404
 
@@ -605,66 +2229,76 @@ def create_post():
                 file_size=media_url.get('size', 0)
             )
             db.session.add(media)
+    retain_media(m['url'] for m in media_urls if m.get('url'))
+    attach_processed_media(post.media)
+    db.session.add(TimelineEntry(user_id=user.id, post_id=post.id, created_at=post.created_at))
+    touch(user_key(user.id))
 
     db.session.commit()
-
-    # Get updated counts
-    likes_count = Like.query.filter_by(post_id=post.id).count()
-    comments_count = Comment.query.filter_by(post_id=post.id).count()
+    enqueue_job('fan_out_post', {'post_id': post.id})
 
     return jsonify({'message': 'Post created', 'post': {
         'id': post.id,
         'content': post.content,
-        'created_at': post.created_at.isoformat(),
+        'created_at': post.created_at,
         'username': user.username,
         'email': user.email,
-        'likes': likes_count,
-        'comments': comments_count,
-        'media': [{'type': m.media_type, 'url': m.media_url} for m in post.media]
+        'likes': post.likes_count,
+        'comments': post.comments_count,
+        'media': [media_json(m) for m in post.media]
     }})
 
-@app.route('/api/posts/<int:post_id>/like', methods=['POST'])
+@bp.route('/api/posts/<int:post_id>/like', methods=['POST'])
 @auth_required
 def toggle_like(post_id):
-    # Find current user
-    username = request.user.get('username')
-    user = User.query.filter_by(username=username).first()
+    """Toggle the current user's like, or set it with ``{"liked": true|false}``.
+
+    Setting is idempotent, so a client can safely retry it.
+    """
+    user = current_user()
     if not user:
         return jsonify({'message': 'User not found'}), 404
-    post = Post.query.get(post_id)
-    if not post:
+    want = (request.get_json(silent=True) or {}).get('liked')
+    if want is not None and not isinstance(want, bool):
+        return jsonify({'message': 'liked must be true or false'}), 400
+    result = write_engagement(EngagementOp('like', post_id, user.id, user.username, want))
+    if result is None:
         return jsonify({'message': 'Post not found'}), 404
-    existing = Like.query.filter_by(post_id=post_id, user_id=user.id).first()
-    if existing:
-        db.session.delete(existing)
-        db.session.commit()
-        action = 'unliked'
-        liked = False
-    else:
-        like = Like(post_id=post_id, user_id=user.id)
-        db.session.add(like)
-        db.session.commit()
-        action = 'liked'
-        liked = True
-    likes_count = Like.query.filter_by(post_id=post_id).count()
-    return jsonify({'message': f'Post {action}', 'likes': likes_count, 'liked': liked})
+    liked, likes = result
+    return jsonify({'message': 'Post liked' if liked else 'Post unliked', 'likes': likes, 'liked': liked})
 
-@app.route('/api/posts/<int:post_id>/comments', methods=['GET'])
+@bp.route('/api/posts/<int:post_id>/comments', methods=['GET'])
+@replica_reads
+@http_cached(_comments_versions)
 def list_comments(post_id):
+    """A page of a post's comments, oldest first.
+
+    Pages forward with ``?cursor=`` (omit or leave empty for the first page,
+    then pass ``nextCursor``). ``?latest=N`` instead returns the newest N
+    comments, for a collapsed thread preview.
+    """
     post = Post.query.get(post_id)
     if not post:
         return jsonify({'message': 'Post not found'}), 404
-    comments = Comment.query.filter_by(post_id=post_id).order_by(Comment.created_at.asc()).all()
-    return jsonify({'comments': [
-        {
-            'id': c.id,
-            'content': c.content,
-            'created_at': c.created_at.isoformat(),
-            'username': User.query.get(c.user_id).username
-        } for c in comments
-    ]})
-
-@app.route('/api/posts/<int:post_id>/comments', methods=['POST'])
+    newest_first = (Comment.created_at.desc(), Comment.id.desc())
+    if 'latest' in request.args:
+        n = page_limit(3, COMMENT_PAGE_MAX, 'latest')
+        comments = Comment.query.filter_by(post_id=post_id).order_by(*newest_first).limit(n).all()[::-1]
+        return jsonify({'comments': serialize_comments(comments), 'total': post.comments_count,
+                        'hasMore': post.comments_count > len(comments)})
+    limit = list_limit(current_app.config['COMMENT_PAGE_SIZE'], COMMENT_PAGE_MAX)
+    query = Comment.query.filter_by(post_id=post_id).order_by(Comment.created_at, Comment.id)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, comment_id = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        query = query.filter(tuple_(Comment.created_at, Comment.id) > (created_at, comment_id))
+    meta = {'total': post.comments_count, 'limit': limit}
+    return list_response('comments', chunked(fetch_rows(query, limit, meta, cursor=True), serialize_comments), meta)
+
+@bp.route('/api/posts/<int:post_id>/comments', methods=['POST'])
 @auth_required
 def add_comment(post_id):
     post = Post.query.get(post_id)
@@ -674,49 +2308,41 @@ def add_comment(post_id):
     content = (data.get('content') or '').strip()
     if not content:
         return jsonify({'message': 'Content is required'}), 400
-    username = request.user.get('username')
-    user = User.query.filter_by(username=username).first()
+    user = current_user()
     if not user:
         return jsonify({'message': 'User not found'}), 404
     c = Comment(post_id=post_id, user_id=user.id, content=content)
     db.session.add(c)
+    bump_counter(post_id, Post.comments_count, 1)
+    touch_post(post)
+    if post.user_id != user.id:
+        bump_notification_counter(post.user_id, NotificationCounter.new_comments, 1)
     db.session.commit()
-    comments_count = Comment.query.filter_by(post_id=post_id).count()
-    return jsonify({'message': 'Comment added', 'comment': {
-        'id': c.id,
-        'content': c.content,
-        'created_at': c.created_at.isoformat(),
-        'username': user.username
-    }, 'comments': comments_count})
+    if post.user_id != user.id:
+        notify_user(post.user_id, 'comment', postId=post_id, commentId=c.id, username=user.username)
+    return jsonify({'message': 'Comment added', 'comment': serialize_comments([c])[0],
+                    'comments': post.comments_count})
 
-@app.route('/api/posts/<int:post_id>/share', methods=['POST'])
+@bp.route('/api/posts/<int:post_id>/share', methods=['POST'])
 @auth_required
 def share_post(post_id):
-    post = Post.query.get(post_id)
-    if not post:
-        return jsonify({'message': 'Post not found'}), 404
-    username = request.user.get('username')
-    user = User.query.filter_by(username=username).first()
+    user = current_user()
     if not user:
         return jsonify({'message': 'User not found'}), 404
-    # prevent duplicate shares by same user
-    existing = Share.query.filter_by(post_id=post_id, user_id=user.id).first()
-    if not existing:
-        s = Share(post_id=post_id, user_id=user.id)
-        db.session.add(s)
-        db.session.commit()
-    shares_count = Share.query.filter_by(post_id=post_id).count()
-    return jsonify({'message': 'Post shared', 'shares': shares_count, 'shared': True})
+    # sharing twice is a no-op
+    result = write_engagement(EngagementOp('share', post_id, user.id, user.username, True))
+    if result is None:
+        return jsonify({'message': 'Post not found'}), 404
+    return jsonify({'message': 'Post shared', 'shares': result[1], 'shared': True})
 
-@app.route('/api/posts/<int:post_id>', methods=['PUT'])
+@bp.route('/api/posts/<int:post_id>', methods=['PUT'])
 @auth_required
 def update_post(post_id):
     # Ensure post exists and current user is the author
     post = Post.query.get(post_id)
     if not post:
         return jsonify({'message': 'Post not found'}), 404
-    username = request.user.get('username')
-    user = User.query.filter_by(username=username).first()
+    user = current_user()
     if not user:
         return jsonify({'message': 'User not found'}), 404
     if post.user_id != user.id:
@@ -733,6 +2359,7 @@ def update_post(post_id):
     # Update media if provided
     if 'media' in data:
         # Remove existing media
+        release_media(m.media_url for m in post.media)
         PostMedia.query.filter_by(post_id=post_id).delete()
 
         # Add new media
@@ -746,38 +2373,44 @@ def update_post(post_id):
                     file_size=media_url.get('size', 0)
                 )
                 db.session.add(media)
+        retain_media(m['url'] for m in data.get('media', []) if m.get('url'))
+        db.session.flush()
+        db.session.expire(post, ['media'])
+        attach_processed_media(post.media)
 
+    touch_post(post)
     db.session.commit()
 
-    likes_count = Like.query.filter_by(post_id=post.id).count()
-    comments_count = Comment.query.filter_by(post_id=post.id).count()
-
     return jsonify({'message': 'Post updated', 'post': {
         'id': post.id,
         'content': post.content,
-        'created_at': post.created_at.isoformat(),
+        'created_at': post.created_at,
         'username': user.username,
         'email': user.email,
-        'likes': likes_count,
-        'comments': comments_count,
-        'media': [{'type': m.media_type, 'url': m.media_url} for m in post.media]
+        'likes': post.likes_count,
+        'comments': post.comments_count,
+        'media': [media_json(m) for m in post.media]
     }})
 
-@app.route('/api/posts/<int:post_id>', methods=['DELETE'])
+@bp.route('/api/posts/<int:post_id>', methods=['DELETE'])
 @auth_required
 def delete_post(post_id):
     post = Post.query.get(post_id)
     if not post:
         return jsonify({'message': 'Post not found'}), 404
-    username = request.user.get('username')
-    user = User.query.filter_by(username=username).first()
+    user = current_user()
     if not user:
         return jsonify({'message': 'User not found'}), 404
     if post.user_id != user.id:
         return jsonify({'message': 'Forbidden'}), 403
-    # cascade delete comments and likes for this post
+    release_unread_engagement(post)
+    # cascade delete comments, likes and shares for this post
     Comment.query.filter_by(post_id=post.id).delete()
     Like.query.filter_by(post_id=post.id).delete()
+    Share.query.filter_by(post_id=post.id).delete()
+    TimelineEntry.query.filter_by(post_id=post.id).delete()
+    release_media(m.media_url for m in post.media)
+    touch_post(post)
     db.session.delete(post)
     db.session.commit()
     return jsonify({'message': 'Post deleted', 'ok': True})
@@ -786,20 +2419,95 @@ def delete_post(post_id):
 # Media Upload Routes
 ############################
 
-# Configure upload folder
-UPLOAD_FOLDER = os.path.join(BASE_DIR, '..', 'uploads')
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'webm', 'ogg'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max
-
-# Create uploads directory if it doesn't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# In-progress uploads, under UPLOAD_FOLDER
+PARTIAL_DIR = '.partial'
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024  # advertised to clients
+MAX_UPLOAD_CHUNK = 8 * 1024 * 1024
+STREAM_BUFFER = 64 * 1024
+UPLOADS_URL_PREFIX = '/api/uploads/'
+VIDEO_EXTENSIONS = {'.mp4', '.webm', '.ogg'}
+# Unreferenced blobs younger than this are kept: they may be about to be posted
+MEDIA_GC_GRACE = timedelta(hours=1)
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+
+# Running SHA-256 per in-progress upload: {upload_id: (received, hasher)}.
+# Rebuilt from the partial file if a chunk lands on another worker.
+_upload_hashers = {}
+_upload_hashers_lock = threading.Lock()
 
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@app.route('/api/upload', methods=['POST'])
+def _media_type_for(ext):
+    return 'video' if ext.lower() in VIDEO_EXTENSIONS else 'image'
+
+def _blob_names(urls):
+    return [u[len(UPLOADS_URL_PREFIX):] for u in urls if u and u.startswith(UPLOADS_URL_PREFIX)]
+
+def retain_media(urls):
+    """Count a new PostMedia/Story reference to each uploaded blob in ``urls``."""
+    names = _blob_names(urls)
+    if names:
+        MediaBlob.query.filter(MediaBlob.file_name.in_(names)).update(
+            {MediaBlob.ref_count: MediaBlob.ref_count + 1}, synchronize_session=False)
+
+def release_media(urls):
+    """Drop a reference to each blob in ``urls``; ``gc-media`` removes unreferenced files."""
+    names = _blob_names(urls)
+    if names:
+        MediaBlob.query.filter(MediaBlob.file_name.in_(names)).update(
+            {MediaBlob.ref_count: MediaBlob.ref_count - 1}, synchronize_session=False)
+
+def _copy_stream(src, dst, hasher, limit=None):
+    """Copy ``src`` to ``dst`` in bounded buffers, hashing as it goes; return bytes copied."""
+    copied = 0
+    while True:
+        buf = src.read(STREAM_BUFFER)
+        if not buf:
+            return copied
+        copied += len(buf)
+        if limit is not None and copied > limit:
+            raise ValueError('Chunk too large')
+        hasher.update(buf)
+        dst.write(buf)
+
+def store_blob(tmp_path, digest, ext, size):
+    """Move a fully received temp file into content-addressed storage.
+
+    Identical content is stored once: if a blob with this digest exists the
+    temp file is discarded and the existing blob returned.
+    """
+    blob = MediaBlob.query.filter_by(sha256=digest).first()
+    if blob is not None:
+        os.remove(tmp_path)
+        db.session.commit()
+        return blob
+    file_name = f'{digest}{ext.lower()}'
+    os.replace(tmp_path, os.path.join(current_app.config['UPLOAD_FOLDER'], file_name))
+    blob = MediaBlob(sha256=digest, file_name=file_name, media_type=_media_type_for(ext), size=size)
+    db.session.add(blob)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Same content finalized concurrently by another request
+        db.session.rollback()
+        return MediaBlob.query.filter_by(sha256=digest).one()
+    enqueue_job('process_media', {'blob_id': blob.id})
+    return blob
+
+def _upload_response(blob):
+    return jsonify({
+        'message': 'File uploaded successfully',
+        'filename': blob.file_name,
+        'media_type': blob.media_type,
+        'url': f'{UPLOADS_URL_PREFIX}{blob.file_name}',
+        'sha256': blob.sha256,
+        'size': blob.size
+    })
+
+@bp.route('/api/upload', methods=['POST'])
 @auth_required
 def upload_file():
     if 'file' not in request.files:
@@ -810,28 +2518,170 @@ def upload_file():
         return jsonify({'message': 'No selected file'}), 400
 
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        # Add timestamp to avoid conflicts
-        timestamp = str(int(datetime.utcnow().timestamp()))
-        name, ext = os.path.splitext(filename)
-        filename = f"{name}_{timestamp}{ext}"
-
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
-
-        # Determine media type
-        media_type = 'video' if ext.lower() in ['.mp4', '.webm', '.ogg'] else 'image'
-
-        return jsonify({
-            'message': 'File uploaded successfully',
-            'filename': filename,
-            'media_type': media_type,
-            'url': f'/api/uploads/{filename}'
-        })
+        ext = os.path.splitext(secure_filename(file.filename))[1]
+        hasher = hashlib.sha256()
+        tmp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], PARTIAL_DIR, f'{uuid.uuid4().hex}.part')
+        with open(tmp_path, 'wb') as out:
+            size = _copy_stream(file.stream, out, hasher)
+        return _upload_response(store_blob(tmp_path, hasher.hexdigest(), ext, size))
 
     return jsonify({'message': 'File type not allowed'}), 400
 
-@app.route('/api/stories', methods=['POST'])
+############################
+# Chunked (resumable) uploads
+############################
+# POST /api/upload/chunked             {filename, size} -> {uploadId, chunkSize}
+# PUT  /api/upload/chunked/<id>        raw bytes, Upload-Offset header
+# GET  /api/upload/chunked/<id>        -> {received, size} to resume
+# POST /api/upload/chunked/<id>/finalize -> same body as /api/upload
+
+def _partial_path(upload_id):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], PARTIAL_DIR, f'{upload_id}.part')
+
+def _get_upload_session(upload_id):
+    me = current_user()
+    upload = db.session.get(UploadSession, upload_id)
+    if not me or not upload or upload.user_id != me.id:
+        return None
+    return upload
+
+def _upload_hasher(upload):
+    with _upload_hashers_lock:
+        entry = _upload_hashers.get(upload.id)
+    if entry and entry[0] == upload.received:
+        return entry[1].copy()  # a failed chunk must not advance the cached state
+    hasher = hashlib.sha256()
+    with open(_partial_path(upload.id), 'rb') as f:
+        for buf in iter(lambda: f.read(STREAM_BUFFER), b''):
+            hasher.update(buf)
+    return hasher
+
+@bp.route('/api/upload/chunked', methods=['POST'])
+@auth_required
+def init_chunked_upload():
+    data = request.get_json() or {}
+    filename = secure_filename(data.get('filename') or '')
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        size = -1
+    if not filename or not allowed_file(filename):
+        return jsonify({'message': 'File type not allowed'}), 400
+    if size <= 0 or size > current_app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'message': 'Invalid file size'}), 400
+    me = current_user()
+    if not me:
+        return jsonify({'message': 'User not found'}), 404
+    upload = UploadSession(id=uuid.uuid4().hex, user_id=me.id, file_name=filename, size=size)
+    open(_partial_path(upload.id), 'wb').close()
+    db.session.add(upload)
+    db.session.commit()
+    return jsonify({'uploadId': upload.id, 'chunkSize': UPLOAD_CHUNK_SIZE, 'received': 0}), 201
+
+@bp.route('/api/upload/chunked/<upload_id>', methods=['GET'])
+@auth_required
+def chunked_upload_status(upload_id):
+    upload = _get_upload_session(upload_id)
+    if not upload:
+        return jsonify({'message': 'Upload not found'}), 404
+    return jsonify({'uploadId': upload.id, 'received': upload.received, 'size': upload.size})
+
+@bp.route('/api/upload/chunked/<upload_id>', methods=['PUT'])
+@auth_required
+def put_upload_chunk(upload_id):
+    upload = _get_upload_session(upload_id)
+    if not upload:
+        return jsonify({'message': 'Upload not found'}), 404
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'message': 'Upload-Offset header required'}), 400
+    if offset != upload.received:
+        # Client and server disagree (e.g. a retried chunk); tell it where to resume
+        return jsonify({'message': 'Offset mismatch', 'received': upload.received}), 409
+    hasher = _upload_hasher(upload)
+    limit = min(MAX_UPLOAD_CHUNK, upload.size - offset)
+    with tempfile.SpooledTemporaryFile(max_size=STREAM_BUFFER) as chunk:
+        try:
+            written = _copy_stream(request.stream, chunk, hasher, limit=limit)
+        except ValueError:
+            return jsonify({'message': 'Chunk too large', 'received': upload.received}), 413
+        # Advance the offset as a compare-and-set: of two requests for the same
+        # offset (a retried chunk racing the original, in any worker) only one
+        # matches, and SQLite's write lock holds the other until this commits
+        claimed = UploadSession.query.filter_by(id=upload.id, received=offset).update(
+            {UploadSession.received: offset + written}, synchronize_session=False)
+        if not claimed:
+            db.session.rollback()
+            return jsonify({'message': 'Offset mismatch', 'received': upload.received}), 409
+        chunk.seek(0)
+        with open(_partial_path(upload.id), 'r+b') as out:
+            out.seek(offset)
+            try:
+                shutil.copyfileobj(chunk, out, STREAM_BUFFER)
+            except OSError:
+                out.truncate(offset)
+                db.session.rollback()
+                raise
+    db.session.commit()
+    with _upload_hashers_lock:
+        _upload_hashers[upload.id] = (offset + written, hasher)
+    return jsonify({'uploadId': upload.id, 'received': offset + written, 'size': upload.size})
+
+@bp.route('/api/upload/chunked/<upload_id>/finalize', methods=['POST'])
+@auth_required
+def finalize_chunked_upload(upload_id):
+    upload = _get_upload_session(upload_id)
+    if not upload:
+        return jsonify({'message': 'Upload not found'}), 404
+    if upload.received != upload.size:
+        return jsonify({'message': 'Upload incomplete', 'received': upload.received, 'size': upload.size}), 409
+    digest = _upload_hasher(upload).hexdigest()
+    with _upload_hashers_lock:
+        _upload_hashers.pop(upload.id, None)
+    ext = os.path.splitext(upload.file_name)[1]
+    size = upload.size
+    db.session.delete(upload)
+    return _upload_response(store_blob(_partial_path(upload_id), digest, ext, size))
+
+def collect_media_garbage(dry_run=False):
+    """Delete unreferenced blobs and abandoned upload sessions; return what was (or would be) removed."""
+    now = datetime.utcnow()
+    blobs = MediaBlob.query.filter(MediaBlob.ref_count <= 0,
+                                   MediaBlob.created_at < now - MEDIA_GC_GRACE).all()
+    sessions = UploadSession.query.filter(UploadSession.created_at < now - UPLOAD_SESSION_TTL).all()
+    if not dry_run:
+        for blob in blobs:
+            for name in [blob.file_name, blob.poster_file] + [v['file'] for v in json.loads(blob.variants or '[]')]:
+                if not name:
+                    continue
+                try:
+                    os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], name))
+                except FileNotFoundError:
+                    pass
+            db.session.delete(blob)
+        for upload in sessions:
+            try:
+                os.remove(_partial_path(upload.id))
+            except FileNotFoundError:
+                pass
+            with _upload_hashers_lock:
+                _upload_hashers.pop(upload.id, None)
+            db.session.delete(upload)
+        db.session.commit()
+    return [b.file_name for b in blobs], [u.id for u in sessions]
+
+@bp.cli.command('gc-media')
+@click.option('--dry-run', is_flag=True, help='Report what would be deleted without deleting it.')
+def gc_media_command(dry_run):
+    """Remove unreferenced media blobs and abandoned chunked uploads."""
+    blobs, sessions = collect_media_garbage(dry_run=dry_run)
+    verb = 'would remove' if dry_run else 'removed'
+    for name in blobs:
+        click.echo(f'{verb} blob {name}')
+    click.echo(f'{verb} {len(blobs)} blob(s) and {len(sessions)} upload session(s)')
+
+@bp.route('/api/stories', methods=['POST'])
 @auth_required
 def create_story():
     data = request.get_json() or {}
@@ -842,8 +2692,7 @@ def create_story():
     if not content and not media_url:
         return jsonify({'message': 'Content or media is required'}), 400
 
-    username = request.user.get('username')
-    user = User.query.filter_by(username=username).first()
+    user = current_user()
     if not user:
         return jsonify({'message': 'User not found'}), 404
 
@@ -855,7 +2704,11 @@ def create_story():
         media_url=media_url
     )
     db.session.add(story)
+    if media_url:
+        retain_media([media_url])
     db.session.commit()
+    invalidate_story_trays(user.id)
+    schedule_story_reaper()
 
     return jsonify({'message': 'Story created', 'story': {
         'id': story.id,
@@ -867,66 +2720,487 @@ def create_story():
         'username': user.username
     }})
 
-@app.route('/api/stories', methods=['GET'])
-def get_stories():
-    # Get current user for personalization
-    current_user_id = None
-    auth_header = request.headers.get('Authorization', '')
-    if auth_header.startswith('Bearer '):
-        token = auth_header.split(' ', 1)[1]
-        try:
-            payload = jwt.decode(token, app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user_id = int(payload.get('sub'))
-        except Exception:
-            current_user_id = None
+STORY_TRAY_LIMIT = 100
 
-    # Get active stories (not expired)
-    now = datetime.utcnow()
-    active_stories = Story.query.filter(Story.expires_at > now).order_by(Story.created_at.desc()).limit(20).all()
-
-    stories_data = []
-    for story in active_stories:
-        stories_data.append({
-            'id': story.id,
-            'content': story.content,
-            'media_type': story.media_type,
-            'media_url': story.media_url,
-            'created_at': story.created_at.isoformat(),
-            'expires_at': story.expires_at.isoformat(),
-            'username': story.user.username,
-            'user_id': story.user_id
-        })
+def story_json(story):
+    return {
+        'id': story.id,
+        'content': story.content,
+        'media_type': story.media_type,
+        'media_url': story.media_url,
+        'created_at': story.created_at.isoformat(),
+        'expires_at': story.expires_at.isoformat(),
+        'username': story.user.username,
+        'user_id': story.user_id
+    }
 
-    return jsonify({'stories': stories_data})
+def group_stories(stories):
+    """Group stories (newest first) per author, as the stories tray shows them.
+
+    Authors are ordered by their newest story; each author's stories play
+    oldest first.
+    """
+    groups = OrderedDict()
+    for story in stories:
+        group = groups.get(story.user_id)
+        if group is None:
+            group = groups[story.user_id] = {
+                'user_id': story.user_id,
+                'username': story.user.username,
+                'latest_at': story.created_at.isoformat(),
+                'stories': [],
+            }
+        group['stories'].append(story_json(story))
+    for group in groups.values():
+        group['stories'].reverse()
+    return list(groups.values())
+
+# Trays are cached per viewer for STORY_TRAY_TTL seconds and dropped when the
+# viewer, or anyone whose stories they see, adds or deletes a story
+_story_tray_cache = None  # created by create_app()
+
+def invalidate_story_trays(user_id):
+    """Drop cached trays that show ``user_id``'s stories."""
+    viewers = friend_ids(user_id) | {user_id}
+    for viewer_id in viewers:
+        _story_tray_cache.pop(viewer_id)
+    touch(*(stories_key(viewer_id) for viewer_id in viewers))
+
+def build_story_tray(viewer_id):
+    """The viewer's own and friends' active stories, grouped per author.
+
+    The viewer's own group comes first, then authors with unseen stories,
+    then the rest; each part is ordered by the author's newest story.
+    """
+    authors = friend_ids(viewer_id) | {viewer_id}
+    stories = Story.query.options(joinedload(Story.user)).filter(
+        Story.user_id.in_(authors), Story.expires_at > datetime.utcnow()).order_by(
+        Story.created_at.desc(), Story.id.desc()).limit(STORY_TRAY_LIMIT).all()
+    seen = set()
+    if stories:
+        seen = {row[0] for row in db.session.query(StoryView.story_id).filter(
+            StoryView.viewer_id == viewer_id, StoryView.story_id.in_([s.id for s in stories]))}
+    groups = group_stories(stories)
+    for group in groups:
+        for story in group['stories']:
+            story['seen'] = story['id'] in seen
+        group['hasUnseen'] = not all(story['seen'] for story in group['stories'])
+    groups.sort(key=lambda g: (g['user_id'] != viewer_id, not g['hasUnseen']))
+    return groups
+
+@bp.route('/api/stories', methods=['GET'])
+@replica_reads
+@http_cached(_stories_versions, private=True, refresh_every='STORY_TRAY_TTL')
+def get_stories():
+    viewer_id = optional_user_id()
+    if viewer_id is None:
+        return jsonify({'stories': [], 'users': []})
+    groups = _story_tray_cache.get(viewer_id)
+    if groups is None:
+        groups = build_story_tray(viewer_id)
+        _story_tray_cache.set(viewer_id, groups)
+    return jsonify({
+        'stories': [story for group in groups for story in group['stories']],
+        'users': groups,
+    })
 
-@app.route('/api/stories/<int:story_id>', methods=['DELETE'])
+@bp.route('/api/stories/<int:story_id>/view', methods=['POST'])
+@auth_required
+def view_story(story_id):
+    me = current_user()
+    if not me:
+        return jsonify({'message': 'User not found'}), 404
+    story = db.session.get(Story, story_id)
+    if story is None or (story.user_id != me.id and not are_friends(me.id, story.user_id)):
+        return jsonify({'message': 'Story not found'}), 404
+    if db.session.get(StoryView, (story_id, me.id)) is None:
+        db.session.add(StoryView(story_id=story_id, viewer_id=me.id))
+        try:
+            db.session.commit()
+        except IntegrityError:  # the same viewer, concurrently
+            db.session.rollback()
+        _story_tray_cache.pop(me.id)
+        touch(stories_key(me.id))
+    return jsonify({'ok': True})
+
+@bp.route('/api/stories/<int:story_id>', methods=['DELETE'])
 @auth_required
 def delete_story(story_id):
     story = Story.query.get(story_id)
     if not story:
         return jsonify({'message': 'Story not found'}), 404
 
-    username = request.user.get('username')
-    user = User.query.filter_by(username=username).first()
+    user = current_user()
     if not user or story.user_id != user.id:
         return jsonify({'message': 'Forbidden'}), 403
 
+    if story.media_url:
+        release_media([story.media_url])
+    StoryView.query.filter_by(story_id=story.id).delete()
     db.session.delete(story)
     db.session.commit()
+    invalidate_story_trays(user.id)
 
     return jsonify({'message': 'Story deleted'})
 
-@app.route('/api/uploads/<filename>')
+############################
+# Story Expiry
+############################
+# Expired stories are deleted by a self-rescheduling background job that
+# runs while any stories exist (create_story restarts it). Their media
+# references are released and unreferenced blobs are collected.
+STORY_REAP_BATCH = 500
+
+def schedule_story_reaper(delay=None):
+    if delay is None:
+        delay = current_app.config['STORY_REAP_INTERVAL']
+    enqueue_job('reap_stories', {}, delay=delay, unique=True)
+
+def ensure_story_reaper():
+    """Queue a reaper run now unless one is already queued.
+
+    The job stops rescheduling itself once no stories are left, so each worker
+    start calls this to resume after a restart or on a fresh queue file.
+    """
+    job_queue.enqueue('reap_stories', {}, unique=True)
+
+def reap_expired_stories(batch_size=STORY_REAP_BATCH, dry_run=False, now=None):
+    """Delete expired stories in batches and release their media; return metrics."""
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    expired = Story.query.filter(Story.expires_at <= now)
+    stats = {'expired': expired.count(), 'deleted': 0, 'batches': 0,
+             'mediaReleased': 0, 'blobsRemoved': 0, 'dryRun': dry_run}
+    if dry_run:
+        stats['mediaReleased'] = expired.filter(Story.media_url.isnot(None)).count()
+    else:
+        while True:
+            batch = db.session.query(Story.id, Story.media_url).filter(Story.expires_at <= now).order_by(
+                Story.expires_at).limit(batch_size).all()
+            if not batch:
+                break
+            urls = [url for _, url in batch if url]
+            release_media(urls)
+            story_ids = [story_id for story_id, _ in batch]
+            StoryView.query.filter(StoryView.story_id.in_(story_ids)).delete(synchronize_session=False)
+            Story.query.filter(Story.id.in_(story_ids)).delete(synchronize_session=False)
+            db.session.commit()
+            stats['deleted'] += len(batch)
+            stats['mediaReleased'] += len(urls)
+            stats['batches'] += 1
+        if stats['mediaReleased']:
+            blobs, _ = collect_media_garbage()
+            stats['blobsRemoved'] = len(blobs)
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    return stats
+
+@job_handler('reap_stories')
+def reap_stories_job(payload):
+    stats = reap_expired_stories()
+    log.info('story reaper: %s', stats)
+    if db.session.query(Story.id).first() is not None:
+        schedule_story_reaper()
+
+@bp.cli.command('reap-stories')
+@click.option('--dry-run', is_flag=True, help='Report what would be deleted without deleting it.')
+@click.option('--batch-size', default=STORY_REAP_BATCH, show_default=True, help='Stories deleted per transaction.')
+def reap_stories_command(dry_run, batch_size):
+    """Delete expired stories and release their media."""
+    stats = reap_expired_stories(batch_size=batch_size, dry_run=dry_run)
+    for key, value in stats.items():
+        click.echo(f'{key}: {value}')
+
+############################
+# Background Media Processing
+############################
+IMAGE_VARIANT_WIDTHS = (320, 640, 1080)
+PROCESSABLE_IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}  # GIFs keep their animation
+POSTER_WIDTH = 640
+
+def _image_variants(blob, src):
+    if Image is None:
+        log.warning('Pillow is not installed; skipping image variants for %s', blob.file_name)
+        return []
+    variant_format = 'webp' if Image.registered_extensions().get('.webp') else 'jpeg'
+    ext = 'webp' if variant_format == 'webp' else 'jpg'
+    variants = []
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img)
+        blob.width, blob.height = img.width, img.height
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+        if variant_format == 'jpeg':
+            img = img.convert('RGB')
+        for width in IMAGE_VARIANT_WIDTHS:
+            if width >= img.width:
+                break
+            height = round(img.height * width / img.width)
+            name = f'{blob.sha256}_w{width}.{ext}'
+            img.resize((width, height), Image.LANCZOS).save(
+                os.path.join(current_app.config['UPLOAD_FOLDER'], name), variant_format, quality=80)
+            variants.append({'file': name, 'width': width, 'height': height, 'format': variant_format})
+    return variants
+
+def _video_poster(blob, src):
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        log.warning('ffmpeg not found; skipping poster for %s', blob.file_name)
+        return None
+    name = f'{blob.sha256}_poster.jpg'
+    out = os.path.join(current_app.config['UPLOAD_FOLDER'], name)
+    # Prefer a frame one second in; very short clips fall back to the first frame
+    for seek in ('1', '0'):
+        subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-ss', seek, '-i', src, '-frames:v', '1',
+                        '-vf', f'scale={POSTER_WIDTH}:-2', out], timeout=120, check=False)
+        if os.path.exists(out) and os.path.getsize(out) > 0:
+            return name
+    return None
+
+def _processed_media_values(blob):
+    variants = [
+        {'url': f"{UPLOADS_URL_PREFIX}{v['file']}", 'width': v['width'], 'height': v['height'], 'format': v['format']}
+        for v in json.loads(blob.variants or '[]')
+    ]
+    if variants and blob.width:
+        # Variants are only made narrower than the original, so it tops the srcset
+        ext = os.path.splitext(blob.file_name)[1].lower().lstrip('.')
+        variants.append({'url': f'{UPLOADS_URL_PREFIX}{blob.file_name}', 'width': blob.width,
+                         'height': blob.height, 'format': 'jpeg' if ext == 'jpg' else ext})
+    return {
+        'variants': json.dumps(variants) if variants else None,
+        'poster_url': f'{UPLOADS_URL_PREFIX}{blob.poster_file}' if blob.poster_file else None,
+    }
+
+def attach_processed_media(media_rows):
+    """Copy already-computed variants/posters onto new PostMedia rows."""
+    by_name = {n: m for m in media_rows for n in _blob_names([m.media_url])}
+    if not by_name:
+        return
+    blobs = MediaBlob.query.filter(MediaBlob.file_name.in_(by_name), MediaBlob.processed_at.isnot(None))
+    for blob in blobs:
+        for key, value in _processed_media_values(blob).items():
+            setattr(by_name[blob.file_name], key, value)
+
+@job_handler('process_media')
+def process_media(payload):
+    """Build responsive variants or a poster for one blob."""
+    blob = db.session.get(MediaBlob, payload['blob_id'])
+    if blob is None or blob.processed_at is not None:
+        return
+    src = os.path.join(current_app.config['UPLOAD_FOLDER'], blob.file_name)
+    ext = os.path.splitext(blob.file_name)[1].lower()
+    if blob.media_type == 'image' and ext in PROCESSABLE_IMAGE_EXTENSIONS:
+        blob.variants = json.dumps(_image_variants(blob, src))
+    elif blob.media_type == 'video':
+        blob.poster_file = _video_poster(blob, src)
+    blob.processed_at = datetime.utcnow()
+    media_url = f'{UPLOADS_URL_PREFIX}{blob.file_name}'
+    PostMedia.query.filter_by(media_url=media_url).update(_processed_media_values(blob), synchronize_session=False)
+    for post in Post.query.join(PostMedia).filter(PostMedia.media_url == media_url):
+        touch_post(post)
+    db.session.commit()
+
+@bp.cli.command('enqueue-media')
+def enqueue_media_command():
+    """Queue processing for every uploaded blob that has not been processed yet."""
+    ids = [row[0] for row in db.session.query(MediaBlob.id).filter(MediaBlob.processed_at.is_(None))]
+    for blob_id in ids:
+        job_queue.enqueue('process_media', {'blob_id': blob_id})
+    click.echo(f'{len(ids)} blob(s) queued')
+
+############################
+# Media Serving
+############################
+# Content-addressed uploads never change, so they are cached for a year and
+# their digest is a strong ETag. Byte ranges are served from a file wrapper
+# positioned at the range start, which WSGI servers such as gunicorn turn
+# into a zero-copy sendfile(). With MINIFB_MEDIA_OFFLOAD set, only headers
+# are produced and a front proxy sends the bytes:
+#   x-accel    -> X-Accel-Redirect: <MINIFB_X_ACCEL_PREFIX><filename> (nginx)
+#   x-sendfile -> X-Sendfile: <absolute path> (Apache/lighttpd)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MUTABLE_CACHE_CONTROL = 'public, max-age=3600'
+# <sha256>.<ext>, plus derived files such as <sha256>_w640.webp
+CONTENT_ADDRESSED_NAME = re.compile(r'^([0-9a-f]{64}(?:_[a-z0-9]+)?)\.[A-Za-z0-9]+$')
+MEDIA_MIMETYPES = {'.mp4': 'video/mp4', '.webm': 'video/webm', '.ogg': 'video/ogg'}
+
+class _BoundedReader:
+    """File wrapper that stops after ``length`` bytes but keeps ``fileno()``
+    so servers can still sendfile() from the current offset."""
+
+    def __init__(self, f, length):
+        self._f = f
+        self._remaining = length
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._f.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._f.fileno()
+
+    def tell(self):
+        return self._f.tell()
+
+    def close(self):
+        self._f.close()
+
+def _media_etag(filename, stat):
+    match = CONTENT_ADDRESSED_NAME.match(filename)
+    if match:
+        return match.group(1), IMMUTABLE_CACHE_CONTROL
+    return f'{int(stat.st_mtime)}-{stat.st_size}', MUTABLE_CACHE_CONTROL
+
+def send_media(path, filename):
+    """Serve an uploaded file with validators, caching and single-range support."""
+    stat = os.stat(path)
+    size = stat.st_size
+    etag, cache_control = _media_etag(filename, stat)
+    ext = os.path.splitext(filename)[1].lower()
+    mimetype = MEDIA_MIMETYPES.get(ext) or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    resp = Response(mimetype=mimetype, direct_passthrough=True)
+    resp.set_etag(etag)
+    resp.last_modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+    resp.headers['Cache-Control'] = cache_control
+    resp.headers['Accept-Ranges'] = 'bytes'
+
+    if request.if_none_match:
+        if request.if_none_match.contains(etag):
+            resp.status_code = 304
+            return resp
+    elif request.if_modified_since and int(stat.st_mtime) <= request.if_modified_since.timestamp():
+        resp.status_code = 304
+        return resp
+
+    offload = current_app.config['MEDIA_OFFLOAD']
+    if offload == 'x-accel':
+        # nginx answers Range/conditional requests itself from these headers
+        resp.headers['X-Accel-Redirect'] = current_app.config['X_ACCEL_PREFIX'] + filename
+        return resp
+    if offload == 'x-sendfile':
+        resp.headers['X-Sendfile'] = os.path.abspath(path)
+        return resp
+
+    start, stop = 0, size
+    rng = request.range
+    if_range = request.if_range
+    if if_range.etag is not None:
+        range_valid = if_range.etag == etag
+    elif if_range.date is not None:
+        range_valid = int(stat.st_mtime) <= if_range.date.timestamp()
+    else:
+        range_valid = True
+    if rng is not None and len(rng.ranges) == 1 and range_valid:
+        span = rng.range_for_length(size)
+        if span is None:
+            resp.status_code = 416
+            resp.headers['Content-Range'] = f'bytes */{size}'
+            return resp
+        start, stop = span
+        resp.status_code = 206
+        resp.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+
+    f = open(path, 'rb')
+    f.seek(start)
+    resp.response = wrap_file(request.environ, _BoundedReader(f, stop - start))
+    resp.content_length = stop - start
+    return resp
+
+@bp.route('/api/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    path = safe_join(current_app.config['UPLOAD_FOLDER'], filename)
+    if path is None or not os.path.isfile(path):
+        return jsonify({'message': 'File not found'}), 404
+    return send_media(path, filename)
 
-@app.route('/favicon.ico')
+@bp.route('/favicon.ico')
 def favicon():
     return send_from_directory(
-        os.path.join(app.root_path, 'static'),
+        os.path.join(current_app.root_path, 'static'),
         'favicon.ico',
         mimetype='image/vnd.microsoft.icon'
     )
 
+############################
+# App Factory
+############################
+def create_app(config=None):
+    """Build the app from ``config``, a config class or a name in config.CONFIGS.
+
+    Defaults to MINIFB_CONFIG, else 'production'. Nothing here touches the
+    database, so starting a worker is cheap; the schema is created and
+    migrated separately by ``flask --app app db-upgrade``. The engines, queues
+    and caches set up here are per process and belong to the last app built.
+    """
+    global app, read_engine, event_bus, job_queue, job_worker, password_hasher, _recent_writers, \
+        _http_store, _http_store_shared, HTTP_VERSION_TTL, _response_bodies, _username_ids, \
+        _user_cache, _friend_cache, _typeahead_cache, _story_tray_cache, engagement_buffer, _stream_slots
+    if config is None or isinstance(config, str):
+        config = CONFIGS[config or os.environ.get('MINIFB_CONFIG', 'production')]
+    new_app = Flask(__name__)
+    new_app.config.from_object(config)
+    cfg = new_app.config
+    new_app.json = create_json_provider(cfg['JSON_BACKEND'], new_app)
+    url = make_url(cfg['SQLALCHEMY_DATABASE_URI'])
+    if not _is_memory_sqlite(url):
+        cfg.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                       _pool_options(cfg, url, cfg['DB_POOL_SIZE'], cfg['DB_MAX_OVERFLOW']))
+    if not new_app.debug and not new_app.testing and cfg['SECRET_KEY'] == 'dev-secret-change-me':
+        log.warning('MINIFB_SECRET is not set; tokens are signed with the development key')
+
+    CORS(new_app)
+    db.init_app(new_app)
+    new_app.register_blueprint(bp)
+    new_app.teardown_appcontext(_bump_leftover_versions)
+    with new_app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            db.event.listen(db.engine, 'connect', _sqlite_pragma_listener(cfg['SQLITE_PRAGMAS']))
+        read_engine = _create_read_engine(cfg)
+
+    event_bus = create_event_bus(cfg['EVENT_BACKEND'], cfg['EVENT_DB_PATH'])
+    job_queue = JobQueue(cfg['JOB_DB_PATH'])
+    job_worker = Worker(job_queue, JOB_HANDLERS)
+    password_hasher = PasswordHasher(cfg['PASSWORD_HASH_METHOD'], cfg['HASH_POOL'],
+                                     cfg['HASH_WORKERS'], cfg['HASH_QUEUE'])
+    _recent_writers = LRUCache(10000, ttl=cfg['REPLICA_STICKY_SECONDS'])
+    _http_store = create_cache(cfg['HTTP_CACHE_BACKEND'], cfg['HTTP_CACHE_DB_PATH'],
+                               maxsize=cfg['HTTP_CACHE_SIZE'])
+    _http_store_shared = cfg['HTTP_CACHE_BACKEND'] != 'local'
+    HTTP_VERSION_TTL = 24 * 3600 if _http_store_shared else cfg['HTTP_CACHE_TTL']
+    _response_bodies = LRUCache(cfg['HTTP_CACHE_SIZE'], ttl=cfg['HTTP_CACHE_TTL'])
+    _username_ids = LRUCache(cfg['USER_CACHE_SIZE'])
+    _user_cache = LRUCache(cfg['USER_CACHE_SIZE'])
+    _friend_cache = LRUCache(cfg['FRIEND_CACHE_SIZE'], ttl=FRIEND_CACHE_TTL)
+    _typeahead_cache = TypeaheadCache(cfg['TYPEAHEAD_CACHE_SIZE'], cfg['TYPEAHEAD_CACHE_TTL'])
+    _story_tray_cache = LRUCache(cfg['STORY_TRAY_CACHE_SIZE'], ttl=cfg['STORY_TRAY_TTL'])
+    _stream_slots = threading.BoundedSemaphore(cfg['NOTIFY_STREAMS_MAX'])
+    engagement_buffer = None
+    if cfg['ENGAGEMENT_WRITE_BEHIND_MS'] > 0:
+        engagement_buffer = WriteBuffer(_apply_engagement_batch,
+                                        interval=cfg['ENGAGEMENT_WRITE_BEHIND_MS'] / 1000,
+                                        max_batch=cfg['ENGAGEMENT_BATCH_MAX'])
+    os.makedirs(os.path.join(cfg['UPLOAD_FOLDER'], PARTIAL_DIR), exist_ok=True)
+
+    app = new_app
+    # Not for tests or CLI commands (the flask command builds the app inside a
+    # click context); gunicorn with preload_app starts it after each fork instead
+    if cfg['JOB_WORKER_AUTOSTART'] and not new_app.testing and click.get_current_context(silent=True) is None:
+        start_job_worker()
+    return new_app
+
+def dispose_engines():
+    """Drop pooled connections inherited from a parent process (call after fork)."""
+    with app.app_context():
+        db.engine.dispose(close=False)
+    if read_engine is not None:
+        read_engine.dispose(close=False)
+
 if __name__ == "__main__":
-    app.run(port=5000, debug=True)
\ No newline at end of file
+    # Development server; run 'flask --app app db-upgrade' first
+    create_app('development').run(port=5000)
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""Shared helpers for the backend benchmark and check scripts.
+
+Scripts import the Flask app through ``load_app`` so they always run
+against a throwaway SQLite file instead of ``database/mini_fb.db``. Set
+MINIFB_BENCH_DATABASE_URL (e.g. postgresql://localhost/minifb_bench) to run
+them against a scratch PostgreSQL database instead; its tables are dropped
+first.
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def load_app(db_path=None):
+    """Import ``app.py``, build the app on a scratch database and return the module.
+
+    The app is ``module.app``; its schema is created before returning.
+    """
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix='minifb-bench-', suffix='.db')
+        os.close(fd)
+        os.unlink(db_path)
+    url = os.environ.get('MINIFB_BENCH_DATABASE_URL')
+    if url:
+        reset_database(url)
+    os.environ['MINIFB_DATABASE_URL'] = url or f'sqlite:///{db_path}'
+    os.environ.setdefault('MINIFB_JOB_DB', f'{db_path}.jobs')
+    os.environ.setdefault('MINIFB_UPLOAD_FOLDER', f'{db_path}.uploads')
+    os.environ.setdefault('MINIFB_SECRET', 'bench-secret-' + 'x' * 32)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    import app as app_module
+    app = app_module.create_app()
+    with app.app_context():
+        app_module.migrate()
+    return app_module
+
+
+def reset_database(url):
+    """Drop every table in the (non-SQLite) scratch database at ``url``."""
+    from sqlalchemy import MetaData, create_engine
+    engine = create_engine(url)
+    metadata = MetaData()
+    metadata.reflect(engine)
+    metadata.drop_all(engine)
+    engine.dispose()
+
+
+def auth_headers(app_module, user):
+    token = app_module.create_token(user.id, user.email, user.username)
+    return {'Authorization': f'Bearer {token}'}
+
+
+def seed(app_module, users=5, posts_per_user=20, likes_per_post=3, comments_per_post=2):
+    """Populate the scratch database with a small social graph."""
+    m = app_module
+    db = m.db
+    created = []
+    for i in range(users):
+        u = m.User(email=f'user{i}@example.com', username=f'user{i}', password_hash='x')
+        db.session.add(u)
+        created.append(u)
+    db.session.flush()
+    for u in created:
+        db.session.add(m.Profile(user_id=u.id, first_name=f'First{u.id}', surname=f'Last{u.id}'))
+        for j in range(posts_per_user):
+            p = m.Post(user_id=u.id, content=f'post {j} by {u.username}')
+            db.session.add(p)
+            db.session.flush()
+            db.session.add(m.PostMedia(post_id=p.id, media_type='image',
+                                       media_url=f'/api/uploads/{p.id}.jpg', file_name=f'{p.id}.jpg'))
+            for k in range(likes_per_post):
+                db.session.add(m.Like(post_id=p.id, user_id=created[k % len(created)].id))
+            for k in range(comments_per_post):
+                db.session.add(m.Comment(post_id=p.id, user_id=created[k % len(created)].id,
+                                         content=f'comment {k}'))
+    db.session.commit()
+    app_module.reconcile_counters()
+    app_module.rebuild_notification_counters()
+    app_module.rebuild_timelines()
+    return created
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+
+@contextmanager
+def count_queries(*engines):
+    """Count SQL statements executed on ``engines`` inside the block.
+
+    ``None`` entries are ignored, so ``app.read_engine`` can be passed as is.
+    """
+    engines = [e for e in engines if e is not None]
+    counter = QueryCounter()
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        counter.count += 1
+        counter.statements.append(statement)
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before)
+    try:
+        yield counter
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', _before)
+
+
+@contextmanager
+def timed(label, results):
+    start = time.perf_counter()
+    yield
+    results[label] = time.perf_counter() - start
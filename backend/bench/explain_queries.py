@@ -0,0 +1,126 @@
+"""Audit every route's SQL with EXPLAIN QUERY PLAN.
+
+Usage: python bench/explain_queries.py [-v]
+
+Drives each API route through the Flask test client against a seeded
+scratch database, captures the statements it executes and replays them
+under EXPLAIN QUERY PLAN. Exits non-zero if any statement does a full
+table scan that is not listed in KNOWN_SCANS.
+"""
+import re
+import sqlite3
+import sys
+
+from common import auth_headers, load_app, seed
+
+# (route, table) pairs whose full scan is accepted, with the reason
+KNOWN_SCANS = {}
+
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def route_calls(m, users):
+    me, other = users[0], users[1]
+    a, b = auth_headers(m, me), auth_headers(m, other)
+    post_id = m.Post.query.filter_by(user_id=other.id).first().id
+    mine = m.Post.query.filter_by(user_id=me.id).first().id
+    # Exercise the fan-out-on-read merge in home_feed once other is a friend
+    m.db.session.add(m.TimelineCelebrity(user_id=other.id))
+    m.db.session.commit()
+    return [
+        ('api_login', 'post', '/api/login', {}, {'email': me.email, 'password': 'x'}),
+        ('get_profile', 'get', f'/api/profile/{other.username}', {}, None),
+        ('search_users', 'get', '/api/users/search?q=user', {}, None),
+        ('search_posts', 'get', '/api/posts/search?q=post', a, None),
+        ('list_posts', 'get', '/api/posts?page=2&limit=10', a, None),
+        ('list_posts (cursor)', 'get', '/api/posts?cursor=&limit=10', a, None),
+        ('list_user_posts', 'get', f'/api/users/{other.username}/posts?page=2', a, None),
+        ('list_user_posts (cursor)', 'get', f'/api/users/{other.username}/posts?cursor=', a, None),
+        ('send_friend_request', 'post', '/api/friends/request', a, {'to': other.username}),
+        ('friend_status', 'get', f'/api/friends/status?user={other.username}', a, None),
+        ('list_pending_requests', 'get', '/api/friends/pending', b, None),
+        ('accept_friend_request', 'post', '/api/friends/accept', b, {'from': me.username}),
+        ('home_feed', 'get', '/api/feed?limit=10', a, None),
+        ('friend_suggestions', 'get', '/api/friends/suggestions', a, None),
+        ('notifications_summary', 'get', '/api/notifications/summary?since=2000-01-01T00:00:00Z', b, None),
+        ('mark_notifications_seen', 'post', '/api/notifications/seen', b, None),
+        ('create_post', 'post', '/api/posts', a, {'content': 'audit'}),
+        ('toggle_like', 'post', f'/api/posts/{post_id}/like', a, None),
+        ('list_comments', 'get', f'/api/posts/{post_id}/comments', {}, None),
+        ('list_comments (latest)', 'get', f'/api/posts/{post_id}/comments?latest=3', {}, None),
+        ('list_posts (comments)', 'get', '/api/posts?limit=10&comments=2', a, None),
+        ('add_comment', 'post', f'/api/posts/{post_id}/comments', a, {'content': 'audit'}),
+        ('share_post', 'post', f'/api/posts/{post_id}/share', a, None),
+        ('update_post', 'put', f'/api/posts/{mine}', a, {'content': 'edited', 'media': []}),
+        ('create_story', 'post', '/api/stories', a, {'content': 'story'}),
+        ('get_stories', 'get', '/api/stories', a, None),
+        ('delete_post', 'delete', f'/api/posts/{mine}', a, None),
+    ]
+
+
+def capture(*engines):
+    from sqlalchemy import event
+    statements = []
+    engines = [e for e in engines if e is not None]
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            statements.append((statement, parameters))
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before)
+
+    def stop():
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', _before)
+    return statements, stop
+
+
+def full_scans(raw, tables, statement, params):
+    """Return ``(plan_lines, scanned_tables)`` for one captured statement."""
+    plan = [row[3] for row in raw.execute('EXPLAIN QUERY PLAN ' + statement, params)]
+    scanned = [match.group(1) for match in map(FULL_SCAN.match, plan)
+               if match and match.group(1) in tables]
+    return plan, scanned
+
+
+def main():
+    verbose = '-v' in sys.argv
+    m = load_app()
+    client = m.app.test_client()
+    failures = 0
+    with m.app.app_context():
+        dialect = m.db.engine.dialect.name
+    if dialect != 'sqlite':
+        print('EXPLAIN QUERY PLAN audit only runs on SQLite; unset MINIFB_BENCH_DATABASE_URL')
+        return 0
+    with m.app.app_context():
+        users = seed(m, users=3, posts_per_user=15)
+        db_path = m.db.engine.url.database
+        calls = route_calls(m, users)
+    raw = sqlite3.connect(db_path)
+    tables = {row[0] for row in raw.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for route, method, path, headers, body in calls:
+        with m.app.app_context():
+            statements, stop = capture(m.db.engine, m.read_engine)
+            resp = getattr(client, method)(path, headers=headers, json=body)
+            stop()
+        name = route.split(' ')[0]
+        route_ok = True
+        for statement, params in statements:
+            plan, scanned = full_scans(raw, tables, statement, params)
+            bad = [t for t in scanned if (name, t) not in KNOWN_SCANS]
+            if bad:
+                failures += 1
+                route_ok = False
+            if bad or verbose:
+                print(f'  {"FULL SCAN" if bad else "plan"} [{resp.status_code}] {" ".join(statement.split())}')
+                for line in plan:
+                    print(f'      {line}')
+        print(f'{"ok" if route_ok else "FAIL":4} {route}: {len(statements)} statement(s)')
+    print(f'{failures} statement(s) with unexpected full scans')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
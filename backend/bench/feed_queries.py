@@ -0,0 +1,51 @@
+"""Assert that the feed endpoints run a constant number of SQL queries.
+
+Usage: python bench/feed_queries.py
+
+Requests /api/posts and /api/users/<username>/posts with several page sizes,
+anonymously and authenticated, with and without inlined comment previews,
+plus a post's comment thread, and exits non-zero if the number of queries
+changes with the page size.
+"""
+import sys
+
+from common import auth_headers, count_queries, load_app, seed
+
+PAGE_SIZES = (1, 10, 50)
+
+
+def main():
+    m = load_app()
+    client = m.app.test_client()
+    failures = []
+    with m.app.app_context():
+        users = seed(m, users=3, posts_per_user=max(PAGE_SIZES))
+        headers = auth_headers(m, users[0])
+        post_id = m.Post.query.first().id
+        for k in range(max(PAGE_SIZES)):
+            m.db.session.add(m.Comment(post_id=post_id, user_id=users[k % len(users)].id, content=f'extra {k}'))
+        m.db.session.commit()
+        endpoints = ('/api/posts?page=1', '/api/posts?page=1&comments=2',
+                     f'/api/users/{users[1].username}/posts?page=1',
+                     f'/api/users/{users[1].username}/posts?page=1&comments=2',
+                     f'/api/posts/{post_id}/comments?cursor=')
+        for path in endpoints:
+            key = 'comments' if '/comments' in path else 'posts'
+            for label, hdrs in (('anonymous', {}), ('authenticated', headers)):
+                counts = {}
+                for size in PAGE_SIZES:
+                    m.clear_http_cache()  # count the handler's queries, not a cache hit
+                    with count_queries(m.db.engine, m.read_engine) as counter:
+                        resp = client.get(f'{path}&limit={size}', headers=hdrs)
+                    assert resp.status_code == 200, resp.get_data(as_text=True)
+                    assert len(resp.get_json()[key]) == size
+                    counts[size] = counter.count
+                status = 'ok' if len(set(counts.values())) == 1 else 'FAIL'
+                print(f'{status:4} {path} ({label}): queries by page size {counts}')
+                if status != 'ok':
+                    failures.append(path)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
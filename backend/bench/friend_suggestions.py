@@ -0,0 +1,127 @@
+"""Benchmark friend-suggestion refresh and query latency on a synthetic graph.
+
+Usage: python bench/friend_suggestions.py [--users N] [--edges N] [--new-edges N]
+                                          [--queries N] [--verify]
+
+Builds a clustered random friendship graph (most friends inside a
+community, like real social graphs), scores it with rebuild_suggestions(),
+then accepts --new-edges further friendships one at a time through the
+incremental score_friendship() path and times GET /api/friends/suggestions
+for random users. The defaults finish in about a minute; the sizes from the
+design discussion are --users 100000 --edges 2000000 (needs several GB of
+disk for the suggestion table). --verify compares the incrementally
+maintained table with a full rebuild and exits non-zero on any difference.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault('MINIFB_JOB_WORKER', 'external')
+
+from sqlalchemy import insert  # noqa: E402
+
+from common import auth_headers, load_app  # noqa: E402
+
+COMMUNITY_SIZE = 200
+IN_COMMUNITY = 0.8
+
+
+def random_edges(users, edges, rng):
+    """Return ``edges`` distinct ``(low, high)`` pairs over user IDs 1..users."""
+    communities = max(1, users // COMMUNITY_SIZE)
+    pairs = set()
+    while len(pairs) < edges:
+        a = rng.randint(1, users)
+        if rng.random() < IN_COMMUNITY:
+            base = (a - 1) % communities
+            b = base + 1 + communities * rng.randrange(max(1, users // communities))
+            if b > users:
+                continue
+        else:
+            b = rng.randint(1, users)
+        if a != b:
+            pairs.add((min(a, b), max(a, b)))
+    return pairs
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, samples):
+    print(f'{label}: mean {statistics.mean(samples) * 1000:.2f} ms, '
+          f'p50 {percentile(samples, 50) * 1000:.2f} ms, p95 {percentile(samples, 95) * 1000:.2f} ms')
+
+
+def snapshot(m):
+    return set(m.db.session.query(m.FriendSuggestion.user_id, m.FriendSuggestion.candidate_id,
+                                  m.FriendSuggestion.mutual_count))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--edges', type=int, default=200000)
+    parser.add_argument('--new-edges', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--verify', action='store_true')
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    m = load_app()
+    db = m.db
+    client = m.app.test_client()
+    with m.app.app_context():
+        start = time.perf_counter()
+        db.session.execute(insert(m.User), [
+            {'id': i, 'email': f'u{i}@example.com', 'username': f'u{i}', 'password_hash': 'x'}
+            for i in range(1, args.users + 1)])
+        edges = random_edges(args.users, args.edges + args.new_edges, rng)
+        new_edges = rng.sample(sorted(edges), args.new_edges)
+        initial = edges.difference(new_edges)
+        db.session.execute(insert(m.Friendship), [{'low_id': a, 'high_id': b} for a, b in initial])
+        db.session.commit()
+        print(f'graph: {args.users} users, {len(initial)} edges ({time.perf_counter() - start:.1f}s to load)')
+
+        start = time.perf_counter()
+        rows = m.rebuild_suggestions()
+        print(f'full rebuild: {time.perf_counter() - start:.1f}s, {rows} suggestion rows')
+
+        refresh = []
+        for a, b in new_edges:
+            m.add_friendship(a, b)
+            db.session.commit()
+            start = time.perf_counter()
+            m.score_friendship(a, b)
+            db.session.commit()
+            refresh.append(time.perf_counter() - start)
+        report(f'incremental refresh ({len(refresh)} accepted friendships)', refresh)
+
+        users = [db.session.get(m.User, rng.randint(1, args.users)) for _ in range(args.queries)]
+        headers = [auth_headers(m, u) for u in users]
+    latencies = []
+    for hdrs in headers:
+        start = time.perf_counter()
+        resp = client.get('/api/friends/suggestions?limit=10', headers=hdrs)
+        latencies.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+    report(f'GET /api/friends/suggestions ({len(latencies)} requests)', latencies)
+
+    if args.verify:
+        with m.app.app_context():
+            incremental = snapshot(m)
+            m.rebuild_suggestions()
+            rebuilt = snapshot(m)
+        if incremental != rebuilt:
+            print(f'FAIL: {len(incremental ^ rebuilt)} rows differ from a full rebuild')
+            return 1
+        print('ok   incremental table matches a full rebuild')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Load-test likes on one hot post, written inline vs through the write-behind buffer.
+
+Usage: python bench/hot_post_likes.py [--seconds N] [--clients N] [--interval-ms N]
+
+Each profile runs in its own process (the buffer is configured from the
+environment at import time) against a fresh seeded database. Every client
+thread is a different user toggling its like on the same post as fast as it
+can. The script reports sustained likes per second, failed requests and
+latency percentiles, and checks that the answers were correct:
+
+- every response's ``liked`` is the state that user's toggle should produce;
+- afterwards the post's likes counter equals its rows in ``likes``, and
+  both equal the number of users whose last toggle left them liking it.
+
+  inline        one transaction per request (MINIFB_ENGAGEMENT_WRITE_BEHIND_MS=0)
+  write-behind  toggles batched into one transaction every --interval-ms
+
+All threads share one interpreter, so absolute numbers are GIL-bound;
+compare the profiles with each other rather than with production traffic.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+
+def profiles(interval_ms):
+    return {
+        'inline': {'MINIFB_ENGAGEMENT_WRITE_BEHIND_MS': '0'},
+        'write-behind': {'MINIFB_ENGAGEMENT_WRITE_BEHIND_MS': str(interval_ms)},
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def run_profile(args):
+    """Run the workload in this process and print one JSON result line."""
+    os.environ['MINIFB_JOB_WORKER'] = 'external'
+    from common import auth_headers, load_app, seed
+
+    m = load_app()
+    client = m.app.test_client()
+    with m.app.app_context():
+        users = seed(m, users=max(args.clients, 3), posts_per_user=1, comments_per_post=0)
+        headers = [auth_headers(m, u) for u in users[:args.clients]]
+        post_id = m.Post.query.filter_by(user_id=users[0].id).first().id
+        liked_at_start = {user_id for (user_id,) in
+                          m.db.session.query(m.Like.user_id).filter_by(post_id=post_id)}
+        user_ids = [u.id for u in users[:args.clients]]
+
+    stop = threading.Event()
+    lock = threading.Lock()
+    results = {'likes': 0, 'errors': 0, 'wrong_state': 0}
+    latencies = []
+    final_state = {}
+
+    def client_loop(hdrs, user_id):
+        liked = user_id in liked_at_start
+        mine = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            resp = client.post(f'/api/posts/{post_id}/like', headers=hdrs)
+            mine.append(time.perf_counter() - start)
+            with lock:
+                if resp.status_code != 200:
+                    results['errors'] += 1
+                    continue
+                results['likes'] += 1
+                liked = not liked
+                results['wrong_state'] += resp.get_json()['liked'] != liked
+        with lock:
+            latencies.extend(mine)
+            final_state[user_id] = liked
+
+    threads = [threading.Thread(target=client_loop, args=(h, uid)) for h, uid in zip(headers, user_ids)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    with m.app.app_context():
+        counter = m.db.session.get(m.Post, post_id).likes_count
+        rows = m.db.session.query(m.Like).filter_by(post_id=post_id).count()
+    expected = len(liked_at_start - set(user_ids)) + sum(final_state.values())
+    print(json.dumps({
+        'likes_per_s': results['likes'] / args.seconds,
+        'errors': results['errors'],
+        'wrong_state': results['wrong_state'],
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'consistent': counter == rows == expected,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--interval-ms', type=int, default=5)
+    parser.add_argument('--profile', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.profile:
+        run_profile(args)
+        return 0
+
+    print(f'{args.clients} clients liking one post, {args.seconds:g}s per profile')
+    print(f'{"profile":13} {"likes/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7} {"wrong":>6} {"consistent":>11}')
+    failed = False
+    for name, env in profiles(args.interval_ms).items():
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--profile', name, '--seconds', str(args.seconds),
+             '--clients', str(args.clients), '--interval-ms', str(args.interval_ms)],
+            env={**os.environ, **env}, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+        if out.returncode:
+            print(f'{name:13} failed:\n{out.stderr}')
+            return 1
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f'{name:13} {r["likes_per_s"]:9.1f} {r["p50_ms"]:8.1f} {r["p99_ms"]:8.1f} '
+              f'{r["errors"]:7d} {r["wrong_state"]:6d} {"yes" if r["consistent"] else "NO":>11}')
+        failed |= bool(r['errors'] or r['wrong_state'] or not r['consistent'])
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Check HTTP caching (ETags, 304s, invalidation) and time cold/warm/304 reads.
+
+Usage: python bench/http_cache.py [--repeat N]
+
+Checks, on a fresh seeded database:
+
+- cached endpoints send a weak ETag, answer a matching If-None-Match with
+  304 and no queries, and serve repeat requests from the cached body;
+- a comment, a like, a friendship and a new story each change the ETags
+  of exactly the responses that show them;
+- the story tray is private to the viewer and errors are never cached.
+
+Then reports the mean latency and query count of a cold request (caches
+cleared), a warm request (body cached) and a conditional request (304).
+Exits non-zero if any check fails.
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('MINIFB_JOB_WORKER', 'external')
+
+from common import auth_headers, count_queries, load_app, seed  # noqa: E402
+
+failures = 0
+
+
+def check(label, ok):
+    global failures
+    print(f'{"ok" if ok else "FAIL":4} {label}')
+    failures += not ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    m = load_app()
+    client = m.app.test_client()
+    with m.app.app_context():
+        users = seed(m, users=3, posts_per_user=20)
+        a, b = auth_headers(m, users[0]), auth_headers(m, users[1])
+        name_a, name_b = users[0].username, users[1].username
+        post_id = m.Post.query.filter_by(user_id=users[0].id).first().id
+
+    def get(path, etag=None, headers=None):
+        headers = dict(headers or {})
+        if etag:
+            headers['If-None-Match'] = etag
+        with m.app.app_context(), count_queries(m.db.engine, m.read_engine) as q:
+            resp = client.get(path, headers=headers)
+        return resp, q.count
+
+    def etag(path, headers=None):
+        return get(path, headers=headers)[0].headers.get('ETag')
+
+    paths = [f'/api/profile/{name_a}', f'/api/users/{name_a}/posts', f'/api/posts/{post_id}/comments']
+    for path in paths:
+        m.clear_http_cache()
+        first, _ = get(path)
+        tag = first.headers.get('ETag', '')
+        check(f'{path} sends a weak ETag', tag.startswith('W/'))
+        resp, n = get(path, tag)
+        check(f'{path} answers If-None-Match with 304 and no queries', resp.status_code == 304 and n == 0)
+        resp, n = get(path)
+        check(f'{path} repeats come from the cached body', n == 0 and resp.data == first.data)
+
+    resp, _ = get(f'/api/users/{name_a}/posts', headers=a)
+    check('signed-in user posts are not cached', 'ETag' not in resp.headers)
+
+    comments, posts, profile_b = (etag(f'/api/posts/{post_id}/comments'), etag(f'/api/users/{name_a}/posts'),
+                                  etag(f'/api/profile/{name_b}'))
+    client.post(f'/api/posts/{post_id}/comments', json={'content': 'hi'}, headers=b)
+    check('a comment changes the comments ETag', get(f'/api/posts/{post_id}/comments', comments)[0].status_code == 200)
+    check("a comment changes the author's posts ETag", get(f'/api/users/{name_a}/posts', posts)[0].status_code == 200)
+    check("a comment leaves the commenter's profile ETag", get(f'/api/profile/{name_b}', profile_b)[0].status_code == 304)
+
+    posts = etag(f'/api/users/{name_a}/posts')
+    client.post(f'/api/posts/{post_id}/like', headers=b)
+    check("a like changes the author's posts ETag", get(f'/api/users/{name_a}/posts', posts)[0].status_code == 200)
+
+    profile_a = etag(f'/api/profile/{name_a}')
+    client.post('/api/friends/request', json={'to': name_a}, headers=b)
+    client.post('/api/friends/accept', json={'from': name_b}, headers=a)
+    resp = get(f'/api/profile/{name_a}', profile_a)[0]
+    check('a new friendship changes the profile', resp.status_code == 200 and resp.get_json()['friendsCount'] == 1)
+
+    tray, _ = get('/api/stories', headers=a)
+    tray_tag = tray.headers.get('ETag')
+    check('the story tray is private', tray.headers.get('Cache-Control', '').startswith('private'))
+    check('the story tray answers 304 to its viewer', get('/api/stories', tray_tag, headers=a)[0].status_code == 304)
+    check('the story tray ETag is per viewer', get('/api/stories', tray_tag, headers=b)[0].status_code == 200)
+    client.post('/api/stories', json={'content': 'story'}, headers=b)
+    check("a friend's story changes the tray", get('/api/stories', tray_tag, headers=a)[0].status_code == 200)
+
+    resp = get('/api/profile/nobody')[0]
+    check('errors are not cached', resp.status_code == 404 and 'ETag' not in resp.headers)
+
+    print(f'\n{"endpoint":40} {"cold ms":>8} {"warm ms":>8} {"304 ms":>8} {"queries":>8}')
+    for path in paths:
+        tag = etag(path)
+        cold = warm = revalidate = 0.0
+        queries = 0
+        for _ in range(args.repeat):
+            m.clear_http_cache()
+            start = time.perf_counter()
+            _, queries = get(path)
+            cold += time.perf_counter() - start
+            start = time.perf_counter()
+            get(path)
+            warm += time.perf_counter() - start
+            start = time.perf_counter()
+            get(path, tag)
+            revalidate += time.perf_counter() - start
+            tag = etag(path)
+        scale = 1000 / args.repeat
+        print(f'{path:40} {cold * scale:8.2f} {warm * scale:8.2f} {revalidate * scale:8.2f} {queries:8d}')
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Time JSON encoding of a 50-post feed page and measure streamed list memory.
+
+Usage: python bench/json_encoding.py [--repeat N] [--stream-posts N]
+
+On a fresh seeded database (one image and two comment previews per post):
+
+1. Encoding one page of GET /api/posts?limit=50&comments=2, median per page:
+
+     before  Flask's default provider, as jsonify() used it, on the page as
+             the serializers used to build it: datetimes as isoformat() strings
+     std     StdJSONProvider on the page with datetime values
+     orjson  ORJSONProvider on the page with datetime values
+
+   The "before" time includes the isoformat() calls the serializers made.
+   Also reports the full request through the test client with each provider.
+
+2. Peak memory (tracemalloc) of a --stream-posts page of posts, rows
+   included: loaded with .all() and answered as one JSON body (buffered), vs
+   GET /api/posts?stream=json|ndjson, which fetches, serializes and writes
+   STREAM_CHUNK posts at a time.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('MINIFB_JOB_WORKER', 'external')
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from common import load_app, seed  # noqa: E402
+
+
+def median_us(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e6
+
+
+def with_iso_dates(items):
+    """The page as serialize_posts() built it before: created_at as a string."""
+    return [{**p, 'created_at': p['created_at'].isoformat(),
+             'latestComments': [{**c, 'created_at': c['created_at'].isoformat()} for c in p['latestComments']]}
+            for p in items]
+
+
+def peak_kib(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=500)
+    parser.add_argument('--stream-posts', type=int, default=1000)
+    args = parser.parse_args()
+
+    m = load_app()
+    from serialization import ORJSONProvider, StdJSONProvider, orjson
+    app = m.app
+    client = app.test_client()
+    with app.app_context():
+        seed(m, users=20, posts_per_user=max(3, args.stream_posts // 20))
+
+    providers = {'std': StdJSONProvider(app)}
+    if orjson is not None:
+        providers['orjson'] = ORJSONProvider(app)
+    else:
+        print('orjson is not installed; skipping the orjson provider')
+
+    with app.test_request_context('/api/posts?limit=50&comments=2'):
+        posts = m.Post.query.options(m.joinedload(m.Post.author), m.selectinload(m.Post.media)).order_by(
+            m.Post.created_at.desc(), m.Post.id.desc()).limit(50).all()
+        page = {'posts': m.serialize_posts(posts, comments=2), 'page': 1, 'limit': 50, 'hasMore': True}
+
+    default = DefaultJSONProvider(app)
+
+    def before():
+        # What jsonify() wrote: compact, sorted keys, ASCII-escaped
+        return default.dumps(page | {'posts': with_iso_dates(page['posts'])}, separators=(',', ':')).encode()
+
+    sizes = {'before': len(before())}
+    encode = {'before': median_us(before, args.repeat)}
+    for name, provider in providers.items():
+        sizes[name] = len(provider.dumpb(page))
+        encode[name] = median_us(lambda: provider.dumpb(page), args.repeat)
+
+    request_ms = {}
+    for name, provider in providers.items():
+        app.json = provider
+        m.clear_http_cache()
+        assert client.get('/api/posts?limit=50&comments=2').status_code == 200
+        request_ms[name] = median_us(
+            lambda: client.get('/api/posts?limit=50&comments=2').get_data(), args.repeat // 5) / 1000
+
+    print(f'50-post page, median of {args.repeat} encodes')
+    print(f'{"provider":8} {"encode us":>10} {"vs before":>10} {"bytes":>7} {"request ms":>11}')
+    for name, us in encode.items():
+        req = f'{request_ms[name]:11.2f}' if name in request_ms else f'{"-":>11}'
+        print(f'{name:8} {us:10.1f} {encode["before"] / us:9.1f}x {sizes[name]:7d} {req}')
+
+    url = f'/api/posts?cursor=&comments=2&limit={args.stream_posts}'
+    out = {}
+
+    def buffered():
+        with app.test_request_context(url):
+            rows = m.Post.query.options(m.joinedload(m.Post.author), m.selectinload(m.Post.media)).order_by(
+                m.Post.created_at.desc(), m.Post.id.desc()).limit(args.stream_posts).all()
+            resp = m.list_response('posts', m.chunked(rows, lambda batch: m.serialize_posts(
+                batch, comments=2)), {'limit': len(rows), 'hasMore': False})
+            out['buffered'] = len(resp.get_data())
+
+    def streamed(mode):
+        resp = client.get(f'{url}&stream={mode}')
+        out[mode] = sum(len(chunk) for chunk in resp.response)
+        resp.close()
+
+    print(f'\n{args.stream_posts}-post page, peak memory while responding (rows included)')
+    print(f'{"mode":10} {"peak KiB":>9} {"bytes out":>10}')
+    for mode in ('buffered', 'json', 'ndjson'):
+        peak = peak_kib(buffered if mode == 'buffered' else lambda: streamed(mode))
+        print(f'{mode:10} {peak:9.0f} {out[mode]:10d}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Mixed login + feed load: per-endpoint latency with inline vs pooled hashing.
+
+Usage: python bench/login_feed_load.py [--seconds N] [--server-threads N]
+                                       [--login-clients N] [--feed-clients N] [--retry-after S]
+
+Requests are served by a fixed pool of --server-threads request workers (as
+in a threaded WSGI server), fed by closed-loop clients: some log in over and
+over (backing off --retry-after seconds after a 503), the rest page through
+GET /api/posts. Each profile runs in its own process (the hasher is
+configured from the environment at import time):
+
+  inline   hashing in the request thread, unbounded (MINIFB_HASH_POOL=inline)
+  pool     the app defaults: a bounded thread pool that answers 503 when full
+
+For each endpoint the script reports successful requests per second, 503s
+per second and latency percentiles (queueing for a request worker included).
+All threads share one interpreter; compare the profiles with each other.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PROFILES = {
+    'inline': {'MINIFB_HASH_POOL': 'inline'},
+    'pool': {'MINIFB_HASH_POOL': 'thread'},
+}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def run_profile(args):
+    """Run the workload in this process and print one JSON result line."""
+    os.environ['MINIFB_JOB_WORKER'] = 'external'
+    from common import load_app, seed
+
+    m = load_app()
+    client = m.app.test_client()
+    with m.app.app_context():
+        users = seed(m, users=5, posts_per_user=20)
+        hashed = m.password_hasher.hash('secret')
+        m.User.query.update({'password_hash': hashed})
+        m.db.session.commit()
+        usernames = [u.username for u in users]
+
+    server = ThreadPoolExecutor(max_workers=args.server_threads)
+    stop = threading.Event()
+    lock = threading.Lock()
+    stats = {name: {'ok': 0, 'busy': 0, 'errors': 0, 'latencies': []} for name in ('login', 'feed')}
+
+    def request(name, send):
+        start = time.perf_counter()
+        resp = server.submit(send).result()
+        elapsed = time.perf_counter() - start
+        if resp.status_code == 503:
+            time.sleep(args.retry_after)
+        with lock:
+            s = stats[name]
+            if resp.status_code == 200:
+                s['ok'] += 1
+                s['latencies'].append(elapsed)
+            elif resp.status_code == 503:
+                s['busy'] += 1
+            else:
+                s['errors'] += 1
+
+    def login_client(i):
+        body = {'email': usernames[i % len(usernames)], 'password': 'secret'}
+        while not stop.is_set():
+            request('login', lambda: client.post('/api/auth/login', json=body))
+
+    def feed_client(i):
+        page = 1 + i % 5
+        while not stop.is_set():
+            request('feed', lambda: client.get(f'/api/posts?page={page}&limit=10'))
+
+    threads = [threading.Thread(target=login_client, args=(i,)) for i in range(args.login_clients)]
+    threads += [threading.Thread(target=feed_client, args=(i,)) for i in range(args.feed_clients)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    server.shutdown()
+
+    print(json.dumps({name: {
+        'ok_per_s': s['ok'] / args.seconds,
+        'busy_per_s': s['busy'] / args.seconds,
+        'errors': s['errors'],
+        'p50_ms': percentile(s['latencies'], 0.5) * 1000,
+        'p99_ms': percentile(s['latencies'], 0.99) * 1000,
+    } for name, s in stats.items()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--server-threads', type=int, default=8)
+    parser.add_argument('--login-clients', type=int, default=16)
+    parser.add_argument('--feed-clients', type=int, default=4)
+    parser.add_argument('--retry-after', type=float, default=0.1, help='client back-off after a 503, seconds')
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.profile:
+        run_profile(args)
+        return 0
+
+    print(f'{args.server_threads} request workers, {args.login_clients} login clients, '
+          f'{args.feed_clients} feed clients, {args.seconds:g}s per profile')
+    print(f'{"profile":8} {"endpoint":8} {"ok/s":>8} {"503/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+    for name, env in PROFILES.items():
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--profile', name, '--seconds', str(args.seconds),
+             '--server-threads', str(args.server_threads), '--login-clients', str(args.login_clients),
+             '--feed-clients', str(args.feed_clients), '--retry-after', str(args.retry_after)],
+            env={**os.environ, **env}, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+        if out.returncode:
+            print(f'{name:8} failed:\n{out.stderr}')
+            return 1
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        for endpoint, r in result.items():
+            print(f'{name:8} {endpoint:8} {r["ok_per_s"]:8.1f} {r["busy_per_s"]:8.1f} '
+                  f'{r["p50_ms"]:8.1f} {r["p99_ms"]:8.1f} {r["errors"]:7d}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
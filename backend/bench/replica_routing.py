@@ -0,0 +1,82 @@
+"""Check read-replica routing and read-your-writes stickiness.
+
+Usage: python bench/replica_routing.py
+
+Uses a frozen SQLite copy of the scratch database as a "replica" that
+never catches up, so every answer shows which database served it:
+
+- anonymous reads from @replica_reads endpoints come from the replica;
+- a user who just posted sees their post (primary) and gets the sticky
+  cookie, and still does without the cookie (per-user memory);
+- once the sticky window has passed, that user is back on the replica;
+- write endpoints and non-replica endpoints always use the primary.
+
+Exits non-zero on the first failed check.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+fd, REPLICA_PATH = tempfile.mkstemp(prefix='minifb-replica-', suffix='.db')
+os.close(fd)
+os.environ['MINIFB_DATABASE_REPLICA_URL'] = f'sqlite:///{REPLICA_PATH}'
+os.environ['MINIFB_REPLICA_STICKY_SECONDS'] = '1'
+os.environ.setdefault('MINIFB_JOB_WORKER', 'external')
+
+from common import auth_headers, load_app, seed  # noqa: E402
+
+failures = 0
+
+
+def check(label, ok):
+    global failures
+    print(f'{"ok" if ok else "FAIL":4} {label}')
+    failures += not ok
+
+
+def main():
+    m = load_app()
+    client = m.app.test_client()
+    with m.app.app_context():
+        if m.db.engine.dialect.name != 'sqlite':
+            print('this check snapshots a SQLite file; unset MINIFB_BENCH_DATABASE_URL')
+            return 0
+        users = seed(m, users=3, posts_per_user=2)
+        headers = auth_headers(m, users[0])
+        m.db.session.remove()
+        with m.db.engine.connect() as conn:
+            conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+        shutil.copyfile(m.db.engine.url.database, REPLICA_PATH)
+
+    def newest_content(resp):
+        return resp.get_json()['posts'][0]['content']
+
+    resp = client.post('/api/posts', json={'content': 'fresh on the primary'}, headers=headers)
+    check('write goes to the primary', resp.status_code in (200, 201))
+    check('writer gets the sticky cookie', m.PRIMARY_COOKIE in resp.headers.get('Set-Cookie', ''))
+
+    resp = client.get('/api/posts?limit=1', headers=headers)
+    check('writer with cookie reads own write', newest_content(resp) == 'fresh on the primary')
+
+    fresh = m.app.test_client()
+    resp = fresh.get('/api/posts?limit=1', headers=headers)
+    check('writer without cookie reads own write', newest_content(resp) == 'fresh on the primary')
+
+    resp = fresh.get('/api/posts?limit=1')
+    check('anonymous reader is served by the replica', newest_content(resp) != 'fresh on the primary')
+
+    resp = fresh.get(f'/api/users/{users[0].username}/posts?limit=1')
+    check('non-replica endpoint uses the primary', newest_content(resp) == 'fresh on the primary')
+
+    time.sleep(1.1)
+    resp = m.app.test_client().get('/api/posts?limit=1', headers=headers)
+    check('writer returns to the replica after the window', newest_content(resp) != 'fresh on the primary')
+
+    os.unlink(REPLICA_PATH)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
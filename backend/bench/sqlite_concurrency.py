@@ -0,0 +1,113 @@
+"""Compare concurrent read/write throughput under different SQLite settings.
+
+Usage: python bench/sqlite_concurrency.py [--seconds N] [--readers N] [--writers N]
+
+Each profile runs in its own process (the engine settings are read from the
+environment at import time) against a fresh seeded database. Reader threads
+page through GET /api/posts while writer threads toggle likes, and the
+script reports requests per second and failed requests for each side:
+
+  defaults   SQLite's own settings: rollback journal, synchronous=FULL, and
+             only the driver's built-in lock timeout
+  tuned      the app defaults: WAL, synchronous=NORMAL, busy_timeout,
+             larger page cache, mmap and in-memory temp tables
+  read-pool  tuned, plus a separate read-only pool serving GET /api/posts
+
+All threads share one interpreter, so absolute numbers are GIL-bound;
+compare the profiles with each other rather than with production traffic.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+PROFILES = {
+    'defaults': {
+        'MINIFB_SQLITE_BUSY_TIMEOUT': '', 'MINIFB_SQLITE_JOURNAL_MODE': 'DELETE',
+        'MINIFB_SQLITE_SYNCHRONOUS': '', 'MINIFB_SQLITE_CACHE_SIZE': '',
+        'MINIFB_SQLITE_MMAP_SIZE': '', 'MINIFB_SQLITE_TEMP_STORE': '',
+        'MINIFB_DB_READ_POOL_SIZE': '0',
+    },
+    'tuned': {'MINIFB_DB_READ_POOL_SIZE': '0'},
+    'read-pool': {'MINIFB_DB_READ_POOL_SIZE': '8'},
+}
+
+
+def run_profile(args):
+    """Run the workload in this process and print one JSON result line."""
+    os.environ['MINIFB_JOB_WORKER'] = 'external'
+    from common import auth_headers, load_app, seed
+
+    m = load_app()
+    client = m.app.test_client()
+    with m.app.app_context():
+        users = seed(m, users=max(args.writers, 3), posts_per_user=40)
+        headers = [auth_headers(m, u) for u in users]
+        post_ids = [p.id for p in m.Post.query.all()]
+
+    stop = threading.Event()
+    results = {'reads': 0, 'read_errors': 0, 'writes': 0, 'write_errors': 0}
+    lock = threading.Lock()
+
+    def record(kind, ok):
+        with lock:
+            results[kind + 's' if ok else kind + '_errors'] += 1
+
+    def reader(seed_value):
+        rng = random.Random(seed_value)
+        while not stop.is_set():
+            resp = client.get(f'/api/posts?page={rng.randint(1, 5)}&limit=20')
+            record('read', resp.status_code == 200)
+
+    def writer(hdrs, seed_value):
+        rng = random.Random(seed_value)
+        while not stop.is_set():
+            resp = client.post(f'/api/posts/{rng.choice(post_ids)}/like', headers=hdrs)
+            record('write', resp.status_code == 200)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(headers[i % len(headers)], 1000 + i))
+                for i in range(args.writers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    print(json.dumps({k: v / args.seconds if not k.endswith('errors') else v
+                      for k, v in results.items()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.profile:
+        run_profile(args)
+        return 0
+
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds:g}s per profile')
+    print(f'{"profile":10} {"reads/s":>9} {"writes/s":>9} {"read errors":>12} {"write errors":>13}')
+    for name, env in PROFILES.items():
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--profile', name,
+             '--seconds', str(args.seconds), '--readers', str(args.readers), '--writers', str(args.writers)],
+            env={**os.environ, **env}, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+        if out.returncode:
+            print(f'{name:10} failed:\n{out.stderr}')
+            return 1
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f'{name:10} {r["reads"]:9.1f} {r["writes"]:9.1f} {r["read_errors"]:12d} {r["write_errors"]:13d}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Measure worker startup: import, create_app() and the first request.
+
+Usage: python bench/startup_time.py [--runs N] [--posts-per-user N]
+
+Seeds a scratch database once, then starts fresh interpreters that each:
+import ``app``, build the app with create_app(), and serve one GET /api/posts
+through the test client. Each phase is timed from the moment before the
+import. Profiles, reported as medians over --runs:
+
+  factory          the current startup: no schema work on boot
+  migrate-on-boot  also runs migrate() (create_all plus the applied-migrations
+                   check) before the first request, as every worker used to
+  preforked        import and create_app() once, then fork a worker as gunicorn
+                   does with preload_app; only the forked worker's cost is shown
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def first_request(app):
+    resp = app.test_client().get('/api/posts')
+    assert resp.status_code == 200, resp.status_code
+
+
+def preforked_worker(app_module):
+    """Fork a worker from this already-started process; return its startup time."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        start = time.perf_counter()
+        app_module.dispose_engines()
+        first_request(app_module.app)
+        os.write(write_fd, str(time.perf_counter() - start).encode())
+        os._exit(0)
+    os.close(write_fd)
+    elapsed = float(os.read(read_fd, 64))
+    os.waitpid(pid, 0)
+    return elapsed
+
+
+def child(args):
+    """Time one startup in this fresh process and print one JSON result line."""
+    start = time.perf_counter()
+    sys.path.insert(0, os.path.join(HERE, '..'))
+    import app as app_module
+    imported = time.perf_counter()
+    app = app_module.create_app()
+    if args.child == 'migrate-on-boot':
+        with app.app_context():
+            app_module.migrate()
+    created = time.perf_counter()
+    if args.child == 'preforked':
+        elapsed = preforked_worker(app_module)
+        print(json.dumps({'import': 0, 'create': 0, 'first_request': elapsed, 'total': elapsed}))
+        return
+    first_request(app)
+    done = time.perf_counter()
+    print(json.dumps({'import': imported - start, 'create': created - imported,
+                      'first_request': done - created, 'total': done - start}))
+
+
+def seed_database(args):
+    os.environ['MINIFB_JOB_WORKER'] = 'external'
+    from common import load_app, seed
+    m = load_app(args.seed)
+    with m.app.app_context():
+        seed(m, users=20, posts_per_user=args.posts_per_user)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--posts-per-user', type=int, default=50)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--seed', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return 0
+    if args.seed:
+        seed_database(args)
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix='minifb-startup-')
+    db_path = os.path.join(workdir, 'app.db')
+    env = {**os.environ, 'MINIFB_DATABASE_URL': f'sqlite:///{db_path}',
+           'MINIFB_JOB_DB': os.path.join(workdir, 'jobs.db'), 'MINIFB_JOB_WORKER': 'external',
+           'MINIFB_UPLOAD_FOLDER': os.path.join(workdir, 'uploads'), 'MINIFB_SECRET': 'bench-' + 'x' * 32}
+    subprocess.run([sys.executable, __file__, '--seed', db_path, '--posts-per-user', str(args.posts_per_user)],
+                   env=env, cwd=HERE, check=True, capture_output=True)
+
+    print(f'{args.runs} runs per profile, median ms')
+    print(f'{"profile":16} {"import":>8} {"create":>8} {"1st req":>8} {"total":>8}')
+    for profile in ('factory', 'migrate-on-boot', 'preforked'):
+        runs = []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, __file__, '--child', profile],
+                                 env=env, cwd=HERE, capture_output=True, text=True)
+            if out.returncode:
+                print(f'{profile} failed:\n{out.stderr}')
+                return 1
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        med = {k: statistics.median(r[k] for r in runs) * 1000 for k in runs[0]}
+        print(f'{profile:16} {med["import"]:8.1f} {med["create"]:8.1f} '
+              f'{med["first_request"]:8.1f} {med["total"]:8.1f}')
+    shutil.rmtree(workdir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Key/value stores behind the HTTP response cache.
+
+Values are ints or bytes, each with an optional TTL in seconds. Two backends:
+
+- ``local``: a bounded in-process LRU. Right for a single worker process;
+  with several workers each keeps its own copy, so a write seen by one
+  worker reaches the others only when their entries expire.
+- ``sqlite``: a key/value table in a SQLite file shared by every worker
+  process on the host, so they all see the same version counters without
+  running an external service (the same trade-off as the SQLite event bus).
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping bounded to ``maxsize`` entries.
+
+    With ``ttl`` (seconds), entries also expire, which bounds how stale a
+    value cached in one worker process can get after another process
+    changes the underlying rows. ``set``/``set_many`` can override it per call.
+    """
+
+    def __init__(self, maxsize=10000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        """Return ``{key: value}`` for the keys that are present and unexpired."""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                value, expires_at = entry
+                if expires_at is not None and expires_at <= now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, items, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (value, expires_at)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl=ttl)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return entry[0] if entry is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Key/value table in a SQLite file shared by worker processes."""
+
+    # Expired rows are deleted on roughly one write in this many
+    PRUNE_EVERY = 500
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Threads open their own connections on first use, so a process forked
+        # after this (gunicorn preload_app) inherits none
+        with closing(sqlite3.connect(path, timeout=5, isolation_level=None)) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache ('
+                         'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        rows = self._connect().execute(
+            f'SELECT key, value FROM cache WHERE key IN ({", ".join("?" * len(keys))}) '
+            'AND (expires_at IS NULL OR expires_at > ?)', (*keys, time.time())).fetchall()
+        return dict(rows)
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        conn = self._connect()
+        conn.executemany('INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                         [(key, value, expires_at) for key, value in items.items()])
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            conn.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),))
+
+    def set(self, key, value, ttl=None):
+        self.set_many({key: value}, ttl=ttl)
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache')
+
+
+def create_cache(backend='local', path=None, maxsize=10000):
+    if backend == 'local':
+        return LRUCache(maxsize)
+    if backend == 'sqlite':
+        return SQLiteCache(path)
+    raise ValueError(f'Unknown cache backend: {backend}')
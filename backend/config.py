@@ -0,0 +1,121 @@
+"""Configuration classes for ``create_app()``.
+
+Values come from ``MINIFB_*`` environment variables, read when this module
+is imported. ``create_app()`` takes one of these classes or its name in
+CONFIGS; the default name comes from MINIFB_CONFIG.
+"""
+import os
+import tempfile
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DB_PATH = os.path.abspath(os.path.join(BASE_DIR, '..', 'database', 'mini_fb.db'))
+DATA_DIR = os.path.dirname(DB_PATH)
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.environ.get('MINIFB_DATABASE_URL', f'sqlite:///{DB_PATH}')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SECRET_KEY = os.environ.get('MINIFB_SECRET', 'dev-secret-change-me')
+    UPLOAD_FOLDER = os.environ.get('MINIFB_UPLOAD_FOLDER', os.path.join(BASE_DIR, '..', 'uploads'))
+    MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max
+    # Notification event bus: 'local' (single process) or 'sqlite' (shared by workers)
+    EVENT_BACKEND = os.environ.get('MINIFB_EVENT_BACKEND', 'local')
+    EVENT_DB_PATH = os.environ.get('MINIFB_EVENT_DB', os.path.join(DATA_DIR, 'events.db'))
+    # Background jobs: SQLite queue file, drained by a worker thread in this
+    # process ('thread') or only by 'flask --app app run-worker' ('external')
+    JOB_DB_PATH = os.environ.get('MINIFB_JOB_DB', os.path.join(DATA_DIR, 'jobs.db'))
+    JOB_WORKER = os.environ.get('MINIFB_JOB_WORKER', 'thread')
+    # Start the 'thread' worker when the app is built, not on the first enqueue
+    JOB_WORKER_AUTOSTART = os.environ.get('MINIFB_JOB_WORKER_AUTOSTART', '1') == '1'
+    # HTTP response cache store: 'local' (per process) or 'sqlite' (shared by workers)
+    HTTP_CACHE_BACKEND = os.environ.get('MINIFB_HTTP_CACHE_BACKEND', 'local')
+    HTTP_CACHE_DB_PATH = os.environ.get('MINIFB_HTTP_CACHE_DB', os.path.join(DATA_DIR, 'http_cache.db'))
+    # Response bodies kept per process, and how long (seconds) they and per-process versions live
+    HTTP_CACHE_SIZE = int(os.environ.get('MINIFB_HTTP_CACHE_SIZE', 5000))
+    HTTP_CACHE_TTL = int(os.environ.get('MINIFB_HTTP_CACHE_TTL', 300))
+    # Other in-process caches: entries per worker process, TTLs in seconds
+    USER_CACHE_SIZE = int(os.environ.get('MINIFB_USER_CACHE_SIZE', 10000))
+    FRIEND_CACHE_SIZE = int(os.environ.get('MINIFB_FRIEND_CACHE_SIZE', 10000))
+    TYPEAHEAD_CACHE_SIZE = int(os.environ.get('MINIFB_TYPEAHEAD_CACHE_SIZE', 2000))
+    TYPEAHEAD_CACHE_TTL = int(os.environ.get('MINIFB_TYPEAHEAD_CACHE_TTL', 60))
+    STORY_TRAY_CACHE_SIZE = int(os.environ.get('MINIFB_STORY_TRAY_CACHE_SIZE', 10000))
+    STORY_TRAY_TTL = int(os.environ.get('MINIFB_STORY_TRAY_TTL', 30))
+    # Home timelines keep TIMELINE_MAX_ENTRIES posts each; authors with more than
+    # TIMELINE_FANOUT_LIMIT friends are merged in at read time instead
+    TIMELINE_MAX_ENTRIES = int(os.environ.get('MINIFB_TIMELINE_MAX_ENTRIES', 800))
+    TIMELINE_FANOUT_LIMIT = int(os.environ.get('MINIFB_TIMELINE_FANOUT_LIMIT', 1000))
+    COMMENT_PAGE_SIZE = int(os.environ.get('MINIFB_COMMENT_PAGE_SIZE', 20))
+    # Seconds between runs of the expired-story reaper
+    STORY_REAP_INTERVAL = int(os.environ.get('MINIFB_STORY_REAP_INTERVAL', 600))
+    # SQLite pragmas run on every new connection, busy_timeout first so the
+    # journal_mode switch waits out other writers. An empty value keeps SQLite's default.
+    SQLITE_PRAGMAS = {
+        'busy_timeout': os.environ.get('MINIFB_SQLITE_BUSY_TIMEOUT', '5000'),  # ms
+        'journal_mode': os.environ.get('MINIFB_SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('MINIFB_SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'cache_size': os.environ.get('MINIFB_SQLITE_CACHE_SIZE', '-65536'),  # negative = KiB
+        'mmap_size': os.environ.get('MINIFB_SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+        'temp_store': os.environ.get('MINIFB_SQLITE_TEMP_STORE', 'MEMORY'),
+    }
+    # Connection pool sizes. A read pool size above 0 adds a second, read-only
+    # SQLite pool on the same file for endpoints marked @replica_reads.
+    DB_POOL_SIZE = int(os.environ.get('MINIFB_DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('MINIFB_DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('MINIFB_DB_POOL_TIMEOUT', 30))
+    DB_READ_POOL_SIZE = int(os.environ.get('MINIFB_DB_READ_POOL_SIZE', 0))
+    # Read replica (e.g. a PostgreSQL streaming replica) for @replica_reads
+    # endpoints; takes the place of the SQLite read pool. A user who wrote in the
+    # last REPLICA_STICKY_SECONDS reads from the primary so they see their writes.
+    DATABASE_REPLICA_URL = os.environ.get('MINIFB_DATABASE_REPLICA_URL', '')
+    REPLICA_STICKY_SECONDS = int(os.environ.get('MINIFB_REPLICA_STICKY_SECONDS', 5))
+    # Likes and shares: above 0, writes from all request threads are buffered and
+    # applied together in one transaction every ENGAGEMENT_WRITE_BEHIND_MS
+    ENGAGEMENT_WRITE_BEHIND_MS = int(os.environ.get('MINIFB_ENGAGEMENT_WRITE_BEHIND_MS', 0))
+    ENGAGEMENT_BATCH_MAX = int(os.environ.get('MINIFB_ENGAGEMENT_BATCH_MAX', 500))
+    # Password hashing runs on a bounded pool ('thread', 'process' or 'inline') of
+    # HASH_WORKERS, half the cores by default. With them all busy and HASH_QUEUE
+    # more waiting, signup/login answer 503; keep the two together below the
+    # request threads so hashing can't take them all.
+    # Changing the method upgrades each user's hash at their next login.
+    PASSWORD_HASH_METHOD = os.environ.get('MINIFB_PASSWORD_HASH_METHOD', 'scrypt')
+    HASH_POOL = os.environ.get('MINIFB_HASH_POOL', 'thread')
+    HASH_WORKERS = int(os.environ.get('MINIFB_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    HASH_QUEUE = int(os.environ.get('MINIFB_HASH_QUEUE', 4))
+    # Media serving: '' streams files from Flask; 'x-accel' or 'x-sendfile' leaves
+    # the bytes to the front proxy (see Media Serving in app.py)
+    MEDIA_OFFLOAD = os.environ.get('MINIFB_MEDIA_OFFLOAD', '')
+    X_ACCEL_PREFIX = os.environ.get('MINIFB_X_ACCEL_PREFIX', '/_protected_uploads/')
+    # JSON encoding: 'orjson', 'std' or 'auto' (orjson when installed); see serialization.py.
+    # List endpoints stream pages of up to STREAM_LIMIT_MAX items with ?stream=json|ndjson.
+    JSON_BACKEND = os.environ.get('MINIFB_JSON_BACKEND', 'auto')
+    STREAM_LIMIT_MAX = int(os.environ.get('MINIFB_STREAM_LIMIT_MAX', 1000))
+    # Open notification streams per worker process. Each holds a request thread,
+    # so keep this below MINIFB_WEB_THREADS; clients above it fall back to polling.
+    NOTIFY_STREAMS_MAX = int(os.environ.get('MINIFB_NOTIFY_STREAMS_MAX', 4))
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    DEBUG = False
+
+
+class TestingConfig(Config):
+    # Everything a test run writes goes under a scratch directory, not the working tree
+    TEST_DIR = os.environ.get('MINIFB_TEST_DIR', os.path.join(tempfile.gettempdir(), f'minifb-test-{os.getpid()}'))
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    UPLOAD_FOLDER = os.path.join(TEST_DIR, 'uploads')
+    EVENT_DB_PATH = os.path.join(TEST_DIR, 'events.db')
+    JOB_DB_PATH = os.path.join(TEST_DIR, 'jobs.db')
+    HTTP_CACHE_DB_PATH = os.path.join(TEST_DIR, 'http_cache.db')
+    JOB_WORKER = 'external'
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
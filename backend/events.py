@@ -0,0 +1,144 @@
+"""Publish/subscribe bus for real-time notifications.
+
+Handlers publish small JSON-able dicts addressed to a user ID; the
+notification stream endpoint subscribes per connected client. Two backends:
+
+- ``local``: in-process fan-out. Right for a single worker process.
+- ``sqlite``: publishers append to a shared SQLite event log and one poller
+  thread per process delivers new rows to that process's subscribers. This
+  is a stand-in broker that lets several worker processes on one host share
+  events without running an external service.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import closing
+
+
+class Subscription:
+    """A bounded per-connection event queue."""
+
+    def __init__(self, user_id, maxsize=100):
+        self.user_id = user_id
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Slow consumer: drop rather than block publishers
+            pass
+
+    def get(self, timeout=None):
+        """Return the next event, or None if ``timeout`` seconds pass first."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LocalEventBus:
+    """Fan events out to subscribers in this process."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        sub = Subscription(user_id)
+        with self._lock:
+            self._subscribers[user_id].add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def publish(self, user_id, event):
+        self.deliver(user_id, event)
+
+    def deliver(self, user_id, event):
+        with self._lock:
+            subs = list(self._subscribers.get(user_id, ()))
+        for sub in subs:
+            sub.put(event)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+class SQLiteEventBus(LocalEventBus):
+    """Share events between processes through an append-only SQLite log."""
+
+    def __init__(self, path, poll_interval=0.25, retention=300):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._local = threading.local()
+        self._poller = None
+        self._poller_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Threads open their own connections on first use (see JobQueue)
+        with closing(sqlite3.connect(path, timeout=5)) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS events ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, '
+                'payload TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def publish(self, user_id, event):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute('INSERT INTO events (user_id, payload, created_at) VALUES (?, ?, ?)',
+                         (user_id, json.dumps(event), now))
+            conn.execute('DELETE FROM events WHERE created_at < ?', (now - self.retention,))
+
+    def subscribe(self, user_id):
+        self._ensure_poller()
+        return super().subscribe(user_id)
+
+    def _ensure_poller(self):
+        with self._poller_lock:
+            if self._poller is None:
+                row = self._connect().execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()
+                self._poller = threading.Thread(target=self._poll, args=(row[0],),
+                                                name='event-bus-poller', daemon=True)
+                self._poller.start()
+
+    def _poll(self, last_id):
+        conn = sqlite3.connect(self.path, timeout=5)
+        while True:
+            rows = conn.execute('SELECT id, user_id, payload FROM events WHERE id > ? ORDER BY id',
+                                (last_id,)).fetchall()
+            for event_id, user_id, payload in rows:
+                last_id = event_id
+                self.deliver(user_id, json.loads(payload))
+            time.sleep(self.poll_interval)
+
+
+def create_event_bus(backend='local', path=None):
+    if backend == 'local':
+        return LocalEventBus()
+    if backend == 'sqlite':
+        return SQLiteEventBus(path)
+    raise ValueError(f'Unknown event bus backend: {backend}')
@@ -0,0 +1,40 @@
+"""Gunicorn settings for the production server, read from MINIFB_WEB_* variables.
+
+  MINIFB_WEB_BIND     address to listen on (127.0.0.1:5000)
+  MINIFB_WEB_WORKERS  worker processes (2 x cores + 1)
+  MINIFB_WEB_THREADS  request threads per worker (8); above 1 uses gthread workers
+  MINIFB_WEB_TIMEOUT  seconds before a silent worker is restarted (60)
+  MINIFB_WEB_PRELOAD  import the app once in the master, then fork (1)
+
+Each worker has its own caches and background threads. With several workers
+use the shared backends (MINIFB_EVENT_BACKEND=sqlite, MINIFB_HTTP_CACHE_BACKEND=sqlite)
+so notifications and cache invalidations reach every worker. Keep
+MINIFB_HASH_WORKERS + MINIFB_HASH_QUEUE below MINIFB_WEB_THREADS. Every open
+notification stream holds a request thread, so each worker accepts at most
+MINIFB_NOTIFY_STREAMS_MAX (4) of them and answers 503 above that; keep it
+below MINIFB_WEB_THREADS.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('MINIFB_WEB_BIND', '127.0.0.1:5000')
+workers = int(os.environ.get('MINIFB_WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('MINIFB_WEB_THREADS', 8))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('MINIFB_WEB_TIMEOUT', 60))
+preload_app = os.environ.get('MINIFB_WEB_PRELOAD', '1') == '1'
+accesslog = '-'
+# With preload_app the app is built in the master; a job thread started there
+# would not survive the fork, so each worker starts its own in post_fork
+if preload_app:
+    os.environ.setdefault('MINIFB_JOB_WORKER_AUTOSTART', '0')
+
+
+def post_fork(server, worker):
+    # With preload_app the engines were created in the master; each worker
+    # must open its own connections rather than share the master's. The SQLite
+    # job queue, event bus and cache open theirs per thread on first use.
+    if preload_app:
+        import app
+        app.dispose_engines()
+        app.start_job_worker()
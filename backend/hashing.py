@@ -0,0 +1,83 @@
+"""Bounded pool for password hashing.
+
+Password hashes (scrypt, pbkdf2) are slow on purpose: tens to hundreds of
+milliseconds of CPU each. Run inline, a burst of logins occupies every
+request worker for that long. ``PasswordHasher`` runs them on a fixed number
+of workers and refuses work beyond a queue limit by raising ``HasherBusy``,
+so callers can answer at once instead of queueing behind the burst.
+
+Pools:
+
+- ``thread``: hashlib releases the GIL while hashing, so worker threads
+  hash in parallel with request threads; ``workers`` caps the cores used.
+- ``process``: the same, in child processes started on first use.
+- ``inline``: hash in the calling thread with no limit (the old behaviour).
+"""
+import functools
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when every worker is busy and the queue is full."""
+
+
+@functools.lru_cache(maxsize=None)
+def _method_prefix(method):
+    # The "scrypt:32768:8:1" part of a hash made with ``method`` today
+    return generate_password_hash('', method).split('$', 1)[0]
+
+
+def _verify(pwhash, password, method):
+    """Check ``password``; return ``(ok, new_hash)``.
+
+    ``new_hash`` is set when the stored hash was made with other parameters
+    than ``method`` currently produces, so the caller can upgrade it.
+    """
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split('$', 1)[0] == _method_prefix(method):
+        return True, None
+    return True, generate_password_hash(password, method)
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', pool='thread', workers=2, max_queue=4):
+        if pool not in ('thread', 'process', 'inline'):
+            raise ValueError(f'Unknown hash pool: {pool}')
+        self.method = method
+        self.pool = pool
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self._outstanding = 0
+
+    def _run(self, fn, *args):
+        if self.pool == 'inline':
+            return fn(*args)
+        with self._lock:
+            if self._outstanding >= self.workers + self.max_queue:
+                raise HasherBusy()
+            self._outstanding += 1
+            if self._executor is None:
+                executor = ProcessPoolExecutor if self.pool == 'process' else ThreadPoolExecutor
+                self._executor = executor(max_workers=self.workers)
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._outstanding -= 1
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """Check ``password`` against ``pwhash``; return ``(ok, upgraded hash or None)``."""
+        return self._run(_verify, pwhash, password, self.method)
+
+    def stats(self):
+        return {'pool': self.pool, 'workers': self.workers, 'max_queue': self.max_queue,
+                'outstanding': self._outstanding}
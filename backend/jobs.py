@@ -0,0 +1,151 @@
+"""SQLite-backed background job queue.
+
+Jobs are rows in a small SQLite file, so any process on the host can enqueue
+them and any number of workers can drain them without an external broker.
+A worker runs either as a daemon thread inside the web process or as a
+separate process (``flask --app app run-worker``).
+
+Handlers are plain callables taking the job payload (a JSON-able dict). A
+handler that raises is retried with exponential backoff up to
+``max_attempts`` times, then left in the ``failed`` state with its error.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+log = logging.getLogger(__name__)
+
+
+class JobQueue:
+    def __init__(self, path, lease_seconds=300):
+        self.path = path
+        # A claimed job whose worker dies becomes claimable again after this
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Set up with a throwaway connection: threads open their own on first
+        # use, so a process forked after this (gunicorn preload_app) inherits none
+        with closing(sqlite3.connect(path, timeout=10)) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, '
+                "status TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0, "
+                'run_after REAL NOT NULL, last_error TEXT, created_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_jobs_status_run_after ON jobs (status, run_after)')
+            conn.commit()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind, payload, delay=0, unique=False):
+        """Queue a job; with ``unique``, skip it if a ``kind`` job is already queued.
+
+        Returns the new job ID, or None if a unique job was skipped.
+        """
+        now = time.time()
+        if unique:
+            cur = self._connect().execute(
+                'INSERT INTO jobs (kind, payload, run_after, created_at) SELECT ?, ?, ?, ? '
+                "WHERE NOT EXISTS (SELECT 1 FROM jobs WHERE kind = ? AND status = 'queued')",
+                (kind, json.dumps(payload), now + delay, now, kind))
+            return cur.lastrowid if cur.rowcount else None
+        cur = self._connect().execute(
+            'INSERT INTO jobs (kind, payload, run_after, created_at) VALUES (?, ?, ?, ?)',
+            (kind, json.dumps(payload), now + delay, now))
+        return cur.lastrowid
+
+    def claim(self):
+        """Atomically take the next due job; return ``(id, kind, payload, attempts)`` or None."""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs "
+                "WHERE status IN ('queued', 'running') AND run_after <= ? ORDER BY run_after, id LIMIT 1",
+                (now,)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            # run_after doubles as the lease expiry while the job is running
+            conn.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, run_after = ? "
+                         "WHERE id = ?", (now + self.lease_seconds, row[0]))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return row[0], row[1], json.loads(row[2]), row[3] + 1
+
+    def complete(self, job_id):
+        self._connect().execute("UPDATE jobs SET status = 'done', last_error = NULL WHERE id = ?", (job_id,))
+
+    def fail(self, job_id, error, retry_in=None):
+        if retry_in is None:
+            self._connect().execute("UPDATE jobs SET status = 'failed', last_error = ? WHERE id = ?",
+                                    (error, job_id))
+        else:
+            self._connect().execute(
+                "UPDATE jobs SET status = 'queued', last_error = ?, run_after = ? WHERE id = ?",
+                (error, time.time() + retry_in, job_id))
+
+    def prune(self, older_than=7 * 24 * 3600):
+        self._connect().execute("DELETE FROM jobs WHERE status = 'done' AND created_at < ?",
+                                (time.time() - older_than,))
+
+    def counts(self):
+        return dict(self._connect().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+
+class Worker:
+    def __init__(self, queue, handlers, poll_interval=1.0, max_attempts=3):
+        self.queue = queue
+        self.handlers = handlers
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self._thread = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def run_once(self):
+        """Run one due job; return False if the queue had nothing to do."""
+        job = self.queue.claim()
+        if job is None:
+            return False
+        job_id, kind, payload, attempts = job
+        handler = self.handlers.get(kind)
+        if handler is None:
+            self.queue.fail(job_id, f'no handler for {kind!r}')
+            return True
+        try:
+            handler(payload)
+        except Exception as e:
+            log.exception('job %s (%s) failed', job_id, kind)
+            retry_in = 2 ** attempts if attempts < self.max_attempts else None
+            self.queue.fail(job_id, repr(e), retry_in=retry_in)
+        else:
+            self.queue.complete(job_id)
+        return True
+
+    def run_forever(self):
+        while True:
+            if not self.run_once():
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start_background(self):
+        """Start a daemon worker thread in this process (once)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run_forever, name='job-worker', daemon=True)
+                self._thread.start()
+        self._wake.set()
@@ -5,5 +5,10 @@ IF NOT EXIST "%VENV_PY%" (
   echo Virtual environment not found. Creating one...
   python -m venv "%~dp0venv"
 )
-"%VENV_PY%" -m pip install -r "%~dp0requirements.txt"
+REM Reinstall only when requirements.txt changed since the last install
+fc /b "%~dp0requirements.txt" "%~dp0venv\requirements.installed" >nul 2>&1
+IF ERRORLEVEL 1 (
+  "%VENV_PY%" -m pip install -r "%~dp0requirements.txt" && copy /y "%~dp0requirements.txt" "%~dp0venv\requirements.installed" >nul
+)
+"%VENV_PY%" -m flask --app "%~dp0app.py" db-upgrade
 "%VENV_PY%" "%~dp0app.py"
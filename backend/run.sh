@@ -0,0 +1,19 @@
+#!/bin/sh
+# Production launcher: apply schema migrations once, then start gunicorn.
+# Worker and thread counts come from MINIFB_WEB_* (see gunicorn.conf.py).
+set -e
+cd "$(dirname "$0")"
+VENV_PY=venv/bin/python
+if [ ! -x "$VENV_PY" ]; then
+  echo "Virtual environment not found. Creating one..."
+  python3 -m venv venv
+fi
+# Reinstall only when the requirements changed since the last install
+if ! cmp -s requirements-server.txt venv/requirements.installed 2>/dev/null \
+   || ! cmp -s requirements.txt venv/requirements.base.installed 2>/dev/null; then
+  "$VENV_PY" -m pip install -r requirements-server.txt
+  cp requirements-server.txt venv/requirements.installed
+  cp requirements.txt venv/requirements.base.installed
+fi
+"$VENV_PY" -m flask --app app db-upgrade
+exec "$VENV_PY" -m gunicorn -c gunicorn.conf.py wsgi:app
@@ -0,0 +1,75 @@
+"""JSON providers for ``app.json``: everything jsonify() and the list streams write.
+
+Providers:
+
+- ``orjson``: encodes in C straight to bytes and writes datetimes itself,
+  so serializers can hand it ``created_at`` as is. Needs the orjson package.
+- ``std``: Flask's provider on the json module, with datetimes written as
+  ISO 8601 like orjson (Flask's default writes HTTP dates), so responses
+  are the same whichever one runs.
+
+Both add ``dumpb(obj) -> bytes``, always compact and on one line, for
+writing streamed list items; only whole responses are indented in debug.
+"""
+import decimal
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the std provider is used without it
+    orjson = None
+
+
+def _std_default(o):
+    if isinstance(o, date):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class StdJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_std_default)
+    # Keep the serializers' key order and write UTF-8, as orjson does
+    sort_keys = False
+    ensure_ascii = False
+
+    def dumpb(self, obj):
+        return self.dumps(obj, separators=(',', ':')).encode()
+
+
+def _orjson_default(o):
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class ORJSONProvider(JSONProvider):
+    def dumpb(self, obj, option=0):
+        return orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS | option)
+
+    def dumps(self, obj, **kwargs):
+        return self.dumpb(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_INDENT_2 if self._app.debug else 0
+        return self._app.response_class(self.dumpb(obj, option), mimetype='application/json')
+
+
+def create_json_provider(backend, app):
+    """Build the provider for ``backend``: 'orjson', 'std', or 'auto' (orjson if installed)."""
+    if backend == 'auto':
+        backend = 'std' if orjson is None else 'orjson'
+    if backend == 'orjson':
+        if orjson is None:
+            raise ValueError('JSON backend orjson needs the orjson package')
+        return ORJSONProvider(app)
+    if backend == 'std':
+        return StdJSONProvider(app)
+    raise ValueError(f'Unknown JSON backend: {backend}')
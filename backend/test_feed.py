@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import event
+
+import app as minifb
+from config import TestingConfig
+
+PAGE_SIZES = (5, 20)
+
+
+@pytest.fixture
+def client():
+    flask_app = minifb.create_app(TestingConfig)
+    with flask_app.app_context():
+        minifb.migrate()
+    yield flask_app.test_client()
+    with flask_app.app_context():
+        minifb.db.session.remove()
+        minifb.db.drop_all()
+    minifb.clear_http_cache()
+
+
+def seed_posts(posts_per_user=max(PAGE_SIZES)):
+    """Two users, each with posts that have media, likes and comments; return their headers."""
+    db = minifb.db
+    users = [minifb.User(email=f'user{i}@example.com', username=f'user{i}', password_hash='x') for i in range(2)]
+    db.session.add_all(users)
+    db.session.flush()
+    for user in users:
+        db.session.add(minifb.Profile(user_id=user.id, first_name='First', surname=user.username))
+        for j in range(posts_per_user):
+            post = minifb.Post(user_id=user.id, content=f'post {j} by {user.username}')
+            db.session.add(post)
+            db.session.flush()
+            db.session.add(minifb.PostMedia(post_id=post.id, media_type='image',
+                                            media_url=f'/api/uploads/{post.id}.jpg', file_name=f'{post.id}.jpg'))
+            for other in users:
+                db.session.add(minifb.Like(post_id=post.id, user_id=other.id))
+                db.session.add(minifb.Comment(post_id=post.id, user_id=other.id, content='nice'))
+    db.session.commit()
+    minifb.reconcile_counters()
+    return [{'Authorization': f'Bearer {minifb.create_token(u.id, u.email, u.username)}'} for u in users]
+
+
+def count_queries(client, path, headers):
+    """Return how many SQL statements one GET of ``path`` runs."""
+    count = 0
+
+    def _count(*args):
+        nonlocal count
+        count += 1
+
+    engines = [e for e in (minifb.db.engine, minifb.read_engine) if e is not None]
+    for engine in engines:
+        event.listen(engine, 'after_cursor_execute', _count)
+    try:
+        minifb.clear_http_cache()  # count the handler's queries, not a cache hit
+        resp = client.get(path, headers=headers)
+    finally:
+        for engine in engines:
+            event.remove(engine, 'after_cursor_execute', _count)
+    assert resp.status_code == 200, resp.get_data(as_text=True)
+    return count, resp.get_json()
+
+
+@pytest.mark.parametrize('path', ['/api/posts?page=1', '/api/users/user1/posts?page=1'])
+@pytest.mark.parametrize('viewer', ['anonymous', 'authenticated'])
+def test_feed_query_count_is_constant(client, path, viewer):
+    with client.application.app_context():
+        viewer_headers = seed_posts()[0]
+        headers = viewer_headers if viewer == 'authenticated' else {}
+        counts = {}
+        for size in PAGE_SIZES:
+            counts[size], body = count_queries(client, f'{path}&limit={size}', headers)
+            assert len(body['posts']) == size
+    assert len(set(counts.values())) == 1, f'queries by page size: {counts}'
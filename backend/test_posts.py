@@ -0,0 +1,63 @@
+import pytest
+
+import app as minifb
+from config import TestingConfig
+
+
+class ForeignKeysConfig(TestingConfig):
+    SQLITE_PRAGMAS = {**TestingConfig.SQLITE_PRAGMAS, 'foreign_keys': 'ON'}
+
+
+@pytest.fixture
+def client():
+    flask_app = minifb.create_app(ForeignKeysConfig)
+    with flask_app.app_context():
+        minifb.migrate()
+    yield flask_app.test_client()
+    with flask_app.app_context():
+        minifb.db.session.remove()
+        minifb.db.drop_all()
+    minifb.clear_http_cache()
+
+
+def make_user(name):
+    user = minifb.User(email=f'{name}@example.com', username=name, password_hash='x')
+    minifb.db.session.add(user)
+    minifb.db.session.flush()
+    minifb.db.session.add(minifb.NotificationCounter(user_id=user.id))
+    minifb.db.session.commit()
+    token = minifb.create_token(user.id, user.email, user.username)
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_delete_shared_post(client):
+    with client.application.app_context():
+        author = make_user('author')
+        reader = make_user('reader')
+    post_id = client.post('/api/posts', json={'content': 'hello'}, headers=author).get_json()['post']['id']
+    assert client.post(f'/api/posts/{post_id}/like', headers=reader).status_code == 200
+    assert client.post(f'/api/posts/{post_id}/comments', json={'content': 'hi'}, headers=reader).status_code == 200
+    assert client.post(f'/api/posts/{post_id}/share', headers=reader).status_code == 200
+
+    resp = client.delete(f'/api/posts/{post_id}', headers=author)
+    assert resp.status_code == 200, resp.get_json()
+    with client.application.app_context():
+        assert minifb.db.session.get(minifb.Post, post_id) is None
+        assert minifb.Share.query.filter_by(post_id=post_id).count() == 0
+
+
+def test_delete_post_clears_unread_notifications(client):
+    with client.application.app_context():
+        author = make_user('author')
+        reader = make_user('reader')
+    post_id = client.post('/api/posts', json={'content': 'hello'}, headers=author).get_json()['post']['id']
+    client.post(f'/api/posts/{post_id}/like', headers=reader)
+    client.post(f'/api/posts/{post_id}/comments', json={'content': 'hi'}, headers=reader)
+    summary = client.get('/api/notifications/summary', headers=author).get_json()
+    assert (summary['newLikes'], summary['newComments']) == (1, 1)
+
+    assert client.delete(f'/api/posts/{post_id}', headers=author).status_code == 200
+    summary = client.get('/api/notifications/summary', headers=author).get_json()
+    assert (summary['newLikes'], summary['newComments']) == (0, 0)
+    with client.application.app_context():
+        assert minifb.rebuild_notification_counters(fix=False) == []
@@ -0,0 +1,80 @@
+"""Write-behind buffer that batches small writes into one transaction.
+
+Request threads ``submit()`` an item and block until it has been applied.
+A single flusher thread waits up to ``interval`` seconds after the first
+pending item (or until ``max_batch`` items are waiting), then passes the
+whole batch to ``apply(items)``, which returns one result per item in the
+same order. If ``apply`` raises, every caller in that batch gets the error.
+
+Under contention this turns many short write transactions, each queueing
+for the database's write lock, into one transaction per interval, at the
+cost of up to ``interval`` seconds of added latency per write.
+"""
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class _Pending:
+    __slots__ = ('item', 'result', 'error', 'done')
+
+    def __init__(self, item):
+        self.item = item
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class WriteBuffer:
+    def __init__(self, apply, interval=0.005, max_batch=500):
+        self.apply = apply
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, item):
+        """Queue ``item``, wait for its batch to be applied and return its result."""
+        pending = _Pending(item)
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='write-buffer', daemon=True)
+                self._thread.start()
+            self._pending.append(pending)
+            self._cond.notify()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.interval
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self.apply([p.item for p in batch])
+            except Exception as e:
+                log.exception('write batch of %d item(s) failed', len(batch))
+                for p in batch:
+                    p.error = e
+            else:
+                for p, result in zip(batch, results):
+                    p.result = result
+            for p in batch:
+                p.done.set()
@@ -0,0 +1,8 @@
+"""WSGI entry point: ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+Pick the config with MINIFB_CONFIG (production by default). The schema is
+not touched here; run ``flask --app app db-upgrade`` before starting.
+"""
+from app import create_app
+
+app = create_app()
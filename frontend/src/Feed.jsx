@@ -14,6 +14,7 @@ function Feed() {
   const [commentsError, setCommentsError] = useState({}); // postId -> error text
   const [commentsLoading, setCommentsLoading] = useState({}); // postId -> bool
   const [commentSubmitting, setCommentSubmitting] = useState({}); // postId -> bool
+  const [commentCursors, setCommentCursors] = useState({}); // postId -> nextCursor or null
   const [liked, setLiked] = useState({}); // postId -> bool (session-only)
   const [page, setPage] = useState(1);
   const [hasMore, setHasMore] = useState(true);
@@ -163,13 +164,17 @@ function Feed() {
     }
   };
 
-  const fetchComments = async (postId) => {
+  const fetchComments = async (postId, cursor = '') => {
     try {
       setCommentsLoading(prev => ({ ...prev, [postId]: true }));
-      const res = await fetch(`/api/posts/${postId}/comments`);
+      const res = await fetch(`/api/posts/${postId}/comments?cursor=${encodeURIComponent(cursor)}`);
       if (!res.ok) throw new Error('Failed to load comments');
       const data = await res.json();
-      setComments(prev => ({ ...prev, [postId]: data.comments || [] }));
+      setComments(prev => ({
+        ...prev,
+        [postId]: cursor ? [ ...(prev[postId] || []), ...(data.comments || []) ] : (data.comments || []),
+      }));
+      setCommentCursors(prev => ({ ...prev, [postId]: data.nextCursor || null }));
       setCommentsError(prev => ({ ...prev, [postId]: '' }));
     } catch (e) {
       setCommentsError(prev => ({ ...prev, [postId]: 'Could not load comments.' }));
@@ -212,10 +217,13 @@ function Feed() {
         return;
       }
       if (res.ok) {
-        setComments(prev => ({
-          ...prev,
-          [postId]: [ ...(prev[postId] || []), data.comment ],
-        }));
+        // With older pages still unloaded, the new comment arrives with the last page
+        if (!commentCursors[postId]) {
+          setComments(prev => ({
+            ...prev,
+            [postId]: [ ...(prev[postId] || []), data.comment ],
+          }));
+        }
         setCommentInputs(prev => ({ ...prev, [postId]: '' }));
         // update comments count on the post
         setPosts(prev => prev.map(p => p.id === postId ? { ...p, comments: data.comments } : p));
@@ -412,6 +420,8 @@ function Feed() {
               onSubmitComment={submitComment}
               commentError={openComments[post.id] ? (commentsError[post.id] || '') : ''}
               onRetryComments={() => fetchComments(post.id)}
+              hasMoreComments={!!commentCursors[post.id]}
+              onLoadMoreComments={(postId) => fetchComments(postId, commentCursors[postId])}
               commentLoading={openComments[post.id] ? !!commentsLoading[post.id] : false}
               commentSubmitting={openComments[post.id] ? !!commentSubmitting[post.id] : false}
               isOwner={(post.username || '').toLowerCase() === currentUser.toLowerCase()}
@@ -39,10 +39,57 @@ function PostForm({ onPostCreated }) {
     notify('info', 'This experience is coming soon.');
   };
 
+  // Large files go through the resumable chunked upload API
+  const CHUNKED_UPLOAD_THRESHOLD = 5 * 1024 * 1024;
+
+  const uploadFileChunked = async (file, token) => {
+    const auth = { Authorization: `Bearer ${token}` };
+    const initRes = await fetch('/api/upload/chunked', {
+      method: 'POST',
+      headers: { ...auth, 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name, size: file.size }),
+    });
+    const init = await initRes.json();
+    if (!initRes.ok) throw new Error(init.message || 'Upload failed');
+
+    let offset = 0;
+    let retries = 0;
+    while (offset < file.size) {
+      const chunk = file.slice(offset, offset + init.chunkSize);
+      const res = await fetch(`/api/upload/chunked/${init.uploadId}`, {
+        method: 'PUT',
+        headers: { ...auth, 'Upload-Offset': String(offset) },
+        body: chunk,
+      }).catch(() => null);
+      const data = res ? await res.json().catch(() => ({})) : {};
+      if (res && (res.ok || res.status === 409) && typeof data.received === 'number') {
+        offset = data.received;
+        retries = 0;
+      } else if (++retries > 3) {
+        throw new Error(data.message || 'Upload failed');
+      }
+    }
+
+    const res = await fetch(`/api/upload/chunked/${init.uploadId}/finalize`, { method: 'POST', headers: auth });
+    const data = await res.json();
+    if (!res.ok) throw new Error(data.message || 'Upload failed');
+    return data;
+  };
+
   const uploadFile = async (file) => {
     const token = requireAuth();
     if (!token) return null;
 
+    if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+      const data = await uploadFileChunked(file, token);
+      return {
+        url: data.url,
+        type: data.media_type,
+        filename: data.filename,
+        size: file.size
+      };
+    }
+
     const formData = new FormData();
     formData.append('file', file);
 
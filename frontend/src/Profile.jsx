@@ -51,6 +51,7 @@ export default function Profile({ username }) {
   const [commentSubmitting, setCommentSubmitting] = useState({}); // postId -> bool
   const [commentInputs, setCommentInputs] = useState({});
   const [openComments, setOpenComments] = useState({});
+  const [commentCursors, setCommentCursors] = useState({}); // postId -> nextCursor or null
   const [page, setPage] = useState(1);
   const [hasMore, setHasMore] = useState(true);
   const navigate = useNavigate();
@@ -381,13 +382,17 @@ export default function Profile({ username }) {
     if (!comments[postId]) await fetchComments(postId);
   };
 
-  const fetchComments = async (postId) => {
+  const fetchComments = async (postId, cursor = '') => {
     try {
       setCommentsLoading(prev => ({ ...prev, [postId]: true }));
-      const res = await fetch(`/api/posts/${postId}/comments`);
+      const res = await fetch(`/api/posts/${postId}/comments?cursor=${encodeURIComponent(cursor)}`);
       if (!res.ok) throw new Error('Failed to load comments');
       const data = await res.json();
-      setComments(prev => ({ ...prev, [postId]: data.comments || [] }));
+      setComments(prev => ({
+        ...prev,
+        [postId]: cursor ? [ ...(prev[postId] || []), ...(data.comments || []) ] : (data.comments || []),
+      }));
+      setCommentCursors(prev => ({ ...prev, [postId]: data.nextCursor || null }));
       setCommentsError(prev => ({ ...prev, [postId]: '' }));
     } catch (e) {
       setCommentsError(prev => ({ ...prev, [postId]: 'Could not load comments.' }));
@@ -418,10 +423,13 @@ export default function Profile({ username }) {
         return;
       }
       if (res.ok) {
-        setComments(prev => ({
-          ...prev,
-          [postId]: [ ...(prev[postId] || []), data.comment ],
-        }));
+        // With older pages still unloaded, the new comment arrives with the last page
+        if (!commentCursors[postId]) {
+          setComments(prev => ({
+            ...prev,
+            [postId]: [ ...(prev[postId] || []), data.comment ],
+          }));
+        }
         setCommentInputs(prev => ({ ...prev, [postId]: '' }));
         setProfilePosts(prev => prev.map(p => p.id === postId ? { ...p, comments: data.comments } : p));
         notify('success', t('success.comment_added'));
@@ -539,6 +547,8 @@ export default function Profile({ username }) {
                     authorName={profile.name || profile.username}
                     commentError={openComments[post.id] ? (commentsError[post.id] || '') : ''}
                     onRetryComments={() => fetchComments(post.id)}
+                    hasMoreComments={!!commentCursors[post.id]}
+                    onLoadMoreComments={(postId) => fetchComments(postId, commentCursors[postId])}
                     commentLoading={openComments[post.id] ? !!commentsLoading[post.id] : false}
                     commentSubmitting={openComments[post.id] ? !!commentSubmitting[post.id] : false}
                     isOwner={(post.username || '').toLowerCase() === currentUser}
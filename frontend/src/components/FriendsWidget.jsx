@@ -12,6 +12,7 @@ export default function FriendsWidget() {
   const [toUser, setToUser] = useState('');
   const [suggestions, setSuggestions] = useState([]);
   const [showSuggestions, setShowSuggestions] = useState(false);
+  const [peopleYouMayKnow, setPeopleYouMayKnow] = useState([]);
 
   const token = typeof window !== 'undefined' ? localStorage.getItem('token') : null;
 
@@ -31,7 +32,16 @@ export default function FriendsWidget() {
     }
   };
 
-  useEffect(() => { loadPending(); }, []);
+  const loadPeopleYouMayKnow = async () => {
+    if (!token) return;
+    try {
+      const res = await fetch('/api/friends/suggestions?limit=5', { headers: { Authorization: `Bearer ${token}` } });
+      const data = await res.json().catch(() => ({ suggestions: [] }));
+      if (res.ok) setPeopleYouMayKnow(data.suggestions || []);
+    } catch {}
+  };
+
+  useEffect(() => { loadPending(); loadPeopleYouMayKnow(); }, []);
 
   const accept = async (fromUsername) => {
     if (!token) return notify('info', t('auth.login_required'));
@@ -57,8 +67,8 @@ export default function FriendsWidget() {
     }
   };
 
-  const sendRequest = async () => {
-    const u = toUser.trim();
+  const sendRequest = async (username) => {
+    const u = (typeof username === 'string' ? username : toUser).trim();
     if (!u) return;
     if (!token) return notify('info', t('auth.login_required'));
     try {
@@ -73,6 +83,7 @@ export default function FriendsWidget() {
       notify('success', data.message || 'Request sent');
       setToUser('');
       setShowSuggestions(false);
+      setPeopleYouMayKnow(prev => prev.filter(p => p.username !== u));
     } catch (e) {
       notify('error', e.message || 'Failed to send request');
     } finally {
@@ -172,6 +183,46 @@ export default function FriendsWidget() {
         </div>
       )}
 
+      {peopleYouMayKnow.length > 0 && (
+        <div style={{marginTop: '16px'}}>
+          <div style={{fontSize: '13px', color: 'var(--text-muted)', marginBottom: '8px'}}>
+            People you may know
+          </div>
+          <div style={{display: 'grid', gap: '8px'}}>
+            {peopleYouMayKnow.map(p => (
+              <div key={p.username} style={{display: 'flex', alignItems: 'center', justifyContent: 'space-between', gap: '8px'}}>
+                <div style={{display: 'flex', gap: '10px', alignItems: 'center'}}>
+                  <span className="fb-avatar-circle" style={{fontSize: '14px'}}>{p.username.charAt(0).toUpperCase()}</span>
+                  <div>
+                    <div style={{fontWeight: '600', color: 'var(--text-strong)'}}>{p.username}</div>
+                    <div style={{color: 'var(--text-muted)', fontSize: '12px'}}>
+                      {p.mutualFriends} mutual {p.mutualFriends === 1 ? 'friend' : 'friends'}
+                    </div>
+                  </div>
+                </div>
+                <button
+                  onClick={() => sendRequest(p.username)}
+                  disabled={sending}
+                  style={{
+                    background: 'var(--primary)',
+                    color: '#fff',
+                    border: 'none',
+                    borderRadius: '6px',
+                    padding: '6px 12px',
+                    fontSize: '13px',
+                    fontWeight: '600',
+                    cursor: sending ? 'not-allowed' : 'pointer',
+                    opacity: sending ? 0.7 : 1
+                  }}
+                >
+                  Add
+                </button>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       <div style={{marginTop: '16px'}}>
         <div style={{fontSize: '13px', color: 'var(--text-muted)', marginBottom: '8px'}}>
           Add Friends
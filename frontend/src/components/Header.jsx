@@ -3,6 +3,7 @@ import { Link, NavLink, useNavigate } from 'react-router-dom';
 import { useToast } from '../components/ToastProvider';
 import './Header.css';
 import { t, setLocale, register } from './i18n';
+import { openNotificationStream } from './notificationStream';
 import en from '../locales/en';
 import hi from '../locales/hi';
 import es from '../locales/es';
@@ -22,6 +23,7 @@ export default function Header() {
   const [searchError, setSearchError] = useState('');
   const searchRef = useRef(null);
   const debounceRef = useRef(null);
+  const searchAbortRef = useRef(null);
   const inputRef = useRef(null);
   const navigate = useNavigate();
   const [activeIndex, setActiveIndex] = useState(-1);
@@ -363,32 +365,59 @@ export default function Header() {
     try { localStorage.setItem('locale', next); } catch {}
   };
 
-  // Notifications polling: friend requests, likes, comments
-  const lastCheckRef = useRef(new Date().toISOString());
+  // Notifications: initial summary, then live events over SSE (polling fallback)
+  // Last unread counts seen, so a poll only toasts what is new since then;
+  // the first poll just seeds them
+  const countsRef = useRef(null);
   useEffect(() => {
     let cancelled = false;
     const poll = async () => {
       const token = localStorage.getItem('token');
       if (!token) return;
-      const since = lastCheckRef.current;
       try {
-        const res = await fetch(`/api/notifications/summary?since=${encodeURIComponent(since)}` ,{
+        const res = await fetch('/api/notifications/summary', {
           headers: { Authorization: `Bearer ${token}` }
         });
         const data = await res.json().catch(() => ({ pendingFriendRequests:0, newLikes:0, newComments:0 }));
-        if (cancelled) return;
-        if (res.ok) {
-          if (data.pendingFriendRequests > 0) notify('info', `You have ${data.pendingFriendRequests} friend request${data.pendingFriendRequests>1?'s':''}`);
-          if (data.newLikes > 0) notify('info', `You received ${data.newLikes} new like${data.newLikes>1?'s':''}`);
-          if (data.newComments > 0) notify('info', `You received ${data.newComments} new comment${data.newComments>1?'s':''}`);
-        }
+        if (cancelled || !res.ok) return;
+        const prev = countsRef.current;
+        countsRef.current = data;
+        if (!prev) return;
+        const requests = data.pendingFriendRequests - prev.pendingFriendRequests;
+        const likes = data.newLikes - prev.newLikes;
+        const comments = data.newComments - prev.newComments;
+        if (requests > 0) notify('info', `You have ${requests} new friend request${requests>1?'s':''}`);
+        if (likes > 0) notify('info', `You received ${likes} new like${likes>1?'s':''}`);
+        if (comments > 0) notify('info', `You received ${comments} new comment${comments>1?'s':''}`);
       } catch {}
-      finally {
-        lastCheckRef.current = new Date().toISOString();
-      }
     };
-    // initial run and interval
     poll();
+    const token = localStorage.getItem('token');
+    if (token && typeof EventSource !== 'undefined') {
+      // Count streamed events as seen, so a poll while the stream is down
+      // doesn't toast them again
+      const seen = (key) => {
+        if (countsRef.current) countsRef.current = { ...countsRef.current, [key]: countsRef.current[key] + 1 };
+      };
+      const close = openNotificationStream(token, {
+        friend_request: (e) => {
+          const data = JSON.parse(e.data);
+          seen('pendingFriendRequests');
+          notify('info', `${data.username} sent you a friend request`);
+        },
+        like: (e) => {
+          const data = JSON.parse(e.data);
+          seen('newLikes');
+          notify('info', `${data.username} liked your post`);
+        },
+        comment: (e) => {
+          const data = JSON.parse(e.data);
+          seen('newComments');
+          notify('info', `${data.username} commented on your post`);
+        },
+      }, poll);
+      return () => { cancelled = true; close(); };
+    }
     const id = setInterval(poll, 45000);
     return () => { cancelled = true; clearInterval(id); };
   }, []);
@@ -409,6 +438,8 @@ export default function Header() {
   };
 
   const runSearch = async (value) => {
+    // Drop the response of a query the user has already typed past
+    if (searchAbortRef.current) searchAbortRef.current.abort();
     if (!value.trim()) {
       setResults([]);
       setShowResults(false);
@@ -419,9 +450,11 @@ export default function Header() {
 
     setSearchLoading(true);
     setSearchError('');
+    const controller = new AbortController();
+    searchAbortRef.current = controller;
 
     try {
-      const res = await fetch(`/api/users/search?q=${encodeURIComponent(value)}`);
+      const res = await fetch(`/api/users/search?q=${encodeURIComponent(value)}`, { signal: controller.signal });
       const data = await res.json().catch(() => ({ users: [] }));
 
       if (!res.ok) {
@@ -432,11 +465,12 @@ export default function Header() {
       setShowResults(true);
       setActiveIndex(data.users && data.users.length ? 0 : -1);
     } catch (error) {
+      if (error.name === 'AbortError') return;
       setResults([]);
       setSearchError(error.message || 'Search failed');
       setShowResults(true);
     } finally {
-      setSearchLoading(false);
+      if (searchAbortRef.current === controller) setSearchLoading(false);
     }
   };
 
@@ -614,7 +648,7 @@ export default function Header() {
                         <Link key={u.username} className={`fb-search-item ${idx === activeIndex ? 'active' : ''}`} to={`/profile?u=${u.username}`} onClick={() => { setShowResults(false); saveRecent(q); }} onMouseEnter={() => setActiveIndex(idx)}>
                           <span className="fb-avatar-circle">{u.username.charAt(0).toUpperCase()}</span>
                           <div className="fb-search-meta">
-                            <div className="name">{u.username}</div>
+                            <div className="name">{u.name || u.username}</div>
                             <div className="sub">{u.email}</div>
                           </div>
                         </Link>
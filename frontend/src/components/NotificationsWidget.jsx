@@ -1,5 +1,6 @@
 import React, { useEffect, useState, useRef } from 'react';
 import { t } from './i18n';
+import { openNotificationStream } from './notificationStream';
 
 export default function NotificationsWidget() {
   const [summary, setSummary] = useState({ pendingFriendRequests: 0, newLikes: 0, newComments: 0 });
@@ -20,8 +21,7 @@ export default function NotificationsWidget() {
     }
 
     try {
-      const since = (typeof window !== 'undefined' ? localStorage.getItem('notif_since') : null) || new Date(Date.now() - 3600_000).toISOString();
-      const res = await fetch(`/api/notifications/summary?since=${encodeURIComponent(since)}`, {
+      const res = await fetch('/api/notifications/summary', {
         headers: { Authorization: `Bearer ${token}` }
       });
       const data = await res.json().catch(() => ({ pendingFriendRequests:0, newLikes:0, newComments:0 }));
@@ -41,7 +41,6 @@ export default function NotificationsWidget() {
       setHasNewNotifications(hasNew);
 
       setLastUpdate(new Date());
-      try { localStorage.setItem('notif_since', new Date().toISOString()); } catch {}
     } catch (e) {
       setError(t('errors.network') || 'Could not load notifications');
     } finally {
@@ -52,7 +51,20 @@ export default function NotificationsWidget() {
   useEffect(() => {
     load();
 
-    // Set up polling every 45 seconds (same as Header)
+    // Live updates over SSE; fall back to polling every 45 seconds
+    if (token && typeof EventSource !== 'undefined') {
+      const bump = (key) => () => {
+        setSummary(prev => ({ ...prev, [key]: prev[key] + 1 }));
+        setHasNewNotifications(true);
+        setLastUpdate(new Date());
+      };
+      return openNotificationStream(token, {
+        friend_request: bump('pendingFriendRequests'),
+        like: bump('newLikes'),
+        comment: bump('newComments'),
+      }, () => load(false));
+    }
+
     intervalRef.current = setInterval(() => {
       load(false); // Don't show loading spinner for background updates
     }, 45000);
@@ -64,6 +76,26 @@ export default function NotificationsWidget() {
     };
   }, []);
 
+  const markSeen = async () => {
+    if (!token) return;
+    try {
+      const res = await fetch('/api/notifications/seen', {
+        method: 'POST',
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      const data = await res.json().catch(() => null);
+      if (res.ok && data) {
+        setSummary({
+          pendingFriendRequests: data.pendingFriendRequests || 0,
+          newLikes: data.newLikes || 0,
+          newComments: data.newComments || 0,
+        });
+        setHasNewNotifications((data.pendingFriendRequests || 0) > 0);
+        setLastUpdate(new Date());
+      }
+    } catch {}
+  };
+
   const formatTimeAgo = (date) => {
     const now = new Date();
     const diffMs = now - date;
@@ -166,6 +198,21 @@ export default function NotificationsWidget() {
             <div style={{fontSize: '11px', color: 'var(--text-muted)'}}>
               Updated {formatTimeAgo(lastUpdate)}
             </div>
+            <div style={{display: 'flex', gap: '6px'}}>
+            <button
+              onClick={markSeen}
+              style={{
+                background: 'var(--surface-2)',
+                color: 'var(--text-strong)',
+                border: '1px solid var(--border)',
+                borderRadius: '6px',
+                padding: '4px 8px',
+                fontSize: '12px',
+                cursor: 'pointer'
+              }}
+            >
+              Mark read
+            </button>
             <button
               onClick={() => load()}
               style={{
@@ -183,6 +230,7 @@ export default function NotificationsWidget() {
             >
               Refresh
             </button>
+            </div>
           </div>
         </div>
       )}
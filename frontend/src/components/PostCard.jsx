@@ -18,6 +18,8 @@ export default function PostCard({
   authorName,
   commentError,
   onRetryComments,
+  hasMoreComments,
+  onLoadMoreComments,
   commentLoading,
   commentSubmitting,
   isOwner,
@@ -103,11 +105,19 @@ export default function PostCard({
                       {media.type === 'video' ? (
                         <VideoPlayer
                           src={media.url}
+                          poster={media.poster}
                           className="post-card-media-asset"
                           qualityOptions={['auto', '720p', '480p']}
                         />
                       ) : (
-                        <img src={media.url} alt="Post media" className="post-card-media-asset" />
+                        <img
+                          src={media.url}
+                          srcSet={media.srcset}
+                          sizes="(max-width: 680px) 100vw, 680px"
+                          loading="lazy"
+                          alt="Post media"
+                          className="post-card-media-asset"
+                        />
                       )}
                     </div>
                   ))
@@ -117,12 +127,20 @@ export default function PostCard({
                       {media.type === 'video' ? (
                         <VideoPlayer
                           src={media.url}
+                          poster={media.poster}
                           className="post-card-media-asset"
                           controls={false}
                           autoPlay={false}
                         />
                       ) : (
-                        <img src={media.url} alt={`Post media ${idx + 1}`} className="post-card-media-asset" />
+                        <img
+                          src={media.url}
+                          srcSet={media.srcset}
+                          sizes="(max-width: 680px) 50vw, 340px"
+                          loading="lazy"
+                          alt={`Post media ${idx + 1}`}
+                          className="post-card-media-asset"
+                        />
                       )}
                       {post.media.length > 4 && idx === 3 && (
                         <div className="post-card-media-overlay">+{post.media.length - 4}</div>
@@ -256,6 +274,16 @@ export default function PostCard({
               </div>
             ))}
           </div>
+          {hasMoreComments && onLoadMoreComments && (
+            <button
+              type="button"
+              className="comments-more"
+              onClick={() => onLoadMoreComments(post.id)}
+              disabled={!!commentLoading}
+            >
+              {t('common.load_more')}
+            </button>
+          )}
           {onSubmitComment && (
             <div className="comment-input">
               <input
@@ -29,10 +29,22 @@ export default function StoriesBar() {
 
       if (!res.ok) throw new Error('Failed to load stories');
 
-      // Add "Create Story" as first item, then real stories
+      // Add "Create Story" as first item, then one bubble per author
+      const authors = (data.users || []).map(group => {
+        const latest = group.stories[group.stories.length - 1];
+        // Resume at the first story the viewer has not seen yet
+        const next = group.stories.find(st => !st.seen) || group.stories[0];
+        return {
+          id: next.id,
+          name: group.username,
+          media_url: latest.media_url,
+          count: group.stories.length,
+          unseen: group.hasUnseen
+        };
+      });
       const storiesWithCreate = [
         { id: 'create', name: 'You', isCreate: true },
-        ...data.stories || []
+        ...authors
       ];
 
       setStories(storiesWithCreate);
@@ -81,6 +93,12 @@ export default function StoriesBar() {
       }, 1000);
     } else {
       // View story
+      if (token) {
+        fetch(`/api/stories/${story.id}/view`, {
+          method: 'POST',
+          headers: { Authorization: `Bearer ${token}` }
+        }).catch(() => {});
+      }
       navigate(`/story/${story.id}`);
     }
   };
@@ -132,7 +150,7 @@ export default function StoriesBar() {
         {stories.map(s => (
           <button
             key={s.id}
-            className={`fb-story ${s.isCreate ? 'add' : ''} ${hoveredStory === s.id ? 'hovered' : ''}`}
+            className={`fb-story ${s.isCreate ? 'add' : ''} ${s.unseen ? 'unseen' : ''} ${hoveredStory === s.id ? 'hovered' : ''}`}
             onMouseEnter={() => handleStoryHover(s.id)}
             onMouseLeave={handleStoryLeave}
             onClick={() => handleStoryClick(s)}
@@ -174,6 +192,10 @@ export default function StoriesBar() {
           z-index: 10;
         }
 
+        .fb-story.unseen .fb-story-avatar {
+          box-shadow: 0 0 0 3px var(--accent, #1877f2);
+        }
+
         .fb-story-media {
           position: absolute;
           inset: 0;
@@ -0,0 +1,53 @@
+// Live notification events over Server-Sent Events. EventSource cannot send
+// an Authorization header, so each connection is opened with a single-use
+// ticket; after an error the stream is reopened with a fresh one, backing off
+// while it keeps failing (the server answers 503 when its stream slots are full).
+const RETRY_MS = 5000;
+const MAX_RETRY_MS = 60000;
+
+// Opens the stream for `token` and calls `listeners[type](event)` for each
+// event, and `onDown()` each time the stream is down so the caller can poll
+// instead. Returns a function that closes the stream for good.
+export function openNotificationStream(token, listeners, onDown) {
+  let source = null;
+  let timer = null;
+  let closed = false;
+  let delay = RETRY_MS;
+
+  const retry = () => {
+    if (closed) return;
+    if (onDown) onDown();
+    timer = setTimeout(connect, delay);
+    delay = Math.min(delay * 2, MAX_RETRY_MS);
+  };
+
+  const connect = async () => {
+    try {
+      const res = await fetch('/api/notifications/stream-ticket', {
+        method: 'POST',
+        headers: { Authorization: `Bearer ${token}` },
+      });
+      if (res.status === 401) return; // logged out; nothing to retry
+      if (!res.ok) throw new Error('Failed to get a stream ticket');
+      const { ticket } = await res.json();
+      if (closed) return;
+      source = new EventSource(`/api/notifications/stream?ticket=${encodeURIComponent(ticket)}`);
+      source.onopen = () => { delay = RETRY_MS; };
+      Object.entries(listeners).forEach(([type, fn]) => source.addEventListener(type, fn));
+      source.onerror = () => {
+        // The ticket is spent, so EventSource's own reconnect would be refused
+        source.close();
+        retry();
+      };
+    } catch {
+      retry();
+    }
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(timer);
+    if (source) source.close();
+  };
+}